@@ -0,0 +1,196 @@
+from typing import Any, Generator
+
+import pytest
+from ddtrace.trace import Span, tracer
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing import _replace_writer
+from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._span import default_ignore_attrs
+from troncos.tracing._writer import OTELWriter
+
+SERVICE_NAME = "benchmark"
+
+RESOURCE_ATTRIBUTES = {
+    "app": "benchmark",
+    "component": "api",
+    "role": "web",
+    "tenant": "oda",
+    "owner": "platform",
+    "version": "1.2.3",
+}
+
+_SQL_QUERY = (
+    'SELECT "orders_order"."id", "orders_order"."created_at", '
+    '"orders_order"."customer_id", "orders_order"."status", '
+    '"orders_order"."delivery_window_id", "orders_order"."total_price" '
+    'FROM "orders_order" INNER JOIN "customers_customer" ON '
+    '("orders_order"."customer_id" = "customers_customer"."id") '
+    'WHERE ("customers_customer"."email" = %s AND "orders_order"."status" IN '
+    '(%s, %s, %s)) ORDER BY "orders_order"."created_at" DESC LIMIT 21'
+)
+
+_STACK = "Traceback (most recent call last):\n" + "".join(
+    f'  File "/app/oda/services/module_{i}.py", line {100 + i}, in handler_{i}\n'
+    f"    result = self.next_handler_{i}(request, *args, **kwargs)\n"
+    for i in range(60)
+)
+
+
+def django_request_span() -> Span:
+    """A server span with the tags set by the ddtrace Django integration."""
+
+    span = Span(
+        "django.request",
+        service=SERVICE_NAME,
+        resource="GET orders.views.OrderListView",
+        span_type="web",
+    )
+    span.set_tags(
+        {
+            "span.kind": "server",
+            "component": "django",
+            "runtime-id": "2f0cfd2b5f0f4dcc9a7d0b1f8f5e4cd1",
+            "env": "production",
+            "version": "1.2.3",
+            "language": "python",
+            "http.method": "GET",
+            "http.url": "https://oda.com/api/v1/orders/?page=2&page_size=20",
+            "http.route": "^api/v1/orders/$",
+            "http.status_code": "200",
+            "http.useragent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X)",
+            "http.client_ip": "10.12.34.56",
+            "http.request.headers.host": "oda.com",
+            "http.request.headers.accept": "application/json",
+            "http.request.headers.accept-language": "nb-NO,nb;q=0.9",
+            "http.request.headers.x-request-id": "9b0a4b9c-0f5d-4d1f-9f0e",
+            "http.response.headers.content-type": "application/json",
+            "http.response.headers.content-length": "18231",
+            "django.request.class": "django.core.handlers.wsgi.WSGIRequest",
+            "django.response.class": "rest_framework.response.Response",
+            "django.view": "orders.views.OrderListView",
+            "django.user.is_authenticated": "True",
+            "django.user.id": "1234567",
+            "django.user.name": "customer@example.com",
+            "django.middleware": "django.middleware.security.SecurityMiddleware",
+            "network.client.ip": "10.12.34.56",
+            "out.host": "oda.com",
+            "_dd.base_service": SERVICE_NAME,
+            "_dd.p.dm": "-0",
+            "_dd.p.tid": "65a1b2c300000000",
+        }
+    )
+    span.set_metrics(
+        {
+            "_dd.measured": 1,
+            "_dd.top_level": 1,
+            "_dd.tracer_kr": 1.0,
+            "_sampling_priority_v1": 1,
+            "process_id": 42,
+            "http.response.content_length": 18231,
+        }
+    )
+    return span
+
+
+def db_span(parent: Span) -> Span:
+    """A client span with the tags set by the ddtrace psycopg integration."""
+
+    span = Span(
+        "postgres.query",
+        service="postgres",
+        resource=_SQL_QUERY,
+        span_type="sql",
+        trace_id=parent.trace_id,
+        parent_id=parent.span_id,
+    )
+    span._parent = parent
+    span.set_tags(
+        {
+            "span.kind": "client",
+            "component": "psycopg",
+            "db.system": "postgresql",
+            "db.name": "oda",
+            "db.user": "oda_web",
+            "db.application": "oda-web",
+            "out.host": "postgres.oda.svc.cluster.local",
+            "server.address": "postgres.oda.svc.cluster.local",
+            "network.destination.port": "5432",
+            "sql.query": _SQL_QUERY,
+            "db.statement": _SQL_QUERY,
+            "_dd.base_service": SERVICE_NAME,
+            "_dd.dbm_trace_injected": "false",
+        }
+    )
+    span.set_metrics({"db.row_count": 20, "_dd.measured": 1})
+    return span
+
+
+def error_span(parent: Span) -> Span:
+    """A span that has failed with a deep stack trace."""
+
+    span = Span(
+        "orders.service.place_order",
+        service=SERVICE_NAME,
+        trace_id=parent.trace_id,
+        parent_id=parent.span_id,
+    )
+    span._parent = parent
+    span.set_tags(
+        {
+            "error.type": "orders.exceptions.DeliveryWindowFullError",
+            "error.msg": "Delivery window 2024-01-12 16:00-18:00 is full",
+            "error.stack": _STACK,
+        }
+    )
+    span.error = 1
+    return span
+
+
+def finished(*spans: Span) -> list[Span]:
+    for span in spans:
+        span.finish()
+    return list(spans)
+
+
+def trace_chunk(db_spans: int = 50) -> list[Span]:
+    """A finished Django request with many queries and a failing service call."""
+
+    root = django_request_span()
+    children = [db_span(root) for _ in range(db_spans)]
+    return finished(*children, error_span(root), root)
+
+
+@pytest.fixture
+def otel_resource() -> Resource:
+    return Resource.create({"service.name": SERVICE_NAME, **RESOURCE_ATTRIBUTES})
+
+
+@pytest.fixture
+def ignore_attrs(otel_resource: Resource) -> set[str]:
+    return set(otel_resource.attributes.keys()) | default_ignore_attrs()
+
+
+@pytest.fixture
+def disabled_writer() -> Generator[OTELWriter, Any, Any]:
+    """Replace the tracer writer with a disabled one, spans are created but ignored."""
+
+    writer = OTELWriter(
+        enabled=False,
+        service_name=SERVICE_NAME,
+        exporter=Exporter(host="localhost", port="4318"),
+        resource_attributes=RESOURCE_ATTRIBUTES,
+    )
+    _replace_writer(tracer, writer)
+    yield writer
+
+
+@pytest.fixture
+def otlp_exporter(httpserver: Any) -> Exporter:
+    httpserver.expect_request("/v1/traces").respond_with_data("OK")
+    return Exporter(
+        host=httpserver.host,
+        port=f"{httpserver.port}",
+        path="/v1/traces",
+        exporter_type=ExporterType.HTTP,
+    )
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any
+
+from troncos.tracing._writer import OTELWriter
+from troncos.tracing.decorators import (
+    set_decorators_enabled,
+    trace_block,
+    trace_function,
+)
+
+
+def _plain() -> int:
+    return 1
+
+
+@trace_function
+def _traced() -> int:
+    return 1
+
+
+async def _aplain() -> int:
+    return 1
+
+
+@trace_function
+async def _atraced() -> int:
+    return 1
+
+
+def _block() -> int:
+    with trace_block("benchmark.block", attributes={"some": "attribute"}):
+        return 1
+
+
+def test_function_baseline(benchmark: Any) -> None:
+    benchmark(_plain)
+
+
+def test_trace_function(benchmark: Any, disabled_writer: OTELWriter) -> None:
+    benchmark(_traced)
+
+
+def test_trace_block(benchmark: Any, disabled_writer: OTELWriter) -> None:
+    benchmark(_block)
+
+
+def test_async_function_baseline(benchmark: Any) -> None:
+    loop = asyncio.new_event_loop()
+    benchmark(lambda: loop.run_until_complete(_aplain()))
+    loop.close()
+
+
+def test_trace_function_async(benchmark: Any, disabled_writer: OTELWriter) -> None:
+    loop = asyncio.new_event_loop()
+    benchmark(lambda: loop.run_until_complete(_atraced()))
+    loop.close()
+
+
+def test_trace_function_switched_off(benchmark: Any) -> None:
+    set_decorators_enabled(False)
+    benchmark(_traced)
+    set_decorators_enabled(True)
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+from typing import Any
+
+
+def _import(module: str) -> None:
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+
+
+def test_import_baseline(benchmark: Any) -> None:
+    benchmark(_import, "ddtrace.trace")
+
+
+def test_import_tracing(benchmark: Any) -> None:
+    benchmark(_import, "troncos.tracing")
@@ -0,0 +1,61 @@
+from typing import Any
+
+import pytest
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._span import (
+    ResourceCache,
+    _span_status_and_attributes,
+    translate_span,
+)
+
+from .conftest import db_span, django_request_span, error_span, finished, trace_chunk
+
+SPAN_SHAPES = {
+    "django_request": lambda: finished(django_request_span())[0],
+    "db_query": lambda: finished(db_span(django_request_span()))[0],
+    "error": lambda: finished(error_span(django_request_span()))[0],
+}
+
+
+@pytest.mark.parametrize("shape", SPAN_SHAPES)
+def test_translate_span(
+    benchmark: Any, shape: str, otel_resource: Resource, ignore_attrs: set[str]
+) -> None:
+    span = SPAN_SHAPES[shape]()
+    benchmark(translate_span, span, otel_resource, ignore_attrs)
+
+
+@pytest.mark.parametrize("shape", SPAN_SHAPES)
+def test_translate_span_cached_resource(
+    benchmark: Any, shape: str, otel_resource: Resource, ignore_attrs: set[str]
+) -> None:
+    span = SPAN_SHAPES[shape]()
+    resources = ResourceCache(otel_resource)
+    benchmark(translate_span, span, otel_resource, ignore_attrs, resources=resources)
+
+
+@pytest.mark.parametrize("shape", SPAN_SHAPES)
+def test_span_status_and_attributes(
+    benchmark: Any, shape: str, ignore_attrs: set[str]
+) -> None:
+    span = SPAN_SHAPES[shape]()
+    benchmark(_span_status_and_attributes, span, ignore_attrs)
+
+
+@pytest.mark.parametrize("shape", SPAN_SHAPES)
+def test_encode_span(
+    benchmark: Any, shape: str, otel_resource: Resource, ignore_attrs: set[str]
+) -> None:
+    span = SPAN_SHAPES[shape]()
+    encoder = SpanEncoder(otel_resource, ignore_attrs)
+    benchmark(encoder.encode_span, span)
+
+
+def test_encode_export_request(
+    benchmark: Any, otel_resource: Resource, ignore_attrs: set[str]
+) -> None:
+    encoder = SpanEncoder(otel_resource, ignore_attrs)
+    encoded = [encoder.encode_span(span) for span in trace_chunk()]
+    benchmark(encode_export_request, encoded)
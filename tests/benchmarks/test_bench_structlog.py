@@ -0,0 +1,34 @@
+from typing import Any
+
+from ddtrace.trace import tracer
+
+from troncos.contrib.structlog.processors import (
+    LogfmtRenderer,
+    trace_injection_processor,
+)
+from troncos.tracing._writer import OTELWriter
+
+
+def _event_dict() -> dict[str, Any]:
+    return {
+        "event": "Order placed",
+        "level": "info",
+        "logger": "orders.service",
+        "order_id": 123456,
+        "customer": "customer@example.com",
+        "message": "multi\nline\nmessage",
+    }
+
+
+def test_trace_injection_processor_no_span(benchmark: Any) -> None:
+    benchmark(trace_injection_processor, None, "info", _event_dict())
+
+
+def test_trace_injection_processor(benchmark: Any, disabled_writer: OTELWriter) -> None:
+    with tracer.trace("benchmark"):
+        benchmark(trace_injection_processor, None, "info", _event_dict())
+
+
+def test_logfmt_renderer(benchmark: Any) -> None:
+    renderer = LogfmtRenderer()
+    benchmark(renderer, None, "info", _event_dict())
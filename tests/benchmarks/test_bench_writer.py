@@ -0,0 +1,90 @@
+from typing import Any
+
+import pytest
+
+from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._worker import BackgroundWorker, DropPolicy
+from troncos.tracing._writer import OTELWriter
+from troncos.tracing.testing import OTLPReceiver
+
+from .conftest import RESOURCE_ATTRIBUTES, SERVICE_NAME, trace_chunk
+
+
+@pytest.mark.parametrize("fast_encoding", [False, True], ids=["sdk", "fast"])
+def test_writer_write(
+    benchmark: Any, otlp_exporter: Exporter, fast_encoding: bool
+) -> None:
+    writer = OTELWriter(
+        enabled=True,
+        service_name=SERVICE_NAME,
+        exporter=otlp_exporter,
+        resource_attributes=RESOURCE_ATTRIBUTES,
+        fast_encoding=fast_encoding,
+    )
+    spans = trace_chunk()
+
+    benchmark(writer.write, spans)
+
+    writer.stop()
+
+
+def test_writer_write_unsampled(benchmark: Any, otlp_exporter: Exporter) -> None:
+    writer = OTELWriter(
+        enabled=True,
+        service_name=SERVICE_NAME,
+        exporter=otlp_exporter,
+        resource_attributes=RESOURCE_ATTRIBUTES,
+    )
+    spans = trace_chunk()
+    for span in spans:
+        span.context.sampling_priority = 0
+
+    benchmark(writer.write, spans)
+
+    writer.stop()
+
+
+def test_writer_write_background(benchmark: Any, otlp_exporter: Exporter) -> None:
+    writer = OTELWriter(
+        enabled=True,
+        service_name=SERVICE_NAME,
+        exporter=otlp_exporter,
+        resource_attributes=RESOURCE_ATTRIBUTES,
+        background_worker=BackgroundWorker(drop_policy=DropPolicy.DROP_OLDEST),
+    )
+    spans = trace_chunk()
+
+    benchmark(writer.write, spans)
+
+    writer.stop()
+
+
+def test_writer_end_to_end(benchmark: Any) -> None:
+    """Spans per second received by a collector, from write to export."""
+
+    with OTLPReceiver() as receiver:
+        writer = OTELWriter(
+            enabled=True,
+            service_name=SERVICE_NAME,
+            exporter=Exporter(
+                host="127.0.0.1",
+                port=f"{receiver.http_port}",
+                path="/v1/traces",
+                exporter_type=ExporterType.HTTP,
+                schedule_delay_millis=100,
+            ),
+            resource_attributes=RESOURCE_ATTRIBUTES,
+            fast_encoding=True,
+        )
+        chunks = [trace_chunk() for _ in range(20)]
+
+        def _write_all() -> None:
+            receiver.reset()
+            for spans in chunks:
+                writer.write(spans)
+            writer.flush_queue()
+            assert receiver.wait_for_spans(sum(len(spans) for spans in chunks))
+
+        benchmark.pedantic(_write_all, rounds=5)
+        benchmark.extra_info["spans_per_second"] = receiver.spans_per_second()
+        writer.stop()
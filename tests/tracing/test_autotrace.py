@@ -0,0 +1,120 @@
+import sys
+from pathlib import Path
+from typing import Generator
+
+import pytest
+
+from troncos.tracing._autotrace import (
+    AutoTrace,
+    install_import_hook,
+    uninstall_import_hook,
+)
+from troncos.tracing.decorators import _TRACED_ATTR
+
+_MODULE = """
+from troncos.tracing.decorators import trace_function, trace_ignore
+
+
+def create():
+    return "created"
+
+
+def _private():
+    pass
+
+
+@trace_ignore
+def ignored():
+    pass
+
+
+@trace_function
+def explicit():
+    pass
+
+
+class Order:
+    def total(self):
+        return 42
+
+
+@trace_ignore
+class IgnoredOrder:
+    def total(self):
+        return 42
+"""
+
+
+@pytest.fixture
+def package(tmp_path: Path) -> Generator[str, None, None]:
+    (tmp_path / "autotraced").mkdir()
+    (tmp_path / "autotraced" / "__init__.py").write_text("")
+    (tmp_path / "autotraced" / "services.py").write_text(_MODULE)
+    (tmp_path / "autotraced" / "views.py").write_text(_MODULE)
+    sys.path.insert(0, str(tmp_path))
+    yield "autotraced"
+    uninstall_import_hook()
+    sys.path.remove(str(tmp_path))
+    for name in list(sys.modules):
+        if name.startswith("autotraced"):
+            del sys.modules[name]
+
+
+def _traced(value: object) -> bool:
+    return hasattr(value, _TRACED_ATTR)
+
+
+def test_matches() -> None:
+    auto_trace = AutoTrace(include=["myapp.services.*"], exclude=["*.migrations"])
+
+    assert auto_trace.matches("myapp.services.orders")
+    assert auto_trace.matches("myapp.services.orders.tasks")
+    assert not auto_trace.matches("myapp.services")
+    assert not auto_trace.matches("myapp.views")
+    assert not auto_trace.matches("myapp.services.migrations")
+    assert not AutoTrace(include=["troncos.*"]).matches("troncos.tracing")
+
+
+def test_matches_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OTEL_TRACE_AUTO_INCLUDE", "myapp.services.*, myapp.tasks")
+    monkeypatch.setenv("OTEL_TRACE_AUTO_EXCLUDE", "myapp.services.slow")
+
+    auto_trace = AutoTrace()
+
+    assert auto_trace.include == ["myapp.services.*", "myapp.tasks"]
+    assert auto_trace.matches("myapp.tasks")
+    assert not auto_trace.matches("myapp.services.slow")
+
+
+def test_import_hook(package: str) -> None:
+    install_import_hook(AutoTrace(include=[f"{package}.services"]))
+
+    from autotraced import services, views
+
+    assert _traced(services.create)
+    assert services.create() == "created"
+    assert not _traced(services._private)
+    assert not _traced(services.ignored)
+    # Functions that are already traced are not traced twice.
+    assert not _traced(services.explicit.__wrapped__)
+    assert _traced(services.Order.total)
+    assert services.Order().total() == 42
+    assert not _traced(services.IgnoredOrder.total)
+    assert not _traced(views.create)
+
+
+def test_import_hook_imported_modules(package: str) -> None:
+    from autotraced import services
+
+    install_import_hook(AutoTrace(include=[f"{package}.*"]))
+
+    assert _traced(services.create)
+
+
+def test_uninstall_import_hook(package: str) -> None:
+    install_import_hook(AutoTrace(include=[f"{package}.*"]))
+    uninstall_import_hook()
+
+    from autotraced import services
+
+    assert not _traced(services.create)
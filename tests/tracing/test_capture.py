@@ -0,0 +1,124 @@
+from pathlib import Path
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from pytest_httpserver import HTTPServer
+
+from troncos.cli import main
+from troncos.tracing._capture import (
+    CapturingPayloadExporter,
+    count_spans,
+    multiply_payloads,
+    read_capture,
+)
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._span import default_ignore_attrs
+from troncos.tracing._transport import PayloadExporter
+
+resource = Resource.create({"service.name": "test_service"})
+
+
+def _payload() -> bytes:
+    root = Span("root", service="test_service")
+    child = Span(
+        "child",
+        service="test_service",
+        trace_id=root.trace_id,
+        parent_id=root.span_id,
+    )
+    child.finish()
+    root.finish()
+    encoder = SpanEncoder(resource, default_ignore_attrs())
+    return encode_export_request([encoder.encode_span(s) for s in [child, root]])
+
+
+class CollectingExporter(PayloadExporter):
+    def __init__(self) -> None:
+        self.payloads: list[bytes] = []
+
+    def export(self, payload: bytes) -> bool:
+        self.payloads.append(payload)
+        return True
+
+
+def _capture_file(path: Path, payloads: list[bytes]) -> None:
+    collecting = CollectingExporter()
+    capturing = CapturingPayloadExporter(collecting, str(path))
+    for payload in payloads:
+        capturing.export(payload)
+    capturing.shutdown()
+    assert collecting.payloads == payloads
+
+
+def test_capture(tmp_path: Path) -> None:
+    path = tmp_path / "traces.otlp"
+    payloads = [_payload(), _payload()]
+
+    _capture_file(path, payloads)
+    # A request cut short by a killed process is skipped.
+    with open(path, "ab") as file:
+        file.write(b"\x00\x00\x01\x00\x01")
+
+    assert list(read_capture(str(path))) == payloads
+
+
+def test_capture_truncated_header(tmp_path: Path) -> None:
+    path = tmp_path / "traces.otlp"
+    payloads = [_payload()]
+
+    _capture_file(path, payloads)
+    with open(path, "ab") as file:
+        file.write(b"\x00\x00")
+
+    assert list(read_capture(str(path))) == payloads
+
+
+def test_multiply_payloads() -> None:
+    payload = _payload()
+
+    payloads = multiply_payloads([payload], 3)
+
+    assert len(payloads) == 3
+    assert count_spans(payloads[0]) == 2
+    trace_ids = set()
+    for multiplied in payloads:
+        request = ExportTraceServiceRequest.FromString(multiplied)
+        child, root = request.resource_spans[0].scope_spans[0].spans
+        assert child.trace_id == root.trace_id
+        assert child.parent_span_id == root.span_id
+        trace_ids.add(root.trace_id)
+
+    original = ExportTraceServiceRequest.FromString(payload)
+    trace_ids.add(original.resource_spans[0].scope_spans[0].spans[0].trace_id)
+    assert len(trace_ids) == 4
+
+
+def test_replay(
+    tmp_path: Path, httpserver: HTTPServer, capsys: pytest.CaptureFixture[str]
+) -> None:
+    httpserver.expect_request("/v1/traces").respond_with_data("OK")
+    path = tmp_path / "traces.otlp"
+    _capture_file(path, [_payload(), _payload()])
+
+    exit_code = main(
+        [
+            "replay",
+            str(path),
+            "--endpoint",
+            httpserver.url_for("/v1/traces"),
+            "--multiply",
+            "2",
+            "--concurrency",
+            "2",
+        ]
+    )
+
+    assert exit_code == 0
+    assert len(httpserver.log) == 4
+    output = capsys.readouterr().out
+    assert "requests:  4 (0 failed)" in output
+    assert "spans:     8 " in output
@@ -0,0 +1,73 @@
+from ddtrace.trace import Span
+
+from troncos.tracing._coalescing import SpanCoalescer
+
+
+def _span(
+    name: str,
+    parent: Span | None = None,
+    resource: str = "SELECT 1",
+    start_ns: int = 0,
+    duration_ns: int = 1000,
+    error: bool = False,
+) -> Span:
+    span = Span(
+        name,
+        service="test_service",
+        resource=resource,
+        trace_id=parent.trace_id if parent else None,
+        parent_id=parent.span_id if parent else None,
+    )
+    span._parent = parent
+    span.set_tag("span.kind", "client")
+    span.start_ns = start_ns
+    span.duration_ns = duration_ns
+    if error:
+        span.error = 1
+    return span
+
+
+def test_coalesce() -> None:
+    root = _span("django.request", resource="GET /", duration_ns=10**9)
+    queries = [
+        _span("postgres.query", root, start_ns=1000 * i, duration_ns=100 + i)
+        for i in range(20)
+    ]
+    error_query = _span("postgres.query", root, start_ns=30000, error=True)
+    other = _span("redis.command", root, resource="GET")
+    spans = [*queries, error_query, other, root]
+
+    coalesced = SpanCoalescer(min_count=10, keep_slowest=2).coalesce(spans)
+
+    assert len(coalesced) == 1 + 2 + 1 + 1 + 1
+    summary = coalesced[0]
+    assert summary.span_id == queries[0].span_id
+    assert summary.parent_id == root.span_id
+    assert summary._parent is root
+    assert summary.name == "postgres.query"
+    assert summary.get_tag("span.kind") == "client"
+    assert summary.start_ns == 0
+    assert summary.duration_ns == 17000 + 117
+    assert summary.get_metric("troncos.coalesced.count") == 18
+    assert summary.get_metric("troncos.coalesced.duration.min") == 100 / 1e9
+    assert summary.get_metric("troncos.coalesced.duration.max") == 117 / 1e9
+    assert summary.get_metric("troncos.coalesced.duration.total") == (
+        sum(range(100, 118)) / 1e9
+    )
+    assert coalesced[1:] == [queries[18], queries[19], error_query, other, root]
+
+
+def test_below_min_count() -> None:
+    root = _span("django.request", resource="GET /")
+    spans = [_span("postgres.query", root) for _ in range(10)] + [root]
+
+    assert SpanCoalescer(min_count=10).coalesce(spans) is spans
+
+
+def test_spans_with_children_are_kept() -> None:
+    root = _span("django.request", resource="GET /")
+    parents = [_span("celery.apply", root, resource="task") for _ in range(20)]
+    children = [_span("redis.command", parent, resource="SET") for parent in parents]
+    spans = [*children, *parents, root]
+
+    assert SpanCoalescer(min_count=10).coalesce(spans) is spans
@@ -0,0 +1,97 @@
+import json
+import os
+import struct
+from pathlib import Path
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan
+
+from troncos.tracing._debug import DebugFormat, FileSpanExporter
+from troncos.tracing._span import default_ignore_attrs, translate_span
+
+resource = Resource.create({"service.name": "test_service"})
+
+
+def _spans(count: int) -> list[ReadableSpan]:
+    spans = []
+    for i in range(count):
+        span = Span(f"span.{i}", service="test_service")
+        span.finish()
+        spans.append(translate_span(span, resource, default_ignore_attrs()))
+    return spans
+
+
+def test_json_lines(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    span_exporter = FileSpanExporter(path=str(path))
+
+    span_exporter.export(_spans(3))
+    span_exporter.shutdown()
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == [
+        "span.0",
+        "span.1",
+        "span.2",
+    ]
+
+
+def test_otlp(tmp_path: Path) -> None:
+    path = tmp_path / "spans.otlp"
+    span_exporter = FileSpanExporter(path=str(path), format=DebugFormat.OTLP)
+
+    span_exporter.export(_spans(2))
+    span_exporter.export(_spans(1))
+    span_exporter.shutdown()
+
+    data = path.read_bytes()
+    requests = []
+    while data:
+        (size,) = struct.unpack(">I", data[:4])
+        requests.append(ExportTraceServiceRequest.FromString(data[4 : 4 + size]))
+        data = data[4 + size :]
+    assert [len(r.resource_spans[0].scope_spans[0].spans) for r in requests] == [2, 1]
+
+
+def test_rotation(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    span_exporter = FileSpanExporter(path=str(path), max_bytes=1, backup_count=2)
+
+    for _ in range(4):
+        span_exporter.export(_spans(1))
+    span_exporter.shutdown()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "spans.jsonl",
+        "spans.jsonl.1",
+        "spans.jsonl.2",
+    ]
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_rotation_keeps_writes_of_other_processes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "spans.jsonl"
+    span_exporter = FileSpanExporter(path=str(path), max_bytes=1, backup_count=1)
+    replace = os.replace
+
+    def _replace(src: str, dst: str) -> None:
+        replace(src, dst)
+        # Another process writes to the new file before it is reopened.
+        with open(path, "ab") as f:
+            f.write(b"other\n")
+
+    monkeypatch.setattr(os, "replace", _replace)
+    for _ in range(2):
+        span_exporter.export(_spans(1))
+    span_exporter.shutdown()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert lines[0] == "other"
@@ -1,8 +1,21 @@
-from typing import Any
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Generator
 
 import pytest
+from ddtrace.constants import USER_REJECT
+from ddtrace.trace import Span, tracer
 
-from troncos.tracing.decorators import trace_class
+from troncos.tracing import _replace_writer
+from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._writer import OTELWriter
+from troncos.tracing.decorators import (
+    set_decorators_enabled,
+    trace_block,
+    trace_class,
+    trace_function,
+)
+from troncos.tracing.testing import OTLPReceiver
 
 
 @trace_class
@@ -72,3 +85,260 @@ def test_trace_class_is_not_traced(class_attr: Any) -> None:
     assert hasattr(class_attr, "__wrapped__") is False, (
         f"Expected {class_attr} not to be traced"
     )
+
+
+@pytest.fixture
+def decorators_enabled() -> Generator[None, None, None]:
+    yield
+    set_decorators_enabled(True)
+
+
+@trace_function
+def current_span() -> Span | None:
+    return tracer.current_span()
+
+
+def test_decorators_disabled(decorators_enabled: None) -> None:
+    set_decorators_enabled(False)
+
+    assert current_span() is None
+
+
+def test_decorators_skip_unsampled(decorators_enabled: None) -> None:
+    set_decorators_enabled(True, skip_unsampled=True)
+
+    with tracer.trace("root") as root:
+        traced = current_span()
+        root.context.sampling_priority = USER_REJECT
+        skipped = current_span()
+
+    assert traced is not None and traced is not root
+    assert traced.name == f"{__name__}.current_span"
+    assert skipped is root
+
+
+@pytest.fixture
+def receiver() -> Generator[OTLPReceiver, None, None]:
+    with OTLPReceiver() as receiver:
+        writer = OTELWriter(
+            enabled=True,
+            service_name="test_decorators",
+            exporter=Exporter(
+                host="127.0.0.1",
+                port=f"{receiver.http_port}",
+                path="/v1/traces",
+                exporter_type=ExporterType.HTTP,
+            ),
+            resource_attributes=None,
+        )
+        _replace_writer(tracer, writer)
+        yield receiver
+
+
+def _received(receiver: OTLPReceiver, count: int) -> dict[str, list[Any]]:
+    tracer.flush()  # type: ignore[no-untyped-call]
+    assert receiver.wait_for_spans(count)
+    spans: dict[str, list[Any]] = {}
+    for span in receiver.spans:
+        spans.setdefault(span.name.rsplit(".", 1)[-1], []).append(span)
+    return spans
+
+
+@trace_function(sample_every=3)
+def every_third() -> None:
+    pass
+
+
+@trace_function(min_duration=0.05)
+def maybe_slow(seconds: float, fail: bool = False) -> None:
+    time.sleep(seconds)
+    if fail:
+        raise ValueError("Failed")
+
+
+def test_sample_every(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root"):
+        for _ in range(6):
+            every_third()
+
+    spans = _received(receiver, 3)
+    assert len(spans["every_third"]) == 2
+
+
+def test_min_duration(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root") as root:
+        maybe_slow(0)
+        maybe_slow(0.06)
+        with pytest.raises(ValueError):
+            maybe_slow(0, fail=True)
+
+    spans = _received(receiver, 3)
+    slow, failed = spans["maybe_slow"]
+    assert slow.parent_span_id == root.span_id
+    assert failed.parent_span_id == root.span_id
+    # STATUS_CODE_ERROR
+    assert failed.status_code == 2
+
+
+def test_trace_block_min_duration(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root"):
+        with trace_block("fast", min_duration=0.05) as span:
+            span.set_tag("some", "tag")
+        with trace_block("slow", min_duration=0.05) as span:
+            span.set_tag("some", "tag")
+            time.sleep(0.06)
+
+    spans = _received(receiver, 2)
+    assert "fast" not in spans
+    assert spans["slow"][0].attributes["some"] == "tag"
+
+
+def test_trace_block_min_duration_nested(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root") as root:
+        with trace_block("outer_fast", min_duration=1):
+            with trace_block("inner_slow", min_duration=0.05):
+                time.sleep(0.06)
+        with trace_block("outer_slow", min_duration=0.05):
+            with trace_block("inner_fast", min_duration=0.05):
+                with pytest.raises(ValueError):
+                    with trace_block("innermost_failed", min_duration=0.05):
+                        raise ValueError("Failed")
+            with trace_block("child", min_duration=0.05):
+                time.sleep(0.06)
+
+    spans = _received(receiver, 5)
+    assert "outer_fast" not in spans
+    assert "inner_fast" not in spans
+    # The children of dropped blocks are moved to the parent of the block.
+    assert spans["inner_slow"][0].parent_span_id == root.span_id
+    (outer_slow,) = spans["outer_slow"]
+    assert outer_slow.parent_span_id == root.span_id
+    assert spans["innermost_failed"][0].parent_span_id == outer_slow.span_id
+    assert spans["child"][0].parent_span_id == outer_slow.span_id
+
+
+def test_trace_block_lazy() -> None:
+    with tracer.trace("root") as root:
+        block = trace_block("lazy")
+        # Nothing is started before the block is entered.
+        assert tracer.current_span() is root
+        with block as span:
+            assert tracer.current_span() is span
+        assert span.finished
+        assert tracer.current_span() is root
+
+
+@trace_block("decorated")
+def decorated_block() -> Span | None:
+    return tracer.current_span()
+
+
+def test_trace_block_decorator() -> None:
+    first, second = decorated_block(), decorated_block()
+
+    assert first is not None and second is not None
+    assert first.name == second.name == "decorated"
+    assert first is not second
+    assert first.finished
+
+
+def test_trace_block_untraced() -> None:
+    with tracer.trace("root") as root:
+        with trace_block("untraced", sample_rate=0) as first:
+            first.set_tag("some", "tag")
+            with trace_block("untraced", sample_rate=0) as second:
+                pass
+
+    # Blocks that are not traced get their own span, which is never recorded and
+    # carries the context of the active span.
+    assert second is not first
+    assert not first.finished
+    assert first.name == "untraced"
+    assert "some" not in second.get_tags()
+    assert first.context.trace_id == root.trace_id
+    assert first.context.span_id == root.span_id
+
+
+@trace_function
+def numbers(count: int, fail: bool = False) -> Generator[int, None, None]:
+    for i in range(count):
+        with trace_block("produce"):
+            pass
+        yield i
+    if fail:
+        raise ValueError("Failed")
+
+
+@trace_function
+async def async_numbers(count: int) -> AsyncGenerator[int, None]:
+    for i in range(count):
+        yield i
+
+
+@trace_function
+def echo() -> Generator[int, int, None]:
+    received = 0
+    while True:
+        received = yield received
+
+
+def test_generator(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root") as root:
+        for _ in numbers(3):
+            with trace_block("consume"):
+                pass
+
+    spans = _received(receiver, 8)
+    (generator,) = spans["numbers"]
+    assert generator.parent_span_id == root.span_id
+    assert generator.attributes["generator.items"] == 3
+    assert generator.attributes["generator.iteration_time"] >= 0
+    assert generator.attributes["generator.time_to_first_item"] >= 0
+    assert "generator.closed" not in generator.attributes
+    # The generator span is only active while the generator runs.
+    assert {s.parent_span_id for s in spans["produce"]} == {generator.span_id}
+    assert {s.parent_span_id for s in spans["consume"]} == {root.span_id}
+
+
+def test_generator_closed(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root"):
+        for _ in numbers(3):
+            break
+
+    spans = _received(receiver, 3)
+    (generator,) = spans["numbers"]
+    assert generator.attributes["generator.items"] == 1
+    assert generator.attributes["generator.closed"] == "true"
+
+
+def test_generator_error(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root"):
+        with pytest.raises(ValueError):
+            list(numbers(1, fail=True))
+
+    spans = _received(receiver, 3)
+    (generator,) = spans["numbers"]
+    # STATUS_CODE_ERROR
+    assert generator.status_code == 2
+
+
+def test_generator_send(receiver: OTLPReceiver) -> None:
+    with tracer.trace("root"):
+        generator = echo()
+        assert next(generator) == 0
+        assert generator.send(42) == 42
+        generator.close()
+
+    spans = _received(receiver, 2)
+    assert spans["echo"][0].attributes["generator.items"] == 2
+
+
+def test_async_generator(receiver: OTLPReceiver) -> None:
+    async def _consume() -> list[int]:
+        with tracer.trace("root"):
+            return [i async for i in async_numbers(3)]
+
+    assert asyncio.run(_consume()) == [0, 1, 2]
+
+    spans = _received(receiver, 2)
+    assert spans["async_numbers"][0].attributes["generator.items"] == 3
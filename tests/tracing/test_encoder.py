@@ -0,0 +1,116 @@
+from typing import Any
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._span import default_ignore_attrs, translate_span
+
+resource = Resource.create({"service.name": "test_service", "some": "attribute"})
+ignore_attrs = set(resource.attributes.keys()) | default_ignore_attrs()
+
+
+def _root_span() -> Span:
+    span = Span("django.request", service="test_service", resource="GET /")
+    span.set_tag("span.kind", "server")
+    span.set_tag("http.method", "GET")
+    span.set_metric("float_metric", 1.5)
+    span.set_metric("int_metric", -3)
+    return span
+
+
+def _child_span(parent: Span) -> Span:
+    span = Span(
+        "postgres.query",
+        service="postgres",
+        resource="SELECT 1",
+        trace_id=parent.trace_id,
+        parent_id=parent.span_id,
+    )
+    span._parent = parent
+    span.set_tag("span.kind", "client")
+    return span
+
+
+def _remote_child_span() -> Span:
+    return Span("remote", service="test_service", parent_id=1234, trace_id=2**100)
+
+
+def _error_span() -> Span:
+    span = Span("error", service="test_service")
+    try:
+        raise ValueError("Boom")
+    except ValueError as e:
+        span.set_exc_info(type(e), e, e.__traceback__)
+    return span
+
+
+def _many_attributes_span() -> Span:
+    span = Span("many", service="test_service")
+    for i in range(200):
+        span.set_tag(f"key.{i}", f"value.{i}")
+    return span
+
+
+def _encode_with_sdk(spans: list[Span]) -> ExportTraceServiceRequest:
+    request: ExportTraceServiceRequest = encode_spans(
+        [translate_span(span, resource, ignore_attrs) for span in spans]
+    )
+    return request
+
+
+def _encode_direct(spans: list[Span]) -> ExportTraceServiceRequest:
+    encoder = SpanEncoder(resource, ignore_attrs)
+    request: ExportTraceServiceRequest = ExportTraceServiceRequest.FromString(
+        encode_export_request(encoder.encode_span(span) for span in spans)
+    )
+    return request
+
+
+def _clear_event_times(request: ExportTraceServiceRequest) -> Any:
+    # Exception events are timestamped when they are translated
+    for resource_spans in request.resource_spans:
+        for scope_spans in resource_spans.scope_spans:
+            for span in scope_spans.spans:
+                for event in span.events:
+                    event.time_unix_nano = 0
+    return request
+
+
+@pytest.mark.parametrize(
+    "create_spans",
+    [
+        lambda: [_root_span()],
+        lambda: [(root := _root_span()), _child_span(root)],
+        lambda: [_remote_child_span()],
+        lambda: [_error_span()],
+        lambda: [_many_attributes_span()],
+    ],
+    ids=["root", "child", "remote_parent", "error", "many_attributes"],
+)
+def test_same_output_as_sdk(create_spans: Any) -> None:
+    spans = create_spans()
+    for span in spans:
+        span.finish()
+
+    expected = _clear_event_times(_encode_with_sdk(spans))
+    actual = _clear_event_times(_encode_direct(spans))
+
+    assert actual == expected
+    assert actual.SerializeToString() == expected.SerializeToString()
+
+
+def test_spans_grouped_by_resource() -> None:
+    root = _root_span()
+    spans = [root, _child_span(root), _child_span(root), _root_span()]
+    for span in spans:
+        span.finish()
+
+    request = _encode_direct(spans)
+
+    assert [len(rs.scope_spans[0].spans) for rs in request.resource_spans] == [2, 2]
@@ -0,0 +1,255 @@
+import gzip
+import socket
+import zlib
+from typing import Callable
+
+import pytest
+from ddtrace.trace import Span
+from pytest_httpserver import HTTPServer
+
+from troncos.tracing._exporter import Balancing, Compression, Exporter, ExporterType
+from troncos.tracing._otel import get_encoded_span_processor, get_payload_exporter
+from troncos.tracing._transport import (
+    HTTPPayloadExporter,
+    MultiPayloadExporter,
+    PayloadExporter,
+)
+from troncos.tracing._writer import OTELWriter
+
+
+def test_exporter_defaults() -> None:
+    exporter = Exporter()
+
+    assert exporter.compression == Compression.NONE
+    assert exporter.timeout == 10
+    assert exporter.max_queue_size == 2048
+    assert exporter.max_export_batch_size == 512
+    assert exporter.max_export_batch_bytes == 2097152
+    assert exporter.schedule_delay_millis == 5000
+    assert exporter.grpc_options == []
+
+
+def test_exporter_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OTEL_TRACE_COMPRESSION", "GZIP")
+    monkeypatch.setenv("OTEL_TRACE_EXPORT_TIMEOUT", "2.5")
+    monkeypatch.setenv("OTEL_TRACE_MAX_QUEUE_SIZE", "8192")
+    monkeypatch.setenv("OTEL_TRACE_MAX_EXPORT_BATCH_SIZE", "1024")
+    monkeypatch.setenv("OTEL_TRACE_SCHEDULE_DELAY", "1000")
+    monkeypatch.setenv("OTEL_TRACE_GRPC_KEEPALIVE_TIME", "30000")
+
+    exporter = Exporter(grpc_options=[("grpc.max_send_message_length", 1024)])
+
+    assert exporter.compression == Compression.GZIP
+    assert exporter.timeout == 2.5
+    assert exporter.max_queue_size == 8192
+    assert exporter.max_export_batch_size == 1024
+    assert exporter.schedule_delay_millis == 1000
+    assert exporter.grpc_options == [
+        ("grpc.max_send_message_length", 1024),
+        ("grpc.keepalive_time_ms", 30000),
+    ]
+
+    processor = get_encoded_span_processor(exporter=exporter)
+    assert processor.max_queue_size == 8192
+    assert processor.max_export_batch_size == 1024
+    assert processor.schedule_delay == 1
+    processor.shutdown()
+
+
+def test_exporter_batch_size_validation() -> None:
+    with pytest.raises(AssertionError):
+        Exporter(max_queue_size=10, max_export_batch_size=20)
+
+
+@pytest.mark.parametrize(
+    "compression, decompress",
+    [
+        (Compression.GZIP, gzip.decompress),
+        (Compression.DEFLATE, zlib.decompress),
+    ],
+)
+def test_http_compression(
+    httpserver: HTTPServer,
+    compression: Compression,
+    decompress: Callable[[bytes], bytes],
+) -> None:
+    httpserver.expect_request(
+        "/v1/trace", headers={"Content-Encoding": compression.value}
+    ).respond_with_data("OK")
+
+    exporter = HTTPPayloadExporter(
+        endpoint=httpserver.url_for("/v1/trace"), compression=compression
+    )
+    assert exporter.export(b"payload" * 100)
+
+    assert decompress(httpserver.log[0][0].data) == b"payload" * 100
+
+
+@pytest.mark.parametrize("fast_encoding", [False, True])
+def test_writer_compression(httpserver: HTTPServer, fast_encoding: bool) -> None:
+    httpserver.expect_request(
+        "/v1/trace", headers={"Content-Encoding": "gzip"}
+    ).respond_with_data("OK")
+
+    writer = OTELWriter(
+        enabled=True,
+        service_name="test_compression",
+        exporter=Exporter(
+            host=httpserver.host,
+            port=f"{httpserver.port}",
+            path="/v1/trace",
+            exporter_type=ExporterType.HTTP,
+            compression=Compression.GZIP,
+        ),
+        resource_attributes=None,
+        fast_encoding=fast_encoding,
+    )
+    span = Span("compressed", service="test_compression")
+    span.finish()
+    writer.write([span])
+    writer.stop()
+
+    assert len(httpserver.log) == 1
+    request, response = httpserver.log[0]
+    assert response.status_code == 200
+    assert b"compressed" in gzip.decompress(request.data)
+
+
+def test_grpc_options() -> None:
+    exporter = Exporter(
+        port="4317",
+        compression=Compression.GZIP,
+        grpc_keepalive_time_millis=30000,
+    )
+
+    # The channels connect lazily, so these can be built without a collector.
+    processor = get_encoded_span_processor(exporter=exporter)
+    processor.shutdown()
+    writer = OTELWriter(
+        enabled=True,
+        service_name="test_grpc_options",
+        exporter=exporter,
+        resource_attributes=None,
+    )
+    writer.stop()
+
+
+class _FakePayloadExporter(PayloadExporter):
+    def __init__(self, success: bool = True) -> None:
+        self.success = success
+        self.payloads: list[bytes] = []
+
+    def export(self, payload: bytes) -> bool:
+        self.payloads.append(payload)
+        return self.success
+
+
+def test_exporter_hosts(monkeypatch: pytest.MonkeyPatch) -> None:
+    exporter = Exporter(hosts=["collector-a", "collector-b:4000"])
+
+    assert exporter.endpoints == [
+        "http://collector-a:4318/v1/traces",
+        "http://collector-b:4000/v1/traces",
+    ]
+    assert exporter.endpoint == "http://collector-a:4318/v1/traces"
+    assert exporter.balancing == Balancing.ROUND_ROBIN
+    assert isinstance(get_payload_exporter(exporter=exporter), MultiPayloadExporter)
+
+    monkeypatch.setenv("OTEL_TRACE_HOSTS", "collector-c, collector-d")
+    monkeypatch.setenv("OTEL_TRACE_BALANCING", "FAILOVER")
+    exporter = Exporter()
+
+    assert exporter.endpoints == [
+        "http://collector-c:4318/v1/traces",
+        "http://collector-d:4318/v1/traces",
+    ]
+    assert exporter.balancing == Balancing.FAILOVER
+
+
+def test_round_robin() -> None:
+    exporters = [_FakePayloadExporter(), _FakePayloadExporter()]
+    multi = MultiPayloadExporter(list(exporters), Balancing.ROUND_ROBIN)
+
+    for i in range(4):
+        assert multi.export(f"{i}".encode())
+
+    assert exporters[0].payloads == [b"0", b"2"]
+    assert exporters[1].payloads == [b"1", b"3"]
+
+
+def test_least_outstanding() -> None:
+    exporters = [_FakePayloadExporter(), _FakePayloadExporter()]
+    multi = MultiPayloadExporter(list(exporters), Balancing.LEAST_OUTSTANDING)
+    multi._endpoints[0].outstanding = 2
+
+    assert multi.export(b"0")
+    assert multi.export(b"1")
+
+    assert exporters[0].payloads == []
+    assert exporters[1].payloads == [b"0", b"1"]
+
+
+def test_failover() -> None:
+    exporters = [_FakePayloadExporter(success=False), _FakePayloadExporter()]
+    multi = MultiPayloadExporter(list(exporters), Balancing.FAILOVER)
+
+    assert multi.export(b"0")
+    # The failed exporter is skipped while it backs off.
+    assert multi.export(b"1")
+
+    assert exporters[0].payloads == [b"0"]
+    assert exporters[1].payloads == [b"0", b"1"]
+    assert multi._endpoints[0].failures == 1
+
+    exporters[1].success = False
+    assert not multi.export(b"2")
+    assert exporters[0].payloads == [b"0", b"2"]
+
+
+def test_failover_timeout(httpserver: HTTPServer) -> None:
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+
+    # The connection is accepted by the backlog, but no response is ever sent.
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as saturated:
+        saturated.bind(("127.0.0.1", 0))
+        saturated.listen()
+        multi = MultiPayloadExporter(
+            [
+                HTTPPayloadExporter(
+                    endpoint=f"http://127.0.0.1:{saturated.getsockname()[1]}/v1/trace",
+                    timeout=0.2,
+                    max_retries=1,
+                ),
+                HTTPPayloadExporter(endpoint=httpserver.url_for("/v1/trace")),
+            ],
+            Balancing.FAILOVER,
+        )
+
+        assert multi.export(b"payload")
+
+    assert multi._endpoints[0].failures == 1
+    assert httpserver.log[0][0].data == b"payload"
+
+
+def test_writer_failover(httpserver: HTTPServer) -> None:
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+
+    writer = OTELWriter(
+        enabled=True,
+        service_name="test_failover",
+        exporter=Exporter(
+            # Nothing listens on port 1, so the export fails over.
+            hosts=["127.0.0.1:1", f"{httpserver.host}:{httpserver.port}"],
+            path="/v1/trace",
+            exporter_type=ExporterType.HTTP,
+            balancing=Balancing.FAILOVER,
+        ),
+        resource_attributes=None,
+    )
+    span = Span("failover", service="test_failover")
+    span.finish()
+    writer.write([span])
+    writer.stop()
+
+    assert len(httpserver.log) == 1
+    assert b"failover" in httpserver.log[0][0].data
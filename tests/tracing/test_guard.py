@@ -0,0 +1,86 @@
+from typing import Generator
+
+import pytest
+from ddtrace.trace import Span, tracer
+
+from troncos.tracing._guard import (
+    DROPPED_SPANS_ATTRIBUTE,
+    TraceGuard,
+    set_decorator_guard,
+)
+from troncos.tracing.decorators import trace_block
+
+
+def _trace(children: int) -> list[Span]:
+    root = Span("root", service="test_service")
+    spans = [root]
+    for i in range(children):
+        span = Span(
+            "child",
+            service="test_service",
+            resource=f"child {i}",
+            trace_id=root.trace_id,
+            parent_id=root.span_id,
+        )
+        span._parent = root
+        spans.append(span)
+    return spans
+
+
+def test_limit_within_budget() -> None:
+    spans = _trace(9)
+
+    assert TraceGuard(max_spans=10).limit(spans) is spans
+
+
+def test_limit_max_spans() -> None:
+    spans = _trace(20)
+
+    kept = TraceGuard(max_spans=10).limit(spans)
+
+    assert kept == spans[:10]
+    assert spans[0].get_metric(DROPPED_SPANS_ATTRIBUTE) == 11
+
+
+def test_limit_max_bytes() -> None:
+    spans = _trace(20)
+    for span in spans:
+        span.set_tag("db.statement", "x" * 1000)
+
+    kept = TraceGuard(max_spans=100, max_bytes=5000).limit(spans)
+
+    assert 1 < len(kept) < 6
+    assert spans[0].get_metric(DROPPED_SPANS_ATTRIBUTE) == len(spans) - len(kept)
+
+
+def test_limit_partial_flush() -> None:
+    guard = TraceGuard(max_spans=10)
+    spans = _trace(20)
+
+    first_chunk = guard.limit(spans[1:16])
+    last_chunk = guard.limit([*spans[16:], spans[0]])
+
+    assert first_chunk == spans[1:11]
+    assert last_chunk == [spans[0]]
+    assert spans[0].get_metric(DROPPED_SPANS_ATTRIBUTE) == 10
+    assert not guard._traces
+
+
+@pytest.fixture
+def decorator_guard() -> Generator[TraceGuard, None, None]:
+    guard = TraceGuard(max_spans=5)
+    set_decorator_guard(guard)
+    yield guard
+    set_decorator_guard(None)
+
+
+def test_decorator_guard(decorator_guard: TraceGuard) -> None:
+    with tracer.trace("root") as root:
+        blocks = []
+        for _ in range(10):
+            with trace_block("block") as span:
+                blocks.append(span)
+
+    assert all(span.duration_ns is not None for span in blocks[:5])
+    assert all(span.duration_ns is None for span in blocks[5:])
+    assert root.get_metric(DROPPED_SPANS_ATTRIBUTE) == 5
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+# Modules that are slow to import, and only needed once an enabled writer exports
+# spans.
+_LAZY_MODULES = [
+    "grpc",
+    "requests",
+    "opentelemetry.exporter.otlp.proto.http",
+    "opentelemetry.exporter.otlp.proto.grpc",
+    "opentelemetry.proto",
+    "opentelemetry.sdk.trace",
+]
+
+_SCRIPT = """
+import json
+import sys
+
+from troncos.tracing import configure_tracer
+
+configure_tracer(service_name="test_imports", enabled=False)
+
+print(json.dumps(sorted(
+    name for name in sys.modules
+    if any(name == lazy or name.startswith(lazy + ".") for lazy in {lazy_modules!r})
+)))
+"""
+
+
+def test_disabled_tracer_imports() -> None:
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(lazy_modules=_LAZY_MODULES)],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    assert json.loads(result.stdout.splitlines()[-1]) == []
@@ -0,0 +1,125 @@
+from typing import Any
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._limits import TRUNCATED_ATTRIBUTE, AttributeLimits
+from troncos.tracing._span import default_ignore_attrs, translate_span
+
+resource = Resource.create({"service.name": "test_service"})
+ignore_attrs = set(resource.attributes.keys()) | default_ignore_attrs()
+
+
+def _error_span() -> Span:
+    span = Span("postgres.query", service="test_service", resource="SELECT")
+    span.set_tag("db.statement", "SELECT " + "x" * 5000)
+    span.set_tag("short", "value")
+    span.set_metric("rows", 3)
+    span.set_tag("error.type", "ValueError")
+    span.set_tag("error.msg", "Boom")
+    span.set_tag("error.stack", "s" * 20000)
+    span.finish()
+    return span
+
+
+def test_untouched_below_limits() -> None:
+    limits = AttributeLimits(max_value_length=100, max_span_bytes=1000)
+    attributes = {"short": "value", "rows": 3}
+    error_attributes = {"exception.message": "Boom"}
+
+    limits.apply(attributes, error_attributes)
+
+    assert attributes == {"short": "value", "rows": 3}
+    assert error_attributes == {"exception.message": "Boom"}
+
+
+def test_max_value_length_and_key_limits() -> None:
+    limits = AttributeLimits(
+        max_value_length=10,
+        key_limits={"exception.stacktrace": 50, "db.statement": 20},
+    )
+    attributes = {"header": "h" * 100, "db.statement": "q" * 100, "rows": 3}
+    error_attributes = {"exception.stacktrace": "s" * 100}
+
+    limits.apply(attributes, error_attributes)
+
+    assert attributes["header"] == "h" * 10
+    assert attributes["db.statement"] == "q" * 20
+    assert attributes["rows"] == 3
+    assert attributes[TRUNCATED_ATTRIBUTE] is True
+    assert error_attributes["exception.stacktrace"] == "s" * 50
+
+
+def test_max_span_bytes_spreads_cut() -> None:
+    limits = AttributeLimits(max_span_bytes=400)
+    # `apply` marks the span with `True` next to the string values.
+    attributes: dict[str, Any] = {"a": "a" * 10, "b": "b" * 300}
+    error_attributes = {"c": "c" * 200}
+
+    limits.apply(attributes, error_attributes)
+
+    # The keys and the truncation marker count towards the limit.
+    budget = 400 - 3 - len(TRUNCATED_ATTRIBUTE) - 8
+    assert attributes["a"] == "a" * 10
+    assert len(attributes["b"]) == len(error_attributes["c"]) == (budget - 10) // 2
+    assert attributes[TRUNCATED_ATTRIBUTE] is True
+
+
+def test_max_span_bytes_keeps_prefix() -> None:
+    limits = AttributeLimits(max_span_bytes=10)
+    attributes: dict[str, Any] = {"short": "value"}
+    error_attributes = {"exception.stacktrace": "s" * 1000}
+
+    limits.apply(attributes, error_attributes)
+
+    assert attributes["short"] == "value"
+    assert error_attributes["exception.stacktrace"] == "s" * 128
+    assert attributes[TRUNCATED_ATTRIBUTE] is True
+
+
+def test_limits_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OTEL_TRACE_ATTRIBUTE_VALUE_LENGTH_LIMIT", "64")
+    monkeypatch.setenv("OTEL_TRACE_SPAN_BYTES_LIMIT", "4096")
+
+    limits = AttributeLimits()
+
+    assert limits.max_value_length == 64
+    assert limits.max_span_bytes == 4096
+
+
+def test_translate_span_with_limits() -> None:
+    limits = AttributeLimits(
+        max_value_length=1024,
+        key_limits={"exception.stacktrace": 8192, "db.statement": 2048},
+    )
+
+    otel_span = translate_span(_error_span(), resource, ignore_attrs, limits=limits)
+
+    assert otel_span.attributes is not None
+    assert len(otel_span.attributes["db.statement"]) == 2048  # type: ignore[arg-type]
+    assert otel_span.attributes["short"] == "value"
+    assert otel_span.attributes[TRUNCATED_ATTRIBUTE] is True
+    event_attributes = otel_span.events[0].attributes
+    assert event_attributes is not None
+    stacktrace = event_attributes["exception.stacktrace"]
+    assert len(stacktrace) == 8192  # type: ignore[arg-type]
+
+
+def test_encoder_with_limits() -> None:
+    limits = AttributeLimits(max_value_length=16, max_span_bytes=256)
+    encoder = SpanEncoder(resource, ignore_attrs, limits=limits)
+
+    request = ExportTraceServiceRequest.FromString(
+        encode_export_request([encoder.encode_span(_error_span())])
+    )
+
+    span = request.resource_spans[0].scope_spans[0].spans[0]
+    attributes = {attr.key: attr.value for attr in span.attributes}
+    assert len(attributes["db.statement"].string_value) <= 16
+    assert attributes[TRUNCATED_ATTRIBUTE].bool_value is True
+    assert span.ByteSize() < 1024
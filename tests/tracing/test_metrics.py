@@ -0,0 +1,202 @@
+import threading
+import urllib.request
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+    ExportMetricsServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from pytest_httpserver import HTTPServer
+
+from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._metrics import (
+    SelfMetrics,
+    encode_metrics_request,
+    get_tracing_metrics,
+    prometheus_text,
+    start_metrics_server,
+    tracing_metrics,
+)
+from troncos.tracing._sampling import TailSampler
+from troncos.tracing._writer import OTELWriter
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    tracing_metrics.reset()
+
+
+def _finished_span(name: str, sampling_priority: int | None = None) -> Span:
+    span = Span(name, service="test_metrics")
+    span.context.sampling_priority = sampling_priority
+    span.finish()
+    return span
+
+
+def _writer(
+    httpserver: HTTPServer,
+    *,
+    fast_encoding: bool = False,
+    tail_sampler: TailSampler | None = None,
+    self_metrics: SelfMetrics | None = None,
+) -> OTELWriter:
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+    return OTELWriter(
+        enabled=True,
+        service_name="test_metrics",
+        exporter=Exporter(
+            host=httpserver.host,
+            port=f"{httpserver.port}",
+            path="/v1/trace",
+            exporter_type=ExporterType.HTTP,
+        ),
+        resource_attributes=None,
+        fast_encoding=fast_encoding,
+        tail_sampler=tail_sampler,
+        self_metrics=self_metrics,
+    )
+
+
+def test_metrics_threads() -> None:
+    def _count() -> None:
+        for _ in range(1000):
+            tracing_metrics.add("spans_received")
+            tracing_metrics.record("export_batch_size", 1)
+
+    threads = [threading.Thread(target=_count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracing_metrics.add("spans_received")
+
+    # The counts of the exited threads are merged, and still counted afterwards.
+    for _ in range(2):
+        snapshot = get_tracing_metrics()
+        assert snapshot["spans_received"] == 4001
+        assert snapshot["export_batch_size"]["count"] == 4000
+
+
+@pytest.mark.parametrize("fast_encoding", [False, True])
+def test_writer_metrics(httpserver: HTTPServer, fast_encoding: bool) -> None:
+    writer = _writer(httpserver, fast_encoding=fast_encoding)
+    writer.write([_finished_span("kept"), _finished_span("kept")])
+    writer.write([_finished_span("rejected", sampling_priority=0)])
+    writer.flush_queue()
+
+    metrics = get_tracing_metrics()
+    assert metrics["spans_received"] == 3
+    assert metrics["spans_sampling_priority_filtered"] == 1
+    assert metrics["spans_translated"] == 2
+    assert metrics["spans_queued"] == 2
+    assert metrics["spans_exported"] == 2
+    assert metrics["spans_export_failed"] == 0
+    assert metrics["export_batch_size"]["count"] == 1
+    assert metrics["export_batch_size"]["sum"] == 2
+    assert metrics["translate_duration_seconds"]["count"] == 1
+
+    writer.stop()
+
+
+def test_tail_sampled_metrics(httpserver: HTTPServer) -> None:
+    writer = _writer(httpserver, tail_sampler=TailSampler(sample_rate=0))
+    writer.write([_finished_span("dropped"), _finished_span("dropped")])
+
+    metrics = get_tracing_metrics()
+    assert metrics["spans_tail_sampled"] == 2
+    assert metrics["spans_translated"] == 0
+
+    writer.stop()
+
+
+def test_export_failed_metrics(httpserver: HTTPServer) -> None:
+    httpserver.expect_request("/v1/trace").respond_with_data("Bad", status=400)
+    writer = _writer(httpserver, fast_encoding=True)
+    writer.write([_finished_span("failed")])
+    writer.flush_queue()
+
+    metrics = get_tracing_metrics()
+    assert metrics["spans_exported"] == 0
+    assert metrics["spans_export_failed"] == 1
+
+    writer.stop()
+
+
+def test_prometheus_text() -> None:
+    tracing_metrics.add("spans_received", 3)
+    tracing_metrics.record("export_batch_size", 10)
+
+    text = prometheus_text()
+    assert "# TYPE troncos_spans_received_total counter\n" in text
+    assert "troncos_spans_received_total 3\n" in text
+    assert "# TYPE troncos_export_batch_size histogram\n" in text
+    assert 'troncos_export_batch_size_bucket{le="8"} 0\n' in text
+    assert 'troncos_export_batch_size_bucket{le="32"} 1\n' in text
+    assert 'troncos_export_batch_size_bucket{le="+Inf"} 1\n' in text
+    assert "troncos_export_batch_size_count 1\n" in text
+
+
+def test_metrics_server() -> None:
+    tracing_metrics.add("spans_dropped", 5)
+    server = start_metrics_server(0, addr="127.0.0.1")
+    try:
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        ) as resp:
+            body = resp.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "troncos_spans_dropped_total 5\n" in body
+
+
+def test_encode_metrics_request() -> None:
+    tracing_metrics.add("spans_exported", 7)
+    tracing_metrics.record("export_duration_seconds", 0.003)
+
+    request = ExportMetricsServiceRequest.FromString(
+        encode_metrics_request(
+            get_tracing_metrics(),
+            Resource.create({"service.name": "test_metrics"}),
+            tracing_metrics.start_time_ns,
+        )
+    )
+
+    resource_metrics = request.resource_metrics[0]
+    resource_attributes = {
+        attr.key: attr.value.string_value
+        for attr in resource_metrics.resource.attributes
+    }
+    assert resource_attributes["service.name"] == "test_metrics"
+    metrics = {m.name: m for m in resource_metrics.scope_metrics[0].metrics}
+    assert metrics["troncos.spans_exported"].sum.data_points[0].as_int == 7
+    assert metrics["troncos.spans_exported"].sum.is_monotonic
+    duration = metrics["troncos.export_duration_seconds"].histogram.data_points[0]
+    assert duration.count == 1
+    assert sum(duration.bucket_counts) == 1
+
+
+def test_self_metrics_export(httpserver: HTTPServer) -> None:
+    httpserver.expect_request("/v1/metrics").respond_with_data("OK")
+    writer = _writer(
+        httpserver,
+        self_metrics=SelfMetrics(
+            exporter=Exporter(
+                host=httpserver.host,
+                port=f"{httpserver.port}",
+                path="/v1/metrics",
+                exporter_type=ExporterType.HTTP,
+            ),
+            interval=60,
+        ),
+    )
+    writer.write([_finished_span("test")])
+    writer.stop()
+
+    requests = [req for req, _ in httpserver.log if req.path == "/v1/metrics"]
+    assert len(requests) == 1
+    request = ExportMetricsServiceRequest.FromString(requests[0].data)
+    metrics = {m.name: m for m in request.resource_metrics[0].scope_metrics[0].metrics}
+    assert metrics["troncos.spans_received"].sum.data_points[0].as_int == 1
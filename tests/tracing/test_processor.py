@@ -0,0 +1,92 @@
+from troncos.tracing._encoder import EncodedSpan, encode_export_request
+from troncos.tracing._processor import EncodedBatchProcessor
+from troncos.tracing._transport import PayloadExporter
+
+
+class RecordingPayloadExporter(PayloadExporter):
+    def __init__(self) -> None:
+        self.payloads: list[bytes] = []
+
+    def export(self, payload: bytes) -> bool:
+        self.payloads.append(payload)
+        return True
+
+
+def _chunk(trace: int, count: int, size: int = 10) -> list[EncodedSpan]:
+    return [EncodedSpan(b"resource", bytes([trace]) * size) for _ in range(count)]
+
+
+def _processor(
+    payload_exporter: PayloadExporter, **kwargs: int
+) -> EncodedBatchProcessor:
+    return EncodedBatchProcessor(
+        payload_exporter, schedule_delay_millis=60_000, **kwargs
+    )
+
+
+def test_chunks_are_kept_together() -> None:
+    payload_exporter = RecordingPayloadExporter()
+    processor = _processor(payload_exporter, max_export_batch_size=5)
+    chunks = [_chunk(1, 3), _chunk(2, 1), _chunk(3, 3)]
+
+    for chunk in chunks:
+        processor.on_end(chunk)
+    processor.force_flush()
+
+    assert payload_exporter.payloads == [
+        encode_export_request(chunks[0] + chunks[1]),
+        encode_export_request(chunks[2]),
+    ]
+    processor.shutdown()
+
+
+def test_batches_are_sized_by_bytes() -> None:
+    payload_exporter = RecordingPayloadExporter()
+    processor = _processor(payload_exporter, max_export_batch_bytes=250)
+    chunks = [_chunk(1, 1, size=100), _chunk(2, 1), _chunk(3, 2, size=100)]
+
+    for chunk in chunks:
+        processor.on_end(chunk)
+    processor.force_flush()
+
+    assert payload_exporter.payloads == [
+        encode_export_request(chunks[0] + chunks[1]),
+        encode_export_request(chunks[2]),
+    ]
+    processor.shutdown()
+
+
+def test_large_chunks_are_split() -> None:
+    payload_exporter = RecordingPayloadExporter()
+    processor = _processor(payload_exporter, max_export_batch_size=4)
+    chunk = _chunk(1, 10)
+
+    processor.on_end(chunk)
+    processor.force_flush()
+
+    assert payload_exporter.payloads == [
+        encode_export_request(chunk[:4]),
+        encode_export_request(chunk[4:8]),
+        encode_export_request(chunk[8:]),
+    ]
+    assert processor._queued_spans == 0
+    assert processor._queued_bytes == 0
+    processor.shutdown()
+
+
+def test_max_queue_size() -> None:
+    payload_exporter = RecordingPayloadExporter()
+    processor = _processor(
+        payload_exporter, max_queue_size=10, max_export_batch_size=10
+    )
+    chunks = [_chunk(1, 8), _chunk(2, 8)]
+
+    for chunk in chunks:
+        processor.on_end(chunk)
+    processor.force_flush()
+
+    assert processor.dropped_spans == 6
+    assert payload_exporter.payloads == [
+        encode_export_request(chunks[0] + chunks[1][:2]),
+    ]
+    processor.shutdown()
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from ddtrace.trace import tracer
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+    ExportMetricsServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing import _replace_writer
+from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._profile import (
+    CallStatsAggregator,
+    FunctionProfile,
+    ProfileOutput,
+    encode_profile_request,
+    get_function_stats,
+)
+from troncos.tracing._writer import OTELWriter
+from troncos.tracing.decorators import trace_function
+from troncos.tracing.testing import OTLPReceiver
+
+resource = Resource.create({"service.name": "test_service"})
+
+
+def test_record() -> None:
+    aggregator = CallStatsAggregator()
+
+    aggregator.record("a", 1_000_000, False)
+    aggregator.record("a", 3_000_000, True)
+    aggregator.record("b", 500, False)
+
+    stats = {s.name: s for s in aggregator.snapshot()}
+    assert stats["a"].calls == 2
+    assert stats["a"].errors == 1
+    assert stats["a"].total_seconds == pytest.approx(0.004)
+    assert stats["a"].max_seconds == pytest.approx(0.003)
+    assert sum(stats["a"].bucket_counts) == 2
+    assert stats["b"].calls == 1
+    assert stats["b"].errors == 0
+
+
+def test_record_threads() -> None:
+    aggregator = CallStatsAggregator()
+
+    def _record() -> None:
+        for _ in range(1000):
+            aggregator.record("a", 1000, False)
+
+    threads = [threading.Thread(target=_record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    aggregator.record("a", 1000, False)
+
+    # The tables of the exited threads are merged, and still counted afterwards.
+    (stats,) = aggregator.snapshot()
+    assert stats.calls == 4001
+    (stats,) = aggregator.snapshot()
+    assert stats.calls == 4001
+
+
+@trace_function(profile=True)
+def profiled(seconds: float = 0, fail: bool = False) -> str:
+    time.sleep(seconds)
+    if fail:
+        raise ValueError("Failed")
+    return "result"
+
+
+@trace_function(profile=True)
+async def profiled_async() -> str:
+    return "result"
+
+
+def _stats(name: str) -> tuple[int, int]:
+    for s in get_function_stats():
+        if s.name == name:
+            return s.calls, s.errors
+    return 0, 0
+
+
+def test_profile_decorator() -> None:
+    name = f"{__name__}.profiled"
+    calls, errors = _stats(name)
+
+    with tracer.trace("root") as root:
+        assert profiled() == "result"
+        with pytest.raises(ValueError):
+            profiled(fail=True)
+        # No spans are created for profiled functions.
+        assert tracer.current_span() is root
+
+    assert _stats(name) == (calls + 2, errors + 1)
+
+
+def test_profile_decorator_async() -> None:
+    name = f"{__name__}.profiled_async"
+    calls, _ = _stats(name)
+
+    assert asyncio.run(profiled_async()) == "result"
+
+    assert _stats(name) == (calls + 1, 0)
+
+
+def test_get_function_stats_top() -> None:
+    profiled(0.01)
+
+    (top,) = get_function_stats(top=1)
+    assert top.name == f"{__name__}.profiled"
+
+
+def test_encode_profile_request() -> None:
+    aggregator = CallStatsAggregator()
+    aggregator.record("a", 2_000_000, False)
+    aggregator.record("a", 2_000_000, True)
+
+    request = ExportMetricsServiceRequest.FromString(
+        encode_profile_request(
+            aggregator.snapshot(), resource, aggregator.start_time_ns
+        )
+    )
+
+    (resource_metrics,) = request.resource_metrics
+    assert resource_metrics.resource.attributes[0].value.string_value
+    metrics = {m.name: m for m in resource_metrics.scope_metrics[0].metrics}
+    (calls,) = metrics["troncos.function.calls"].sum.data_points
+    assert calls.attributes[0].key == "function"
+    assert calls.attributes[0].value.string_value == "a"
+    assert calls.as_int == 2
+    assert metrics["troncos.function.errors"].sum.data_points[0].as_int == 1
+    (duration,) = metrics["troncos.function.duration"].histogram.data_points
+    assert duration.count == 2
+    assert duration.sum == pytest.approx(0.004)
+
+
+def test_writer_exports_profile_metrics() -> None:
+    with OTLPReceiver() as receiver:
+        exporter = Exporter(
+            host="127.0.0.1",
+            port=f"{receiver.http_port}",
+            path="/v1/traces",
+            exporter_type=ExporterType.HTTP,
+        )
+        writer = OTELWriter(
+            enabled=True,
+            service_name="test_profile",
+            exporter=exporter,
+            resource_attributes=None,
+            function_profile=FunctionProfile(
+                exporter=Exporter(
+                    host="127.0.0.1",
+                    port=f"{receiver.http_port}",
+                    path="/v1/metrics",
+                    exporter_type=ExporterType.HTTP,
+                ),
+                interval=60,
+            ),
+        )
+        profiled()
+        writer.stop()
+
+        (request,) = receiver.metrics_requests
+        names = {m.name for m in request.resource_metrics[0].scope_metrics[0].metrics}
+        assert "troncos.function.calls" in names
+
+
+def test_writer_creates_summary_span() -> None:
+    with OTLPReceiver() as receiver:
+        writer = OTELWriter(
+            enabled=True,
+            service_name="test_profile",
+            exporter=Exporter(
+                host="127.0.0.1",
+                port=f"{receiver.http_port}",
+                path="/v1/traces",
+                exporter_type=ExporterType.HTTP,
+            ),
+            resource_attributes=None,
+            function_profile=FunctionProfile(
+                interval=60, output=ProfileOutput.SPAN, top=1
+            ),
+        )
+        _replace_writer(tracer, writer)
+        profiled()
+        # The tracer uses a recreated writer.
+        active_writer = tracer._span_aggregator.writer
+        assert isinstance(active_writer, OTELWriter)
+        assert active_writer.function_profile_reporter is not None
+        active_writer.function_profile_reporter.shutdown()
+        tracer.flush()  # type: ignore[no-untyped-call]
+
+        assert receiver.wait_for_spans(1)
+        (span,) = receiver.spans
+        assert span.name == "troncos.function_profile"
+        assert span.attributes[f"function.{__name__}.profiled.calls"] == 1
@@ -0,0 +1,95 @@
+from typing import Generator
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._exporter import Compression, Exporter, ExporterType
+from troncos.tracing._span import default_ignore_attrs
+from troncos.tracing._transport import GRPCPayloadExporter, HTTPPayloadExporter
+from troncos.tracing._writer import OTELWriter
+from troncos.tracing.testing import OTLPReceiver
+
+resource = Resource.create({"service.name": "test_service"})
+
+
+@pytest.fixture
+def receiver() -> Generator[OTLPReceiver, None, None]:
+    with OTLPReceiver(grpc=True) as receiver:
+        yield receiver
+
+
+def _payload() -> bytes:
+    span = Span("test", service="test_service", resource="GET /")
+    span.set_tag("http.method", "GET")
+    span.finish()
+    encoder = SpanEncoder(resource, default_ignore_attrs())
+    return encode_export_request([encoder.encode_span(span)])
+
+
+def test_writer_spans(receiver: OTLPReceiver) -> None:
+    writer = OTELWriter(
+        enabled=True,
+        service_name="test_service",
+        exporter=Exporter(
+            host="127.0.0.1",
+            port=f"{receiver.http_port}",
+            path="/v1/traces",
+            exporter_type=ExporterType.HTTP,
+            compression=Compression.GZIP,
+        ),
+        resource_attributes={"app": "test"},
+    )
+    span = Span("test", service="test_service", resource="GET /")
+    span.set_tag("http.method", "GET")
+    span.finish()
+    writer.write([span])
+    writer.stop()
+
+    assert receiver.wait_for_spans(1)
+    (received,) = receiver.spans
+    assert received.service_name == "test_service"
+    assert received.name == "test"
+    assert received.span_id == span.span_id
+    assert received.attributes["http.method"] == "GET"
+    assert received.resource_attributes["app"] == "test"
+    assert receiver.spans_per_second() > 0
+
+
+def test_failed_requests_are_retried(receiver: OTLPReceiver) -> None:
+    receiver.fail_requests = 1
+    receiver.failure_status = 429
+    payload_exporter = HTTPPayloadExporter(endpoint=receiver.http_endpoint)
+
+    assert payload_exporter.export(_payload())
+    assert receiver.failed_requests == 1
+    assert receiver.received_spans == 1
+    payload_exporter.shutdown()
+
+
+def test_failed_requests_are_not_retried(receiver: OTLPReceiver) -> None:
+    receiver.fail_requests = 2
+    receiver.failure_status = 400
+    payload_exporter = HTTPPayloadExporter(endpoint=receiver.http_endpoint)
+
+    assert not payload_exporter.export(_payload())
+    assert receiver.failed_requests == 1
+    assert not receiver.spans
+    payload_exporter.shutdown()
+
+
+def test_grpc(receiver: OTLPReceiver) -> None:
+    payload_exporter = GRPCPayloadExporter(
+        endpoint=receiver.grpc_endpoint, compression=Compression.GZIP
+    )
+
+    assert payload_exporter.export(_payload())
+    receiver.fail_requests = 1
+    assert not GRPCPayloadExporter(
+        endpoint=receiver.grpc_endpoint, max_retries=1
+    ).export(_payload())
+    payload_exporter.shutdown()
+
+    assert [span.name for span in receiver.spans] == ["test"]
+    assert receiver.failed_requests == 1
@@ -0,0 +1,83 @@
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._rules import REDACTED_VALUE, AttributeDecision, AttributeRules
+from troncos.tracing._span import default_ignore_attrs, translate_span
+
+resource = Resource.create({"service.name": "test_service"})
+ignore_attrs = set(resource.attributes.keys()) | default_ignore_attrs()
+
+rules = AttributeRules(
+    deny=["component"],
+    deny_prefixes=["celery."],
+    rename={"http.status_code": "http.response.status_code"},
+    redact=["http.request.headers.authorization"],
+)
+
+
+def _span() -> Span:
+    span = Span("django.request", service="test_service", resource="GET /")
+    span.set_tag("component", "django")
+    span.set_tag("celery.delivery_info", "{}")
+    span.set_tag("http.status_code", "200")
+    span.set_tag("http.request.headers.authorization", "Bearer secret")
+    span.set_tag("http.method", "GET")
+    span.set_tag("error.msg", "Boom")
+    span.finish()
+    return span
+
+
+def test_decide() -> None:
+    assert rules.decide("component") is None
+    assert rules.decide("celery.task") is None
+    assert rules.decide("http.status_code") == AttributeDecision(
+        "http.response.status_code", False
+    )
+    assert rules.decide("http.request.headers.authorization") == AttributeDecision(
+        "http.request.headers.authorization", True
+    )
+    assert rules.decide("http.method") == AttributeDecision("http.method", False)
+    assert "http.method" in rules._decisions
+
+
+def test_allow() -> None:
+    allow_rules = AttributeRules(
+        allow=["resource"], allow_prefixes=["http."], deny=["http.useragent"]
+    )
+
+    assert allow_rules.decide("resource") is not None
+    assert allow_rules.decide("http.method") is not None
+    assert allow_rules.decide("http.useragent") is None
+    assert allow_rules.decide("component") is None
+
+
+def test_translate_span_with_rules() -> None:
+    otel_span = translate_span(_span(), resource, ignore_attrs, rules=rules)
+
+    assert dict(otel_span.attributes or {}) == {
+        "http.response.status_code": "200",
+        "http.request.headers.authorization": REDACTED_VALUE,
+        "http.method": "GET",
+        "resource": "GET /",
+    }
+    assert otel_span.events[0].attributes == {"exception.message": "Boom"}
+
+
+def test_encoder_with_rules() -> None:
+    encoder = SpanEncoder(resource, ignore_attrs, rules=rules)
+
+    request = ExportTraceServiceRequest.FromString(
+        encode_export_request([encoder.encode_span(_span())])
+    )
+
+    span = request.resource_spans[0].scope_spans[0].spans[0]
+    assert {attr.key: attr.value.string_value for attr in span.attributes} == {
+        "http.response.status_code": "200",
+        "http.request.headers.authorization": REDACTED_VALUE,
+        "http.method": "GET",
+        "resource": "GET /",
+    }
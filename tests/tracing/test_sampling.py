@@ -0,0 +1,85 @@
+import pytest
+from ddtrace.trace import Span
+
+from troncos.tracing._sampling import TailSampler, TailSamplingRule
+
+
+def _trace(
+    duration: float = 0.01,
+    error: bool = False,
+    resource: str = "GET /",
+    trace_id: int | None = None,
+) -> list[Span]:
+    root = Span("django.request", service="test", resource=resource, trace_id=trace_id)
+    child = Span("child", trace_id=root.trace_id, parent_id=root.span_id)
+    child._parent = root
+    child._local_root = root
+    child.error = int(error)
+
+    child.finish()
+    root.finish(root.start + duration)
+    return [child, root]
+
+
+def _kept_ratio(sampler: TailSampler) -> float:
+    traces = [_trace() for _ in range(2000)]
+    return sum(sampler.sample(trace) for trace in traces) / len(traces)
+
+
+def test_keep_all_by_default() -> None:
+    assert _kept_ratio(TailSampler()) == 1
+
+
+def test_sample_rate() -> None:
+    assert 0.2 < _kept_ratio(TailSampler(sample_rate=0.25)) < 0.3
+
+
+def test_sample_rate_zero() -> None:
+    assert _kept_ratio(TailSampler(sample_rate=0)) == 0
+
+
+def test_sampling_is_deterministic_per_trace() -> None:
+    sampler = TailSampler(sample_rate=0.5)
+    decisions = {sampler.sample(_trace(trace_id=1234)) for _ in range(10)}
+
+    assert len(decisions) == 1
+
+
+@pytest.mark.parametrize("keep_errors", [True, False])
+def test_keep_errors(keep_errors: bool) -> None:
+    sampler = TailSampler(sample_rate=0, keep_errors=keep_errors)
+
+    assert sampler.sample(_trace(error=True)) is keep_errors
+
+
+def test_slow_threshold() -> None:
+    sampler = TailSampler(sample_rate=0, slow_threshold=0.5)
+
+    assert sampler.sample(_trace(duration=1)) is True
+    assert sampler.sample(_trace(duration=0.1)) is False
+
+
+def test_rules() -> None:
+    sampler = TailSampler(
+        sample_rate=0,
+        rules=[
+            TailSamplingRule(resource="GET /health*", sample_rate=0),
+            TailSamplingRule(resource="POST /orders/*", slow_threshold=0.05),
+            TailSamplingRule(service="test", name="django.*", sample_rate=1),
+        ],
+    )
+
+    assert sampler.sample(_trace(resource="GET /health/ready", duration=1)) is False
+    assert sampler.sample(_trace(resource="POST /orders/123", duration=0.1)) is True
+    assert sampler.sample(_trace(resource="POST /orders/123", duration=0.01)) is False
+    assert sampler.sample(_trace(resource="GET /products")) is True
+
+
+def test_sampling_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OTEL_TRACE_TAIL_SAMPLE_RATE", "0.1")
+    monkeypatch.setenv("OTEL_TRACE_TAIL_SLOW_THRESHOLD", "2.5")
+
+    sampler = TailSampler()
+
+    assert sampler.sample_rate == 0.1
+    assert sampler.slow_threshold == 2.5
@@ -0,0 +1,215 @@
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Generator
+
+import pytest
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from pytest_httpserver import HTTPServer
+
+from troncos.tracing._encoder import SpanEncoder, encode_export_request
+from troncos.tracing._exporter import Exporter, ExporterType, SharedExporter
+from troncos.tracing._shared import (
+    PayloadBatcher,
+    SharedExporterServer,
+    create_shared_exporter_server,
+    start_shared_exporter,
+)
+from troncos.tracing._transport import PayloadExporter
+from troncos.tracing._writer import OTELWriter
+
+
+class CollectingExporter(PayloadExporter):
+    def __init__(self) -> None:
+        self.payloads: list[bytes] = []
+
+    def export(self, payload: bytes) -> bool:
+        self.payloads.append(payload)
+        return True
+
+
+def _payload(service: str, *names: str) -> bytes:
+    encoder = SpanEncoder(Resource.create({"service.name": service}), set())
+    spans = []
+    for name in names:
+        span = Span(name, service=service)
+        span.finish()
+        spans.append(encoder.encode_span(span))
+    return encode_export_request(spans)
+
+
+def _span_names(payload: bytes) -> list[str]:
+    request = ExportTraceServiceRequest.FromString(payload)
+    return [
+        span.name
+        for resource_spans in request.resource_spans
+        for scope_spans in resource_spans.scope_spans
+        for span in scope_spans.spans
+    ]
+
+
+def _exporter(httpserver: HTTPServer) -> Exporter:
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+    return Exporter(
+        host=httpserver.host,
+        port=f"{httpserver.port}",
+        path="/v1/trace",
+        exporter_type=ExporterType.HTTP,
+    )
+
+
+def test_batcher_merges_payloads() -> None:
+    exporter = CollectingExporter()
+    batcher = PayloadBatcher(
+        exporter, schedule_delay_millis=60_000, max_payload_bytes=1_000_000
+    )
+    batcher.add(_payload("worker_1", "a", "b"))
+    batcher.add(_payload("worker_2", "c"))
+    batcher.shutdown()
+
+    assert len(exporter.payloads) == 1
+    assert _span_names(exporter.payloads[0]) == ["a", "b", "c"]
+
+
+def test_batcher_max_payload_bytes() -> None:
+    payload = _payload("worker", "a")
+    exporter = CollectingExporter()
+    batcher = PayloadBatcher(
+        exporter,
+        schedule_delay_millis=60_000,
+        max_payload_bytes=2 * len(payload),
+    )
+    for _ in range(5):
+        batcher.add(payload)
+    batcher.shutdown()
+
+    assert [len(_span_names(p)) for p in exporter.payloads] == [2, 2, 1]
+
+
+def test_batcher_max_buffered_bytes() -> None:
+    payloads = [_payload("worker", f"{i}") for i in range(5)]
+    exporter = CollectingExporter()
+    batcher = PayloadBatcher(
+        exporter,
+        schedule_delay_millis=60_000,
+        max_payload_bytes=1_000_000,
+        max_buffered_bytes=2 * len(payloads[0]),
+    )
+    for payload in payloads:
+        batcher.add(payload)
+    batcher.shutdown()
+
+    # The oldest payloads are dropped.
+    assert batcher.dropped_payloads == 3
+    assert [_span_names(p) for p in exporter.payloads] == [["3", "4"]]
+
+
+@pytest.fixture
+def shared_server(
+    httpserver: HTTPServer, tmp_path: Path
+) -> Generator[SharedExporterServer, None, None]:
+    server = create_shared_exporter_server(
+        exporter=_exporter(httpserver),
+        shared_exporter=SharedExporter(
+            socket_path=str(tmp_path / "exporter.sock"), schedule_delay_millis=60_000
+        ),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    server.batcher.shutdown()
+
+
+def test_shared_exporter(
+    httpserver: HTTPServer, shared_server: SharedExporterServer
+) -> None:
+    writers = [
+        OTELWriter(
+            enabled=True,
+            service_name=f"worker_{i}",
+            exporter=Exporter(),
+            resource_attributes=None,
+            shared_exporter=SharedExporter(socket_path=shared_server.socket_path),
+        )
+        for i in range(2)
+    ]
+    for i, writer in enumerate(writers):
+        span = Span(f"span_{i}", service=f"worker_{i}")
+        span.finish()
+        writer.write([span])
+        writer.stop()
+
+    # The payloads are read by the connection threads of the server.
+    deadline = time.monotonic() + 5
+    while len(shared_server.batcher._payloads) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    shared_server.batcher.flush()
+
+    assert len(httpserver.log) == 1
+    request = ExportTraceServiceRequest.FromString(httpserver.log[0][0].data)
+    assert sorted(
+        (
+            {
+                attr.key: attr.value.string_value
+                for attr in resource_spans.resource.attributes
+            }["service.name"],
+            resource_spans.scope_spans[0].spans[0].name,
+        )
+        for resource_spans in request.resource_spans
+    ) == [("worker_0", "span_0"), ("worker_1", "span_1")]
+
+
+def test_server_closes_with_partial_payload(
+    shared_server: SharedExporterServer,
+) -> None:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(shared_server.socket_path)
+        # The header of a payload that never arrives.
+        client.sendall(b"\x00\x00\x01\x00")
+        time.sleep(0.1)
+
+        closed = threading.Event()
+
+        def _close() -> None:
+            shared_server.shutdown()
+            shared_server.server_close()
+            closed.set()
+
+        threading.Thread(target=_close, daemon=True).start()
+        assert closed.wait(5)
+
+
+def test_start_shared_exporter(httpserver: HTTPServer, tmp_path: Path) -> None:
+    shared_exporter = SharedExporter(socket_path=str(tmp_path / "exporter.sock"))
+    process = start_shared_exporter(
+        exporter=_exporter(httpserver), shared_exporter=shared_exporter
+    )
+
+    writer = OTELWriter(
+        enabled=True,
+        service_name="worker",
+        exporter=Exporter(),
+        resource_attributes=None,
+        shared_exporter=shared_exporter,
+    )
+    span = Span("span", service="worker")
+    span.finish()
+    writer.write([span])
+    writer.stop()
+
+    # The exporter process flushes on SIGTERM.
+    process.terminate()
+    process.join(10)
+
+    assert process.exitcode == 0
+    assert len(httpserver.log) == 1
+    assert _span_names(httpserver.log[0][0].data) == ["span"]
@@ -0,0 +1,91 @@
+import threading
+
+from ddtrace.trace import Span
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.resources import Resource
+
+from troncos.tracing._span import ResourceCache, default_ignore_attrs, translate_span
+
+resource = Resource.create({"service.name": "test_service", "some": "attribute"})
+
+
+def _span(service: str) -> Span:
+    span = Span("test", service=service)
+    span.finish()
+    return span
+
+
+def test_resource_cache() -> None:
+    resources = ResourceCache(resource)
+
+    assert resources.get("test_service") is resources.default_resource
+    assert resources.get(None) is resources.default_resource
+    assert resources.default_resource == resource
+    assert hash(resources.default_resource) == hash(resource)
+
+    postgres = resources.get("postgres")
+    assert postgres is resources.get("postgres")
+    assert postgres.attributes["service.name"] == "postgres"
+    assert postgres.attributes["some"] == "attribute"
+
+
+def test_resource_cache_eviction() -> None:
+    resources = ResourceCache(resource, max_size=2)
+
+    first = resources.get("service_1")
+    resources.get("service_2")
+    resources.get("service_3")
+
+    assert len(resources._resources) == 2
+    assert resources.get("service_1") is not first
+    assert resources.get("service_1") == first
+
+
+def test_resource_cache_threads() -> None:
+    resources = ResourceCache(resource, max_size=8)
+    errors: list[Exception] = []
+
+    def _get() -> None:
+        try:
+            for i in range(2000):
+                assert (
+                    resources.get(f"service_{i % 16}").attributes["service.name"]
+                    == f"service_{i % 16}"
+                )
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(resources._resources) <= 8
+
+
+def test_grouped_by_resource() -> None:
+    resources = ResourceCache(resource)
+    spans = [
+        translate_span(
+            _span(service),
+            resource,
+            default_ignore_attrs(),
+            resources=resources,
+        )
+        for service in ["test_service", "postgres", "redis", "postgres", "redis"]
+    ]
+
+    request = encode_spans(spans)
+    assert sorted(
+        (
+            next(
+                attr.value.string_value
+                for attr in resource_spans.resource.attributes
+                if attr.key == "service.name"
+            ),
+            len(resource_spans.scope_spans[0].spans),
+        )
+        for resource_spans in request.resource_spans
+    ) == [("postgres", 2), ("redis", 2), ("test_service", 1)]
@@ -0,0 +1,157 @@
+from typing import Any
+
+from ddtrace.trace import Span
+from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+    ExportMetricsServiceRequest,
+)
+from opentelemetry.sdk.resources import Resource
+from pytest_httpserver import HTTPServer
+
+from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._sampling import TailSampler
+from troncos.tracing._span import ResourceCache
+from troncos.tracing._spanmetrics import (
+    _OVERFLOW_KEY,
+    SeriesKey,
+    SpanMetrics,
+    SpanMetricsAggregator,
+)
+from troncos.tracing._writer import OTELWriter
+
+resource = Resource.create({"service.name": "test_service"})
+
+
+def _finished_span(
+    name: str,
+    service: str = "test_service",
+    resource: str = "GET /",
+    error: bool = False,
+    sampling_priority: int | None = None,
+) -> Span:
+    span = Span(name, service=service, resource=resource)
+    span.set_tag("span.kind", "server")
+    span.context.sampling_priority = sampling_priority
+    if error:
+        span.error = 1
+    span.finish()
+    return span
+
+
+def _aggregator(max_series: int = 100) -> SpanMetricsAggregator:
+    return SpanMetricsAggregator(
+        SpanMetrics(interval=60, max_series=max_series), ResourceCache(resource)
+    )
+
+
+def test_record() -> None:
+    aggregator = _aggregator()
+
+    aggregator.record(
+        [
+            _finished_span("django.request"),
+            _finished_span("django.request"),
+            _finished_span("django.request", error=True),
+            _finished_span("postgres.query", service="postgres", resource="SELECT"),
+        ]
+    )
+
+    snapshot = aggregator.snapshot()
+    ok = SeriesKey("test_service", "django.request", "GET /", "SERVER", False)
+    error = SeriesKey("test_service", "django.request", "GET /", "SERVER", True)
+    postgres = SeriesKey("postgres", "postgres.query", "SELECT", "SERVER", False)
+    assert set(snapshot) == {ok, error, postgres}
+    calls, duration = snapshot[ok]
+    assert calls == 2
+    assert duration.count == 2
+    assert sum(duration.bucket_counts) == 2
+    assert snapshot[error][0] == 1
+
+
+def test_max_series() -> None:
+    aggregator = _aggregator(max_series=2)
+
+    aggregator.record([_finished_span(f"span.{i}") for i in range(5)])
+
+    snapshot = aggregator.snapshot()
+    assert len(snapshot) == 3
+    assert snapshot[_OVERFLOW_KEY][0] == 3
+
+
+def test_encode_request() -> None:
+    aggregator = _aggregator()
+    aggregator.record(
+        [
+            _finished_span("django.request", error=True),
+            _finished_span("postgres.query", service="postgres", resource="SELECT"),
+        ]
+    )
+
+    request = ExportMetricsServiceRequest.FromString(aggregator.encode_request())
+
+    by_service: dict[str, dict[str, Any]] = {}
+    for resource_metrics in request.resource_metrics:
+        service = next(
+            attr.value.string_value
+            for attr in resource_metrics.resource.attributes
+            if attr.key == "service.name"
+        )
+        by_service[service] = {
+            m.name: m for m in resource_metrics.scope_metrics[0].metrics
+        }
+
+    assert set(by_service) == {"test_service", "postgres"}
+    calls = by_service["test_service"]["traces.span.metrics.calls"].sum
+    assert calls.is_monotonic
+    assert calls.data_points[0].as_int == 1
+    assert {
+        attr.key: attr.value.string_value for attr in calls.data_points[0].attributes
+    } == {
+        "span.name": "django.request",
+        "span.kind": "SPAN_KIND_SERVER",
+        "resource": "GET /",
+        "status.code": "STATUS_CODE_ERROR",
+    }
+    duration = by_service["postgres"]["traces.span.metrics.duration"].histogram
+    assert duration.data_points[0].count == 1
+
+
+def test_span_metrics_before_sampling(httpserver: HTTPServer) -> None:
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+    httpserver.expect_request("/v1/metrics").respond_with_data("OK")
+    writer = OTELWriter(
+        enabled=True,
+        service_name="test_service",
+        exporter=Exporter(
+            host=httpserver.host,
+            port=f"{httpserver.port}",
+            path="/v1/trace",
+            exporter_type=ExporterType.HTTP,
+        ),
+        resource_attributes=None,
+        tail_sampler=TailSampler(sample_rate=0, keep_errors=False),
+        span_metrics=SpanMetrics(
+            exporter=Exporter(
+                host=httpserver.host,
+                port=f"{httpserver.port}",
+                path="/v1/metrics",
+                exporter_type=ExporterType.HTTP,
+            ),
+            interval=60,
+        ),
+    )
+    writer.write([_finished_span("dropped", sampling_priority=0)])
+    writer.write([_finished_span("tail_sampled")])
+    writer.stop()
+
+    requests = [req for req, _ in httpserver.log if req.path == "/v1/metrics"]
+    assert len(requests) == 1
+    assert not [req for req, _ in httpserver.log if req.path == "/v1/trace"]
+    request = ExportMetricsServiceRequest.FromString(requests[0].data)
+    metrics = {m.name: m for m in request.resource_metrics[0].scope_metrics[0].metrics}
+    assert (
+        sum(
+            point.as_int
+            for point in metrics["traces.span.metrics.calls"].sum.data_points
+        )
+        == 2
+    )
@@ -0,0 +1,178 @@
+import fcntl
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from ddtrace.trace import Span
+from pytest_httpserver import HTTPServer
+
+from troncos.tracing._exporter import Exporter, ExporterType, Spool
+from troncos.tracing._spool import SegmentSpool, SpoolingPayloadExporter
+from troncos.tracing._transport import PayloadExporter
+from troncos.tracing._writer import OTELWriter
+
+
+class FlakyExporter(PayloadExporter):
+    def __init__(
+        self,
+        *,
+        available: bool = True,
+        fail_after: int | None = None,
+        raises: bool = False,
+    ) -> None:
+        self.available = available
+        self.fail_after = fail_after
+        self.raises = raises
+        self.payloads: list[bytes] = []
+
+    def export(self, payload: bytes) -> bool:
+        if not self.available or (
+            self.fail_after is not None and len(self.payloads) >= self.fail_after
+        ):
+            if self.raises:
+                raise TimeoutError("Timed out")
+            return False
+        self.payloads.append(payload)
+        return True
+
+
+def _spool(tmp_path: Path, **kwargs: int) -> Spool:
+    return Spool(directory=str(tmp_path), retry_interval=0.01, **kwargs)
+
+
+def _wait_for(condition: Callable[[], object], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_replay_in_order(tmp_path: Path) -> None:
+    spool = SegmentSpool(_spool(tmp_path, segment_bytes=10))
+    for i in range(5):
+        spool.append(f"payload_{i}".encode())
+    assert len(spool.segments()) == 5
+
+    exporter = FlakyExporter()
+    assert spool.replay(exporter.export)
+    assert exporter.payloads == [f"payload_{i}".encode() for i in range(5)]
+    assert spool.segments() == []
+
+
+def test_replay_resumes_after_failure(tmp_path: Path) -> None:
+    spool = SegmentSpool(_spool(tmp_path))
+    for i in range(4):
+        spool.append(f"payload_{i}".encode())
+
+    exporter = FlakyExporter(fail_after=2)
+    assert not spool.replay(exporter.export)
+    assert len(spool.segments()) == 1
+
+    exporter.fail_after = None
+    assert spool.replay(exporter.export)
+    assert exporter.payloads == [f"payload_{i}".encode() for i in range(4)]
+
+
+def test_evicts_oldest_segments(tmp_path: Path) -> None:
+    spool = SegmentSpool(_spool(tmp_path, segment_bytes=10, max_bytes=30))
+    for i in range(6):
+        spool.append(f"payload_{i}".encode())
+
+    assert sum(os.path.getsize(path) for path in spool.segments()) <= 30
+
+    exporter = FlakyExporter()
+    spool.replay(exporter.export)
+    assert exporter.payloads == [b"payload_4", b"payload_5"]
+
+
+def test_skips_locked_segments(tmp_path: Path) -> None:
+    spool = SegmentSpool(_spool(tmp_path))
+    spool.append(b"payload")
+    spool.close()
+
+    # Another process replaying the segment.
+    with open(spool.segments()[0], "rb") as segment:
+        fcntl.flock(segment, fcntl.LOCK_EX)
+        exporter = FlakyExporter()
+        assert spool.replay(exporter.export)
+        assert exporter.payloads == []
+        assert len(spool.segments()) == 1
+
+
+def test_spooling_exporter(tmp_path: Path) -> None:
+    collector = FlakyExporter(available=False)
+    exporter = SpoolingPayloadExporter(collector, _spool(tmp_path))
+
+    assert exporter.export(b"payload_1")
+    assert exporter.export(b"payload_2")
+    assert collector.payloads == []
+    assert len(exporter.segments.segments()) == 1
+
+    collector.available = True
+    _wait_for(lambda: len(collector.payloads) == 2)
+    assert collector.payloads == [b"payload_1", b"payload_2"]
+    assert exporter.segments.segments() == []
+
+    assert exporter.export(b"payload_3")
+    assert collector.payloads[-1] == b"payload_3"
+
+    exporter.shutdown()
+
+
+def test_spooling_exporter_raises(tmp_path: Path) -> None:
+    collector = FlakyExporter(available=False, raises=True)
+    exporter = SpoolingPayloadExporter(collector, _spool(tmp_path))
+
+    assert exporter.export(b"payload_1")
+    assert len(exporter.segments.segments()) == 1
+    # Replaying keeps the payload while the exporter raises.
+    time.sleep(0.05)
+    assert len(exporter.segments.segments()) == 1
+
+    collector.available = True
+    _wait_for(lambda: collector.payloads)
+    assert collector.payloads == [b"payload_1"]
+
+    exporter.shutdown()
+
+
+def test_spooling_replays_earlier_segments(tmp_path: Path) -> None:
+    spool = SegmentSpool(_spool(tmp_path))
+    spool.append(b"left_behind")
+    spool.close()
+
+    collector = FlakyExporter()
+    exporter = SpoolingPayloadExporter(collector, _spool(tmp_path))
+    _wait_for(lambda: collector.payloads)
+    assert collector.payloads == [b"left_behind"]
+
+    exporter.shutdown()
+
+
+def test_writer_spool(httpserver: HTTPServer, tmp_path: Path) -> None:
+    httpserver.expect_oneshot_request("/v1/trace").respond_with_data("", status=500)
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+
+    writer = OTELWriter(
+        enabled=True,
+        service_name="test_spool",
+        exporter=Exporter(
+            host=httpserver.host,
+            port=f"{httpserver.port}",
+            path="/v1/trace",
+            exporter_type=ExporterType.HTTP,
+            spool=_spool(tmp_path),
+        ),
+        resource_attributes=None,
+    )
+    span = Span("spooled", service="test_spool")
+    span.finish()
+    writer.write([span])
+    writer.flush_queue()
+
+    _wait_for(lambda: len(httpserver.log) == 2)
+    writer.stop()
+
+    assert [res.status_code for _, res in httpserver.log] == [500, 200]
+    assert httpserver.log[0][0].data == httpserver.log[1][0].data
+    assert b"spooled" in httpserver.log[1][0].data
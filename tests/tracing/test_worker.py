@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+from ddtrace.trace import Span
+
+from troncos.tracing._worker import BackgroundWorker, DropPolicy, SpanQueue
+
+
+def _chunk(size: int) -> list[Span]:
+    return [Span(f"span.{i}") for i in range(size)]
+
+
+class BlockedProcessor:
+    """Collects processed chunks, but waits until it is released."""
+
+    def __init__(self) -> None:
+        self.released = threading.Event()
+        self.started = threading.Event()
+        self.processed: list[list[Span]] = []
+
+    def __call__(self, spans: list[Span]) -> None:
+        self.started.set()
+        self.released.wait()
+        self.processed.append(spans)
+
+
+def _blocked_queue(
+    drop_policy: DropPolicy, max_queue_size: int = 4
+) -> tuple[SpanQueue, BlockedProcessor]:
+    processor = BlockedProcessor()
+    queue = SpanQueue(
+        processor,
+        BackgroundWorker(
+            max_queue_size=max_queue_size,
+            drop_policy=drop_policy,
+            block_timeout=0.01,
+        ),
+    )
+
+    # Keep the worker busy with the first chunk
+    queue.put(_chunk(1))
+    assert processor.started.wait(1)
+
+    return queue, processor
+
+
+def _processed_names(processor: BlockedProcessor) -> list[list[str]]:
+    return [[span.name for span in chunk] for chunk in processor.processed]
+
+
+def test_queue_processes_spans() -> None:
+    processed: list[list[Span]] = []
+    queue = SpanQueue(processed.append, BackgroundWorker())
+
+    spans = _chunk(3)
+    queue.put(spans)
+    queue.stop()
+
+    assert processed == [spans]
+    assert queue.dropped_spans == 0
+
+
+def test_queue_flush() -> None:
+    processed: list[list[Span]] = []
+    queue = SpanQueue(processed.append, BackgroundWorker())
+
+    queue.put(_chunk(2))
+    queue.flush()
+
+    assert len(processed) == 1
+    queue.stop()
+
+
+@pytest.mark.parametrize("drop_policy", [DropPolicy.DROP_NEWEST, DropPolicy.BLOCK])
+def test_queue_drop_newest(drop_policy: DropPolicy) -> None:
+    queue, processor = _blocked_queue(drop_policy)
+
+    first, second = _chunk(3), _chunk(2)
+    queue.put(first)
+    queue.put(second)
+
+    assert queue.dropped_spans == 2
+
+    processor.released.set()
+    queue.stop()
+
+    assert processor.processed[1:] == [first]
+
+
+def test_queue_drop_oldest() -> None:
+    queue, processor = _blocked_queue(DropPolicy.DROP_OLDEST)
+
+    first, second, third = _chunk(3), _chunk(1), _chunk(2)
+    queue.put(first)
+    queue.put(second)
+    queue.put(third)
+
+    assert queue.dropped_spans == 3
+
+    processor.released.set()
+    queue.stop()
+
+    assert processor.processed[1:] == [second, third]
+
+
+def test_queue_block_waits_for_room() -> None:
+    queue, processor = _blocked_queue(DropPolicy.BLOCK, max_queue_size=2)
+    queue.block_timeout = 5
+
+    queue.put(_chunk(2))
+    threading.Timer(0.05, processor.released.set).start()
+    queue.put(_chunk(2))
+
+    queue.stop()
+
+    assert queue.dropped_spans == 0
+    assert len(processor.processed) == 3
+
+
+def test_queue_drops_chunks_larger_than_queue() -> None:
+    queue, processor = _blocked_queue(DropPolicy.DROP_OLDEST)
+
+    kept = _chunk(2)
+    queue.put(kept)
+    queue.put(_chunk(5))
+
+    assert queue.dropped_spans == 5
+
+    processor.released.set()
+    queue.stop()
+
+    assert processor.processed[1:] == [kept]
@@ -1,3 +1,4 @@
+import threading
 from contextlib import contextmanager
 from typing import Any, Generator
 
@@ -5,8 +6,11 @@ from ddtrace.trace import tracer, Tracer
 from pytest_httpserver import HTTPServer
 
 from troncos.tracing._exporter import Exporter, ExporterType
+from troncos.tracing._metrics import SelfMetrics
+from troncos.tracing._sampling import TailSampler
+from troncos.tracing._worker import BackgroundWorker
 from troncos.tracing._writer import OTELWriter
-from troncos.tracing import _replace_writer
+from troncos.tracing import _replace_writer, configure_tracer
 
 
 @contextmanager
@@ -14,6 +18,10 @@ def tracer_test(
     httpserver: HTTPServer,
     service_name: str,
     resource_attributes: dict[str, Any] | None = None,
+    *,
+    fast_encoding: bool = False,
+    background_worker: BackgroundWorker | None = None,
+    tail_sampler: TailSampler | None = None,
 ) -> Generator[Tracer, Any, Any]:
     httpserver.expect_request("/v1/trace").respond_with_data("OK")
 
@@ -29,6 +37,9 @@ def tracer_test(
             exporter_type=ExporterType.HTTP,
         ),
         resource_attributes=resource_attributes,
+        fast_encoding=fast_encoding,
+        background_worker=background_worker,
+        tail_sampler=tail_sampler,
     )
 
     _replace_writer(tracer, writer)
@@ -87,6 +98,61 @@ def test_exceptions(httpserver: HTTPServer) -> None:
     assert b"exception.type\x12\x19\n\x17builtins.AssertionError" in data
 
 
+def test_fast_encoding(httpserver: HTTPServer) -> None:
+    with tracer_test(
+        httpserver,
+        "test_fast_encoding",
+        resource_attributes={"resource_attribute": "working"},
+        fast_encoding=True,
+    ) as tracer:
+        with tracer.trace("test", service="test_fast_encoding") as span:
+            span.set_tag("span_attribute", "also_working")
+        try:
+            with tracer.trace("test", service="test_fast_encoding"):
+                raise AssertionError("TestFailure")
+        except AssertionError:
+            pass
+
+    data = tracer_assert(httpserver)
+    assert b"service.name\x12\x14\n\x12test_fast_encoding" in data
+    assert b"resource_attribute\x12\t\n\x07working" in data
+    assert b"span_attribute\x12\x0e\n\x0calso_working" in data
+    assert b"exception.type\x12\x19\n\x17builtins.AssertionError" in data
+
+
+def test_background_worker(httpserver: HTTPServer) -> None:
+    with tracer_test(
+        httpserver,
+        "test_background_worker",
+        background_worker=BackgroundWorker(),
+    ) as tracer:
+        with tracer.trace("test", service="test_background_worker") as span:
+            span.set_tag("span_attribute", "also_working")
+
+    data = tracer_assert(httpserver)
+    assert b"service.name\x12\x18\n\x16test_background_worker" in data
+    assert b"span_attribute\x12\x0e\n\x0calso_working" in data
+
+
+def test_tail_sampling(httpserver: HTTPServer) -> None:
+    with tracer_test(
+        httpserver,
+        "test_tail_sampling",
+        tail_sampler=TailSampler(sample_rate=0),
+    ) as tracer:
+        with tracer.trace("dropped", service="test_tail_sampling"):
+            pass
+        try:
+            with tracer.trace("kept", service="test_tail_sampling"):
+                raise AssertionError("TestFailure")
+        except AssertionError:
+            pass
+
+    data = tracer_assert(httpserver)
+    assert b"kept" in data
+    assert b"dropped" not in data
+
+
 def test_headers(httpserver: HTTPServer) -> None:
     httpserver.expect_request("/v1/trace").respond_with_data("OK")
     httpserver.expect_request("/v1/trace/custom-header").respond_with_data("OK")
@@ -151,3 +217,41 @@ def test_writer_disabled(httpserver: HTTPServer) -> None:
     ]
 
     assert not relevant_requests, "We should have gotten 0 request"
+
+
+def _troncos_threads() -> list[str]:
+    return sorted(
+        thread.name
+        for thread in threading.enumerate()
+        if thread.name.startswith("troncos.")
+    )
+
+
+def test_recreate_stops_previous_writer(httpserver: HTTPServer) -> None:
+    httpserver.expect_request("/v1/trace").respond_with_data("OK")
+    exporter = Exporter(
+        host=httpserver.host,
+        port=f"{httpserver.port}",
+        path="/v1/trace",
+        exporter_type=ExporterType.HTTP,
+    )
+
+    def _configure() -> None:
+        configure_tracer(
+            service_name="test",
+            exporter=exporter,
+            fast_encoding=True,
+            background_worker=BackgroundWorker(),
+            self_metrics=SelfMetrics(exporter=exporter, interval=60),
+        )
+
+    _configure()
+    threads = _troncos_threads()
+    assert "troncos.EncodedBatchProcessor" in threads
+    assert "troncos.MetricsReporter" in threads
+    assert "troncos.SpanQueue" in threads
+
+    # The workers of replaced writers are stopped.
+    _configure()
+    _configure()
+    assert _troncos_threads() == threads
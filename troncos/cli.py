@@ -0,0 +1,151 @@
+import argparse
+import os
+import subprocess
+import sys
+from urllib.parse import urlparse
+
+from troncos.tracing._exporter import Compression, ExporterType
+
+
+def _capture(args: argparse.Namespace) -> int:
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        print("troncos capture: a command to run is required", file=sys.stderr)
+        return 2
+
+    # The processes of the command append to the file, start with an empty one.
+    open(args.output, "wb").close()
+    env = {**os.environ, "OTEL_TRACE_CAPTURE_FILE": os.path.abspath(args.output)}
+    return subprocess.call(command, env=env)
+
+
+def _replay(args: argparse.Namespace) -> int:
+    from troncos.tracing._capture import multiply_payloads, read_capture, replay
+    from troncos.tracing._transport import (
+        GRPCPayloadExporter,
+        HTTPPayloadExporter,
+        PayloadExporter,
+    )
+
+    compression = Compression(args.compression)
+    if args.exporter_type is not None:
+        exporter_type = ExporterType(args.exporter_type)
+    else:
+        exporter_type = (
+            ExporterType.GRPC
+            if urlparse(args.endpoint).port == 4317
+            else ExporterType.HTTP
+        )
+    headers = dict(header.split("=", 1) for header in args.header)
+
+    payloads = list(read_capture(args.file))
+    if args.multiply > 1:
+        payloads = multiply_payloads(payloads, args.multiply)
+
+    # Every request is sent once, so the latencies are not skewed by retries.
+    payload_exporter: PayloadExporter
+    if exporter_type == ExporterType.GRPC:
+        payload_exporter = GRPCPayloadExporter(
+            endpoint=args.endpoint,
+            headers=headers,
+            timeout=args.timeout,
+            compression=compression,
+            max_retries=1,
+        )
+    else:
+        payload_exporter = HTTPPayloadExporter(
+            endpoint=args.endpoint,
+            headers=headers,
+            timeout=args.timeout,
+            compression=compression,
+            max_retries=1,
+        )
+
+    try:
+        report = replay(
+            payloads,
+            payload_exporter,
+            rate=args.rate,
+            concurrency=args.concurrency,
+        )
+    finally:
+        payload_exporter.shutdown()
+
+    duration = max(report.duration, 1e-9)
+    print(f"requests:  {report.requests} ({report.failed} failed)")
+    print(f"spans:     {report.spans} ({report.spans / duration:.1f}/s)")
+    print(
+        f"bytes:     {report.bytes} ({report.bytes / duration / 1024 / 1024:.2f} MiB/s)"
+    )
+    print(f"duration:  {report.duration:.3f}s")
+    print(
+        "latency:   "
+        + " ".join(
+            f"p{int(quantile * 100)}={report.latency(quantile) * 1000:.1f}ms"
+            for quantile in (0.5, 0.9, 0.99)
+        )
+        + f" max={report.latency(1) * 1000:.1f}ms"
+    )
+    return 1 if report.failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="troncos")
+    subparsers = parser.add_subparsers(required=True)
+
+    capture = subparsers.add_parser(
+        "capture",
+        help="Run a command and record the trace export requests of its writers.",
+    )
+    capture.add_argument("output", help="The capture file to write.")
+    capture.add_argument(
+        "command", nargs=argparse.REMAINDER, help="The command to run, after '--'."
+    )
+    capture.set_defaults(func=_capture)
+
+    replay = subparsers.add_parser(
+        "replay", help="Send the requests of a capture file to an OTLP endpoint."
+    )
+    replay.add_argument("file", help="The capture file to replay.")
+    replay.add_argument(
+        "--endpoint",
+        default="http://localhost:4318/v1/traces",
+        help="The OTLP endpoint (default: %(default)s).",
+    )
+    replay.add_argument(
+        "--exporter-type",
+        choices=[exporter_type.value for exporter_type in ExporterType],
+        help="http or grpc, defaults to grpc for port 4317 and http otherwise.",
+    )
+    replay.add_argument(
+        "--compression",
+        choices=[compression.value for compression in Compression],
+        default=Compression.NONE.value,
+    )
+    replay.add_argument(
+        "--header",
+        action="append",
+        default=[],
+        help="A header to send, as 'name=value'. Can be repeated.",
+    )
+    replay.add_argument(
+        "--rate",
+        type=float,
+        help="Requests per second, as fast as possible when not set.",
+    )
+    replay.add_argument(
+        "--multiply",
+        type=int,
+        default=1,
+        help="Replay the traces this many times, with fresh trace and span ids.",
+    )
+    replay.add_argument("--concurrency", type=int, default=1)
+    replay.add_argument("--timeout", type=float, default=10.0)
+    replay.set_defaults(func=_replay)
+
+    args = parser.parse_args(argv)
+    return int(args.func(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,63 @@
+import os
 from typing import Any
 
 from ddtrace.trace import tracer, Tracer
 from ddtrace.internal.service import ServiceStatusError
-from ._exporter import Exporter, ExporterType
+from ._autotrace import AutoTrace, install_import_hook, uninstall_import_hook
+from ._coalescing import SpanCoalescer
+from ._exporter import (
+    Balancing,
+    Compression,
+    Exporter,
+    ExporterType,
+    SharedExporter,
+    Spool,
+)
+from ._guard import TraceGuard, set_decorator_guard
+from ._limits import AttributeLimits
+from ._rules import AttributeRules
+from ._metrics import (
+    SelfMetrics,
+    get_tracing_metrics,
+    prometheus_text,
+    start_metrics_server,
+)
+from ._profile import FunctionProfile, ProfileOutput, get_function_stats
+from ._sampling import TailSampler, TailSamplingRule
+from ._shared import start_shared_exporter
+from ._spanmetrics import SpanMetrics
+from ._worker import BackgroundWorker, DropPolicy
 from ._writer import OTELWriter
+from .decorators import set_decorators_enabled
 
-__all__ = ["Exporter", "ExporterType", "configure_tracer", "create_trace_writer"]
+__all__ = [
+    "AttributeLimits",
+    "AttributeRules",
+    "AutoTrace",
+    "BackgroundWorker",
+    "Balancing",
+    "Compression",
+    "DropPolicy",
+    "Exporter",
+    "ExporterType",
+    "FunctionProfile",
+    "ProfileOutput",
+    "SelfMetrics",
+    "SharedExporter",
+    "SpanCoalescer",
+    "SpanMetrics",
+    "Spool",
+    "TailSampler",
+    "TailSamplingRule",
+    "TraceGuard",
+    "configure_tracer",
+    "create_trace_writer",
+    "get_function_stats",
+    "get_tracing_metrics",
+    "prometheus_text",
+    "start_metrics_server",
+    "start_shared_exporter",
+]
 
 
 def create_trace_writer(
@@ -14,6 +66,17 @@ def create_trace_writer(
     service_name: str,
     exporter: Exporter | None = None,
     resource_attributes: dict[str, Any] | None = None,
+    fast_encoding: bool = False,
+    background_worker: BackgroundWorker | None = None,
+    tail_sampler: TailSampler | None = None,
+    self_metrics: SelfMetrics | None = None,
+    shared_exporter: SharedExporter | None = None,
+    attribute_limits: AttributeLimits | None = None,
+    attribute_rules: AttributeRules | None = None,
+    span_metrics: SpanMetrics | None = None,
+    span_coalescer: SpanCoalescer | None = None,
+    trace_guard: TraceGuard | None = None,
+    function_profile: FunctionProfile | None = None,
 ) -> OTELWriter:
     """Create a trace writer that writes traces to the otel tracing backend."""
 
@@ -26,6 +89,17 @@ def create_trace_writer(
         service_name=service_name,
         exporter=exporter,
         resource_attributes=resource_attributes,
+        fast_encoding=fast_encoding,
+        background_worker=background_worker,
+        tail_sampler=tail_sampler,
+        self_metrics=self_metrics,
+        shared_exporter=shared_exporter,
+        attribute_limits=attribute_limits,
+        attribute_rules=attribute_rules,
+        span_metrics=span_metrics,
+        span_coalescer=span_coalescer,
+        trace_guard=trace_guard,
+        function_profile=function_profile,
     )
 
 
@@ -49,6 +123,18 @@ def configure_tracer(
     exporter: Exporter | None = None,
     resource_attributes: dict[str, Any] | None = None,
     enabled: bool = True,
+    fast_encoding: bool = False,
+    background_worker: BackgroundWorker | None = None,
+    tail_sampler: TailSampler | None = None,
+    self_metrics: SelfMetrics | None = None,
+    shared_exporter: SharedExporter | None = None,
+    attribute_limits: AttributeLimits | None = None,
+    attribute_rules: AttributeRules | None = None,
+    span_metrics: SpanMetrics | None = None,
+    span_coalescer: SpanCoalescer | None = None,
+    trace_guard: TraceGuard | None = None,
+    function_profile: FunctionProfile | None = None,
+    auto_trace: AutoTrace | None = None,
 ) -> None:
     """Configure ddtrace to write traces to the otel tracing backend."""
 
@@ -57,6 +143,35 @@ def configure_tracer(
         exporter=exporter,
         resource_attributes=resource_attributes,
         enabled=enabled,
+        fast_encoding=fast_encoding,
+        background_worker=background_worker,
+        tail_sampler=tail_sampler,
+        self_metrics=self_metrics,
+        shared_exporter=shared_exporter,
+        attribute_limits=attribute_limits,
+        attribute_rules=attribute_rules,
+        span_metrics=span_metrics,
+        span_coalescer=span_coalescer,
+        trace_guard=trace_guard,
+        function_profile=function_profile,
     )
 
     _replace_writer(tracer, writer)
+
+    # The decorators stop creating the spans of runaway traces early.
+    set_decorator_guard(
+        trace_guard if trace_guard and trace_guard.guard_decorators else None
+    )
+
+    # A disabled writer drops all spans, so the decorators skip creating them. Spans
+    # of unsampled traces are still needed when span metrics are aggregated.
+    set_decorators_enabled(enabled, skip_unsampled=span_metrics is None)
+
+    # Matching modules are traced as they are imported, also when only the
+    # environment variable is set.
+    if auto_trace is None and os.environ.get("OTEL_TRACE_AUTO_INCLUDE"):
+        auto_trace = AutoTrace()
+    if enabled and auto_trace is not None:
+        install_import_hook(auto_trace)
+    else:
+        uninstall_import_hook()
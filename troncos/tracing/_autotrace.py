@@ -0,0 +1,166 @@
+import importlib.abc
+import os
+import re
+import sys
+from fnmatch import translate
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+from typing import Any, Sequence
+
+from structlog import get_logger
+
+from .decorators import _trace_scope
+
+logger = get_logger()
+
+# Tracing the tracer would recurse.
+_ALWAYS_EXCLUDE = ["ddtrace", "ddtrace.*", "troncos", "troncos.*"]
+
+
+def _patterns_from_env(name: str) -> list[str]:
+    value = os.environ.get(name, "")
+    return [pattern.strip() for pattern in value.split(",") if pattern.strip()]
+
+
+def _compile(patterns: Sequence[str]) -> re.Pattern[str] | None:
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{translate(pattern)})" for pattern in patterns))
+
+
+class AutoTrace:
+    """
+    Configuration for tracing the public functions and methods of modules matching
+    the `include` glob patterns, like `myapp.services.*`, as they are imported.
+    Modules matching an `exclude` pattern, and functions and classes decorated with
+    `trace_ignore`, are left alone. The other options are those of `trace_function`.
+    """
+
+    def __init__(
+        self,
+        *,
+        include: Sequence[str] | None = None,
+        exclude: Sequence[str] | None = None,
+        sample_rate: float | None = None,
+        sample_every: int | None = None,
+        min_duration: float | None = None,
+        profile: bool = False,
+    ) -> None:
+        if include is None:
+            include = _patterns_from_env("OTEL_TRACE_AUTO_INCLUDE")
+        if exclude is None:
+            exclude = _patterns_from_env("OTEL_TRACE_AUTO_EXCLUDE")
+
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.sample_rate = sample_rate
+        self.sample_every = sample_every
+        self.min_duration = min_duration
+        self.profile = profile
+
+        # The patterns are matched once per imported module, as one regex each.
+        self._include = _compile(self.include)
+        self._exclude = _compile([*_ALWAYS_EXCLUDE, *self.exclude])
+
+    def matches(self, module_name: str) -> bool:
+        return (
+            self._include is not None
+            and self._include.match(module_name) is not None
+            and (self._exclude is None or self._exclude.match(module_name) is None)
+        )
+
+    def instrument(self, module: ModuleType) -> None:
+        """Trace the public functions and classes defined in the module."""
+
+        try:
+            _trace_scope(
+                vars(module),
+                trace_classes=True,
+                sample_rate=self.sample_rate,
+                sample_every=self.sample_every,
+                min_duration=self.min_duration,
+                profile=self.profile,
+            )
+        except Exception:
+            logger.exception("Exception while tracing module", module=module.__name__)
+
+
+class _TracingLoader(importlib.abc.Loader):
+    """Wraps the loader of a module, and traces the module once it is executed."""
+
+    def __init__(self, loader: importlib.abc.Loader, auto_trace: AutoTrace) -> None:
+        self._loader = loader
+        self._auto_trace = auto_trace
+
+    def __getattr__(self, name: str) -> Any:
+        # `get_source`, `is_package` and the like of the wrapped loader.
+        return getattr(self._loader, name)
+
+    def create_module(self, spec: ModuleSpec) -> ModuleType | None:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self._loader.exec_module(module)
+        self._auto_trace.instrument(module)
+
+
+class _ImportHook(importlib.abc.MetaPathFinder):
+    """
+    Finds the specs of modules matching the `AutoTrace` patterns with the other
+    finders, and wraps their loaders. Other modules are not touched.
+    """
+
+    def __init__(self, auto_trace: AutoTrace) -> None:
+        self.auto_trace = auto_trace
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Sequence[str] | None,
+        target: ModuleType | None = None,
+    ) -> ModuleSpec | None:
+        if not self.auto_trace.matches(fullname):
+            return None
+
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TracingLoader(spec.loader, self.auto_trace)
+        return spec
+
+
+_import_hook: _ImportHook | None = None
+
+
+def install_import_hook(auto_trace: AutoTrace) -> None:
+    """
+    Trace the modules matching `auto_trace` from now on. Matching modules that are
+    already imported are traced right away, but references to their functions
+    imported elsewhere still point to the untraced functions.
+    """
+
+    global _import_hook  # noqa: PLW0603
+    uninstall_import_hook()
+
+    _import_hook = _ImportHook(auto_trace)
+    sys.meta_path.insert(0, _import_hook)
+
+    for name, module in list(sys.modules.items()):
+        if module is not None and auto_trace.matches(name):
+            auto_trace.instrument(module)
+
+
+def uninstall_import_hook() -> None:
+    """Stop tracing modules as they are imported. Traced functions stay traced."""
+
+    global _import_hook  # noqa: PLW0603
+    if _import_hook is not None and _import_hook in sys.meta_path:
+        sys.meta_path.remove(_import_hook)
+    _import_hook = None
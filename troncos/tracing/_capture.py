@@ -0,0 +1,190 @@
+import os
+import struct
+import threading
+import time
+from typing import Iterator, NamedTuple
+
+from ._transport import PayloadExporter, frame_payload
+
+_HEADER = struct.Struct(">I")
+
+
+class CapturingPayloadExporter(PayloadExporter):
+    """
+    Appends every export request to a capture file before exporting it. The file
+    holds length prefixed `ExportTraceServiceRequest` messages, and can be replayed
+    with `troncos replay`.
+    """
+
+    def __init__(self, payload_exporter: PayloadExporter, path: str) -> None:
+        self.payload_exporter = payload_exporter
+        self.path = path
+        # Every request is appended with one write, so forked processes can share
+        # the file without mixing up their requests.
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def export(self, payload: bytes) -> bool:
+        os.write(self._fd, frame_payload(payload))
+        return self.payload_exporter.export(payload)
+
+    def shutdown(self) -> None:
+        self.payload_exporter.shutdown()
+        os.close(self._fd)
+
+
+def read_capture(path: str) -> Iterator[bytes]:
+    """Yields the export requests stored in a capture file."""
+
+    with open(path, "rb") as file:
+        while header := file.read(_HEADER.size):
+            # The last request of a process that was killed mid write is cut
+            # short, in its header or its payload.
+            if len(header) < _HEADER.size:
+                return
+            (size,) = _HEADER.unpack(header)
+            payload = file.read(size)
+            if len(payload) < size:
+                return
+            yield payload
+
+
+class _IdRewriter:
+    """
+    Gives the traces and spans of export requests fresh random ids. Ids seen before
+    get the same new id, so traces split over several requests stay intact.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[bytes, bytes] = {}
+
+    def _new_id(self, old_id: bytes) -> bytes:
+        if not old_id:
+            return old_id
+        if (new_id := self._ids.get(old_id)) is None:
+            new_id = self._ids[old_id] = os.urandom(len(old_id))
+        return new_id
+
+    def rewrite(self, payload: bytes) -> bytes:
+        from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+            ExportTraceServiceRequest,
+        )
+
+        request = ExportTraceServiceRequest.FromString(payload)
+        for resource_spans in request.resource_spans:
+            for scope_spans in resource_spans.scope_spans:
+                for span in scope_spans.spans:
+                    span.trace_id = self._new_id(span.trace_id)
+                    span.span_id = self._new_id(span.span_id)
+                    span.parent_span_id = self._new_id(span.parent_span_id)
+                    for link in span.links:
+                        link.trace_id = self._new_id(link.trace_id)
+                        link.span_id = self._new_id(link.span_id)
+        return bytes(request.SerializeToString())
+
+
+def multiply_payloads(payloads: list[bytes], copies: int) -> list[bytes]:
+    """
+    Returns `copies` copies of the export requests, each with fresh trace and span
+    ids, so the copies are stored as separate traces.
+    """
+
+    assert copies > 0, "'copies' has to be positive"
+
+    multiplied: list[bytes] = []
+    for _ in range(copies):
+        rewriter = _IdRewriter()
+        multiplied.extend(rewriter.rewrite(payload) for payload in payloads)
+    return multiplied
+
+
+def count_spans(payload: bytes) -> int:
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+        ExportTraceServiceRequest,
+    )
+
+    request = ExportTraceServiceRequest.FromString(payload)
+    return sum(
+        len(scope_spans.spans)
+        for resource_spans in request.resource_spans
+        for scope_spans in resource_spans.scope_spans
+    )
+
+
+class ReplayReport(NamedTuple):
+    requests: int
+    failed: int
+    spans: int
+    bytes: int
+    duration: float
+    latencies: list[float]
+
+    def latency(self, quantile: float) -> float:
+        """Returns the latency of the given quantile, in seconds."""
+
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(int(quantile * len(latencies)), len(latencies) - 1)]
+
+
+def replay(
+    payloads: list[bytes],
+    payload_exporter: PayloadExporter,
+    *,
+    rate: float | None = None,
+    concurrency: int = 1,
+) -> ReplayReport:
+    """
+    Export the requests, `rate` requests per second or as fast as possible, from
+    `concurrency` threads, and measure the throughput and latency.
+    """
+
+    assert rate is None or rate > 0, "'rate' has to be positive"
+    assert concurrency > 0, "'concurrency' has to be positive"
+
+    span_counts = [count_spans(payload) for payload in payloads]
+    lock = threading.Lock()
+    next_index = 0
+    latencies: list[float] = []
+    failed = 0
+
+    def _send() -> None:
+        nonlocal next_index, failed
+        while True:
+            with lock:
+                index = next_index
+                next_index += 1
+            if index >= len(payloads):
+                return
+
+            if rate is not None:
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            request_start = time.perf_counter()
+            exported = payload_exporter.export(payloads[index])
+            latency = time.perf_counter() - request_start
+            with lock:
+                latencies.append(latency)
+                if not exported:
+                    failed += 1
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(name=f"troncos.replay-{i}", target=_send)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return ReplayReport(
+        requests=len(payloads),
+        failed=failed,
+        spans=sum(span_counts),
+        bytes=sum(len(payload) for payload in payloads),
+        duration=time.perf_counter() - start,
+        latencies=latencies,
+    )
@@ -0,0 +1,117 @@
+import heapq
+import os
+
+from ddtrace.trace import Span
+
+
+def _end_ns(span: Span) -> int:
+    return span.start_ns + (span.duration_ns or 0)
+
+
+def _duration_ns(span: Span) -> int:
+    return span.duration_ns or 0
+
+
+class SpanCoalescer:
+    """
+    Replaces repetitive sibling spans, like the queries of an N+1 pattern, with one
+    summary span.
+
+    When more than `min_count` spans without children share the same parent, name
+    and resource, they are replaced with a span that starts when the first of them
+    started and ends when the last of them ended. Its `troncos.coalesced.*` tags
+    hold the number of spans and their total, min and max duration in seconds.
+    Spans with errors and the `keep_slowest` slowest spans are kept as they are.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_count: int | None = None,
+        keep_slowest: int | None = None,
+    ) -> None:
+        if min_count is None:
+            min_count = int(os.environ.get("OTEL_TRACE_COALESCE_MIN_COUNT", "10"))
+        if keep_slowest is None:
+            keep_slowest = int(os.environ.get("OTEL_TRACE_COALESCE_KEEP_SLOWEST", "3"))
+
+        assert min_count > 0, "'min_count' has to be positive"
+        assert keep_slowest >= 0, "'keep_slowest' can not be negative"
+
+        self.min_count = min_count
+        self.keep_slowest = keep_slowest
+
+    def coalesce(self, spans: list[Span]) -> list[Span]:
+        """Returns the spans with repetitive siblings replaced by summary spans."""
+
+        if len(spans) <= self.min_count:
+            return spans
+
+        parents = {span.parent_id for span in spans}
+        groups: dict[tuple[int | None, str, str], list[Span]] = {}
+        for span in spans:
+            if not span.parent_id or span.span_id in parents:
+                continue
+            key = (span.parent_id, span.name, span.resource)
+            groups.setdefault(key, []).append(span)
+
+        replaced: dict[int, Span | None] = {}
+        for siblings in groups.values():
+            if len(siblings) <= self.min_count:
+                continue
+
+            candidates = [span for span in siblings if not span.error]
+            if self.keep_slowest:
+                slowest = {
+                    span.span_id
+                    for span in heapq.nlargest(
+                        self.keep_slowest, candidates, key=_duration_ns
+                    )
+                }
+                candidates = [
+                    span for span in candidates if span.span_id not in slowest
+                ]
+            if len(candidates) < 2:
+                continue
+
+            summary = _summary_span(candidates)
+            for span in candidates:
+                replaced[span.span_id] = None
+            replaced[summary.span_id] = summary
+
+        if not replaced:
+            return spans
+
+        coalesced = []
+        for span in spans:
+            if span.span_id not in replaced:
+                coalesced.append(span)
+            elif (summary_span := replaced[span.span_id]) is not None:
+                coalesced.append(summary_span)
+        return coalesced
+
+
+def _summary_span(spans: list[Span]) -> Span:
+    first = min(spans, key=lambda span: span.start_ns)
+    durations = [_duration_ns(span) for span in spans]
+
+    # The summary takes the place of the first span, so it keeps its ids.
+    summary = Span(
+        first.name,
+        service=first.service,
+        resource=first.resource,
+        span_type=first.span_type,
+        trace_id=first.trace_id,
+        span_id=first.span_id,
+        parent_id=first.parent_id,
+    )
+    summary._parent = first._parent
+    summary._meta.update(first._meta)
+    summary._metrics.update(first._metrics)
+    summary.start_ns = first.start_ns
+    summary.duration_ns = max(_end_ns(span) for span in spans) - first.start_ns
+    summary.set_metric("troncos.coalesced.count", len(spans))
+    summary.set_metric("troncos.coalesced.duration.total", sum(durations) / 1e9)
+    summary.set_metric("troncos.coalesced.duration.min", min(durations) / 1e9)
+    summary.set_metric("troncos.coalesced.duration.max", max(durations) / 1e9)
+    return summary
@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import weakref
+from enum import Enum
+from typing import IO, Sequence
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from structlog import get_logger
+
+from ._transport import frame_payload
+
+logger = get_logger()
+
+
+def _write_stdout(data: bytes) -> None:
+    out = getattr(sys.stdout, "buffer", None)
+    if out is not None:
+        out.write(data)
+        out.flush()
+    else:
+        sys.stdout.write(data.decode(errors="replace"))
+        sys.stdout.flush()
+
+
+class DebugFormat(Enum):
+    # One compact JSON span per line.
+    JSON = "json"
+    # Length prefixed OTLP `ExportTraceServiceRequest` messages, one per batch.
+    OTLP = "otlp"
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Writes spans to a file, or to stdout when no path is given. It is meant to be
+    used with a `BatchSpanProcessor`, so spans are serialized and written from the
+    background thread, one buffered write per batch.
+
+    Files are rotated when they grow past `max_bytes`, keeping `backup_count` old
+    files named `<path>.1`, `<path>.2` and so on.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str | None = None,
+        format: DebugFormat = DebugFormat.JSON,
+        max_bytes: int | None = None,
+        backup_count: int = 3,
+    ) -> None:
+        assert max_bytes is None or max_bytes > 0, "'max_bytes' has to be positive"
+        assert backup_count >= 0, "'backup_count' can not be negative"
+
+        self.path = path
+        self.format = format
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._lock = threading.Lock()
+        self._file: IO[bytes] | None = None
+        self._size = 0
+        if path is not None:
+            open(path, "wb").close()
+            self._open()
+
+        # The lock might be held by the exporting thread of the parent process.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            span_exporter = weak_self()
+            if span_exporter is not None:
+                span_exporter._lock = threading.Lock()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def _open(self) -> None:
+        assert self.path is not None
+        # Forked processes share the file, appending keeps their writes apart. It is
+        # never truncated here, another process might have rotated it already.
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        assert self.path is not None and self._file is not None
+        self._file.close()
+        if self.backup_count:
+            for i in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _serialize(self, spans: Sequence[ReadableSpan]) -> bytes:
+        if self.format == DebugFormat.OTLP:
+            from opentelemetry.exporter.otlp.proto.common.trace_encoder import (
+                encode_spans,
+            )
+
+            return frame_payload(encode_spans(spans).SerializeToString())
+
+        return "".join(span.to_json(indent=None) + "\n" for span in spans).encode()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            data = self._serialize(spans)
+            with self._lock:
+                if self.path is None:
+                    _write_stdout(data)
+                    return SpanExportResult.SUCCESS
+
+                if self._file is None:
+                    return SpanExportResult.FAILURE
+                if (
+                    self.max_bytes is not None
+                    and self._size
+                    and self._size + len(data) > self.max_bytes
+                ):
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data)
+        except Exception:
+            logger.exception("Exception while writing debug spans")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
@@ -0,0 +1,292 @@
+import struct
+import time
+from typing import Any, Iterable, NamedTuple
+
+from ddtrace.trace import Span as DDSpan
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import (
+    _DEFAULT_OTEL_EVENT_ATTRIBUTE_COUNT_LIMIT,
+    _DEFAULT_OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT,
+)
+from opentelemetry.trace import SpanKind, StatusCode
+
+from ._limits import AttributeLimits
+from ._rules import AttributeRules
+from ._span import (
+    _exception_status_description,
+    _span_attributes,
+    _span_kind,
+    ResourceCache,
+)
+
+# This module writes the protobuf wire format of the OTLP trace messages by hand.
+# The output is the same as running `translate_span` followed by the OTLP
+# exporters `encode_spans`, without building the intermediate `ReadableSpan`,
+# `BoundedAttributes` and protobuf message objects.
+#
+# Field numbers are taken from opentelemetry/proto/trace/v1/trace.proto and
+# opentelemetry/proto/common/v1/common.proto.
+
+_VARINTS = [bytes((i,)) for i in range(128)]
+
+_pack_double = struct.Struct("<d").pack
+_pack_fixed32 = struct.Struct("<I").pack
+_pack_fixed64 = struct.Struct("<Q").pack
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+# Span flags, see SpanFlags in trace.proto
+_SPAN_FLAGS_LOCAL_PARENT = _pack_fixed32(0x100)
+_SPAN_FLAGS_REMOTE_PARENT = _pack_fixed32(0x300)
+
+_pb_span_kind = {
+    SpanKind.INTERNAL: b"\x30\x01",
+    SpanKind.SERVER: b"\x30\x02",
+    SpanKind.CLIENT: b"\x30\x03",
+    SpanKind.PRODUCER: b"\x30\x04",
+    SpanKind.CONSUMER: b"\x30\x05",
+}
+
+_EXCEPTION_EVENT_NAME = b"\x12\x09exception"
+_STATUS_UNSET = b"\x7a\x00"
+_STATUS_CODE_ERROR = b"\x18" + _VARINTS[StatusCode.ERROR.value]
+# We never set an instrumentation scope, but the OTLP encoder always writes an
+# empty one.
+_EMPTY_SCOPE = b"\x0a\x00"
+
+# Attribute keys and many of the values are repeated across spans, so their
+# encoding is cached. The caches stop growing when they are full.
+_MAX_CACHED_KEYS = 4096
+_MAX_CACHED_KEY_VALUES = 16384
+_MAX_CACHED_VALUE_LENGTH = 128
+_encoded_keys: dict[str, bytes] = {}
+_encoded_key_values: dict[tuple[str, str], bytes | None] = {}
+
+
+class EncodedSpan(NamedTuple):
+    """
+    A span encoded as the `spans` field of an OTLP `ScopeSpans` message, together
+    with the encoded `Resource` message it belongs to.
+    """
+
+    resource: bytes
+    span: bytes
+
+
+def _varint(value: int) -> bytes:
+    if value < 0:
+        value += 1 << 64
+    elif value < 128:
+        return _VARINTS[value]
+
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(tag: bytes, payload: bytes) -> bytes:
+    return tag + _varint(len(payload)) + payload
+
+
+def _encode_key(key: str) -> bytes:
+    """Encode the `key` field of a `KeyValue` followed by the `value` tag."""
+
+    encoded = _encoded_keys.get(key)
+    if encoded is None:
+        encoded = _field(b"\x0a", key.encode()) + b"\x12"
+        if len(_encoded_keys) < _MAX_CACHED_KEYS:
+            _encoded_keys[key] = encoded
+    return encoded
+
+
+def _encode_value(value: Any) -> bytes | None:
+    """Encode an `AnyValue` message, returns None for unsupported values."""
+
+    if isinstance(value, bytes):
+        value = value.decode()
+    if isinstance(value, str):
+        return _field(b"\x0a", value.encode())
+    if isinstance(value, bool):
+        return b"\x10\x01" if value else b"\x10\x00"
+    if isinstance(value, int):
+        if value < _INT64_MIN or value > _INT64_MAX:
+            return None
+        return b"\x18" + _varint(value)
+    if isinstance(value, float):
+        return b"\x21" + _pack_double(value)
+    return None
+
+
+def _encode_key_value(key: str, value: Any) -> bytes | None:
+    """Encode a `KeyValue` message, returns None for unsupported values."""
+
+    try:
+        encoded_value = _encode_value(value)
+    except UnicodeError:
+        return None
+    if encoded_value is None:
+        return None
+    return _encode_key(key) + _varint(len(encoded_value)) + encoded_value
+
+
+def _encode_attributes(
+    tag: bytes, attributes: dict[str, Any], limit: int
+) -> tuple[bytes, int]:
+    """
+    Encode repeated `KeyValue` fields, keeping the last `limit` attributes like
+    `BoundedAttributes` does. Returns the encoded fields and the dropped count.
+    """
+
+    out = []
+    for key, value in attributes.items():
+        if not key or not isinstance(key, str):
+            continue
+
+        # Most attributes are short strings that repeat across spans, like
+        # 'span.kind', 'component' or 'db.system'. Those are cached.
+        key_value: bytes | None
+        if type(value) is str and len(value) <= _MAX_CACHED_VALUE_LENGTH:
+            cache_key = (key, value)
+            key_value = _encoded_key_values.get(cache_key)
+            if key_value is None:
+                key_value = _encode_key_value(key, value)
+                if len(_encoded_key_values) < _MAX_CACHED_KEY_VALUES:
+                    _encoded_key_values[cache_key] = key_value
+        else:
+            key_value = _encode_key_value(key, value)
+
+        if key_value is None:
+            continue
+
+        size = len(key_value)
+        out.append(tag + (_VARINTS[size] if size < 128 else _varint(size)) + key_value)
+
+    dropped = max(0, len(out) - limit)
+    if dropped:
+        del out[:dropped]
+    return (b"".join(out), dropped)
+
+
+def encode_resource(resource: Resource) -> bytes:
+    """Encode an OTEL resource as an OTLP `Resource` message."""
+
+    attributes = dict(resource.attributes)
+    encoded, _ = _encode_attributes(b"\x0a", attributes, len(attributes))
+    return encoded
+
+
+class SpanEncoder:
+    """Encodes finished ddtrace spans directly into OTLP protobuf."""
+
+    def __init__(
+        self,
+        default_resource: Resource,
+        ignore_attrs: set[str],
+        *,
+        resources: ResourceCache | None = None,
+        limits: AttributeLimits | None = None,
+        rules: AttributeRules | None = None,
+    ) -> None:
+        self.default_resource = default_resource
+        self.ignore_attrs = ignore_attrs
+        self.limits = limits
+        self.rules = rules
+        self.resources = resources or ResourceCache(default_resource)
+        self._encoded_resources: dict[Resource, bytes] = {}
+
+    def _resource(self, dd_span: DDSpan) -> bytes:
+        resource = self.resources.get(dd_span.service)
+        encoded = self._encoded_resources.get(resource)
+        if encoded is None:
+            # Drop resources evicted from the resource cache.
+            if len(self._encoded_resources) >= self.resources.max_size + 1:
+                self._encoded_resources.clear()
+            encoded = encode_resource(resource)
+            self._encoded_resources[resource] = encoded
+        return encoded
+
+    def encode_span(self, dd_span: DDSpan) -> EncodedSpan:
+        """Encode a ddtrace span, the equivalent of `translate_span`."""
+        assert dd_span.duration_ns is not None, "Span not finished."
+
+        attributes, error_attributes = _span_attributes(
+            dd_span, self.ignore_attrs, self.limits, self.rules
+        )
+
+        parts = [
+            b"\x0a\x10" + dd_span.trace_id.to_bytes(16, "big"),
+            b"\x12\x08" + dd_span.span_id.to_bytes(8, "big"),
+        ]
+        if dd_span.parent_id:
+            parts.append(b"\x22\x08" + dd_span.parent_id.to_bytes(8, "big"))
+        if dd_span.name:
+            parts.append(_field(b"\x2a", dd_span.name.encode()))
+        parts.append(_pb_span_kind[_span_kind(dd_span)])
+        if dd_span.start_ns:
+            parts.append(b"\x39" + _pack_fixed64(dd_span.start_ns))
+        end_ns = dd_span.start_ns + dd_span.duration_ns
+        if end_ns:
+            parts.append(b"\x41" + _pack_fixed64(end_ns))
+
+        encoded_attributes, dropped = _encode_attributes(
+            b"\x4a", attributes, _DEFAULT_OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT
+        )
+        parts.append(encoded_attributes)
+        if dropped:
+            parts.append(b"\x50" + _varint(dropped))
+
+        if error_attributes:
+            encoded_error_attributes, _ = _encode_attributes(
+                b"\x1a", error_attributes, _DEFAULT_OTEL_EVENT_ATTRIBUTE_COUNT_LIMIT
+            )
+            event = (
+                b"\x09"
+                + _pack_fixed64(time.time_ns())
+                + _EXCEPTION_EVENT_NAME
+                + encoded_error_attributes
+            )
+            parts.append(_field(b"\x5a", event))
+            description = _exception_status_description(error_attributes)
+            parts.append(
+                _field(
+                    b"\x7a",
+                    _field(b"\x12", description.encode()) + _STATUS_CODE_ERROR,
+                )
+            )
+        else:
+            parts.append(_STATUS_UNSET)
+
+        # Flags are field 16 with wire type fixed32
+        parts.append(b"\x85\x01")
+        if dd_span.parent_id and not dd_span._parent:
+            parts.append(_SPAN_FLAGS_REMOTE_PARENT)
+        else:
+            parts.append(_SPAN_FLAGS_LOCAL_PARENT)
+
+        return EncodedSpan(self._resource(dd_span), _field(b"\x12", b"".join(parts)))
+
+
+def encode_export_request(spans: Iterable[EncodedSpan]) -> bytes:
+    """
+    Encode spans as an OTLP `ExportTraceServiceRequest`, spans sharing a resource
+    are grouped under the same `ResourceSpans`.
+    """
+
+    grouped: dict[bytes, list[bytes]] = {}
+    for resource, span in spans:
+        grouped.setdefault(resource, []).append(span)
+
+    out = []
+    for resource, resource_spans in grouped.items():
+        scope_spans = _EMPTY_SCOPE + b"".join(resource_spans)
+        out.append(
+            _field(
+                b"\x0a",
+                _field(b"\x0a", resource) + _field(b"\x12", scope_spans),
+            )
+        )
+    return b"".join(out)
@@ -1,5 +1,15 @@
 import os
+import tempfile
 from enum import Enum
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def _from_env(value: T | None, name: str, default: str, cast: Callable[[str], T]) -> T:
+    if value is None:
+        return cast(os.environ.get(name, default))
+    return value
 
 
 class ExporterType(Enum):
@@ -7,6 +17,61 @@ class ExporterType(Enum):
     GRPC = "grpc"
 
 
+class Compression(Enum):
+    NONE = "none"
+    GZIP = "gzip"
+    DEFLATE = "deflate"
+
+
+class Balancing(Enum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_OUTSTANDING = "least_outstanding"
+    FAILOVER = "failover"
+
+
+class Spool:
+    """
+    Configuration for spooling export requests to disk while the collector is
+    unreachable, and replaying them in the background once it recovers.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: str | None = None,
+        max_bytes: int | None = None,
+        segment_bytes: int | None = None,
+        retry_interval: float | None = None,
+    ) -> None:
+        if directory is None:
+            directory = os.environ.get(
+                "OTEL_TRACE_SPOOL_DIR",
+                os.path.join(tempfile.gettempdir(), "troncos-spool"),
+            )
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("OTEL_TRACE_SPOOL_MAX_BYTES", "268435456"))
+        if segment_bytes is None:
+            segment_bytes = int(
+                os.environ.get("OTEL_TRACE_SPOOL_SEGMENT_BYTES", "4194304")
+            )
+        if retry_interval is None:
+            retry_interval = float(
+                os.environ.get("OTEL_TRACE_SPOOL_RETRY_INTERVAL", "5")
+            )
+
+        assert directory, "You have to specify 'directory'"
+        assert segment_bytes > 0, "'segment_bytes' has to be positive"
+        assert max_bytes >= segment_bytes, (
+            "'max_bytes' has to be greater or equal to 'segment_bytes'"
+        )
+        assert retry_interval > 0, "'retry_interval' has to be positive"
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.retry_interval = retry_interval
+
+
 class Exporter:
     def __init__(
         self,
@@ -17,9 +82,125 @@ class Exporter:
         path: str | None = None,
         exporter_type: ExporterType | None = None,
         headers: dict[str, str] | None = None,
+        spool: Spool | None = None,
+        compression: Compression | None = None,
+        timeout: float | None = None,
+        max_queue_size: int | None = None,
+        max_export_batch_size: int | None = None,
+        max_export_batch_bytes: int | None = None,
+        schedule_delay_millis: float | None = None,
+        grpc_keepalive_time_millis: int | None = None,
+        grpc_options: list[tuple[str, Any]] | None = None,
+        hosts: list[str] | None = None,
+        balancing: Balancing | None = None,
+        capture_file: str | None = None,
     ) -> None:
         self.headers = headers
+        self.spool = spool
+        self.capture_file = capture_file or os.environ.get("OTEL_TRACE_CAPTURE_FILE")
+        self.compression = _from_env(
+            compression,
+            "OTEL_TRACE_COMPRESSION",
+            "none",
+            lambda value: Compression(value.lower()),
+        )
+        self.balancing = _from_env(
+            balancing,
+            "OTEL_TRACE_BALANCING",
+            "round_robin",
+            lambda value: Balancing(value.lower()),
+        )
+
+        self._configure_batching(
+            timeout=timeout,
+            max_queue_size=max_queue_size,
+            max_export_batch_size=max_export_batch_size,
+            max_export_batch_bytes=max_export_batch_bytes,
+            schedule_delay_millis=schedule_delay_millis,
+        )
+        self._configure_grpc_options(grpc_options, grpc_keepalive_time_millis)
+        self._configure_endpoints(
+            scheme=scheme,
+            host=host,
+            port=port,
+            path=path,
+            exporter_type=exporter_type,
+            hosts=hosts,
+        )
+
+    def _configure_batching(
+        self,
+        *,
+        timeout: float | None,
+        max_queue_size: int | None,
+        max_export_batch_size: int | None,
+        max_export_batch_bytes: int | None,
+        schedule_delay_millis: float | None,
+    ) -> None:
+        timeout = _from_env(timeout, "OTEL_TRACE_EXPORT_TIMEOUT", "10", float)
+        max_queue_size = _from_env(
+            max_queue_size, "OTEL_TRACE_MAX_QUEUE_SIZE", "2048", int
+        )
+        max_export_batch_size = _from_env(
+            max_export_batch_size, "OTEL_TRACE_MAX_EXPORT_BATCH_SIZE", "512", int
+        )
+        max_export_batch_bytes = _from_env(
+            max_export_batch_bytes, "OTEL_TRACE_MAX_EXPORT_BATCH_BYTES", "2097152", int
+        )
+        schedule_delay_millis = _from_env(
+            schedule_delay_millis, "OTEL_TRACE_SCHEDULE_DELAY", "5000", float
+        )
+
+        assert timeout > 0, "'timeout' has to be positive"
+        assert max_queue_size > 0, "'max_queue_size' has to be positive"
+        assert 0 < max_export_batch_size <= max_queue_size, (
+            "'max_export_batch_size' has to be positive and less or equal to "
+            "'max_queue_size'"
+        )
+        assert max_export_batch_bytes > 0, "'max_export_batch_bytes' has to be positive"
+        assert schedule_delay_millis > 0, "'schedule_delay_millis' has to be positive"
+
+        self.timeout = timeout
+        self.max_queue_size = max_queue_size
+        self.max_export_batch_size = max_export_batch_size
+        self.max_export_batch_bytes = max_export_batch_bytes
+        self.schedule_delay_millis = schedule_delay_millis
+
+    def _configure_grpc_options(
+        self,
+        grpc_options: list[tuple[str, Any]] | None,
+        grpc_keepalive_time_millis: int | None,
+    ) -> None:
+        if (
+            grpc_keepalive_time_millis is None
+            and "OTEL_TRACE_GRPC_KEEPALIVE_TIME" in os.environ
+        ):
+            grpc_keepalive_time_millis = int(
+                os.environ["OTEL_TRACE_GRPC_KEEPALIVE_TIME"]
+            )
+
+        self.grpc_options = list(grpc_options or [])
+        if grpc_keepalive_time_millis is not None:
+            self.grpc_options.append(
+                ("grpc.keepalive_time_ms", grpc_keepalive_time_millis)
+            )
 
+    def _configure_endpoints(
+        self,
+        *,
+        scheme: str,
+        host: str | None,
+        port: str | None,
+        path: str | None,
+        exporter_type: ExporterType | None,
+        hosts: list[str] | None,
+    ) -> None:
+        if hosts is None:
+            hosts = [
+                h.strip()
+                for h in os.environ.get("OTEL_TRACE_HOSTS", "").split(",")
+                if h.strip()
+            ]
         if host is None:
             host = os.environ.get("OTEL_TRACE_HOST", "localhost")
         if port is None:
@@ -43,5 +224,54 @@ class Exporter:
                 exporter_type = ExporterType.HTTP
         assert exporter_type, "You have to specify 'exporter_type'"
 
-        self.endpoint = f"{scheme}://{host}:{port}{path}"
         self.exporter_type = exporter_type
+
+        # With several hosts the spans are spread over all of them, hosts without
+        # a port use the port of the exporter.
+        self.endpoints = [
+            f"{scheme}://{h if ':' in h else f'{h}:{port}'}{path}" for h in hosts
+        ] or [f"{scheme}://{host}:{port}{path}"]
+        self.endpoint = self.endpoints[0]
+
+
+class SharedExporter:
+    """
+    Configuration for handing encoded spans to a shared exporter process over a unix
+    socket, instead of exporting them from every process. See
+    `start_shared_exporter`.
+    """
+
+    def __init__(
+        self,
+        *,
+        socket_path: str | None = None,
+        schedule_delay_millis: float | None = None,
+        max_payload_bytes: int | None = None,
+        max_buffered_bytes: int | None = None,
+    ) -> None:
+        if socket_path is None:
+            socket_path = os.environ.get(
+                "OTEL_TRACE_SHARED_EXPORTER_SOCKET", "/tmp/troncos-exporter.sock"
+            )
+        if schedule_delay_millis is None:
+            schedule_delay_millis = float(
+                os.environ.get("OTEL_TRACE_SHARED_EXPORTER_DELAY", "5000")
+            )
+        if max_payload_bytes is None:
+            max_payload_bytes = int(
+                os.environ.get("OTEL_TRACE_SHARED_EXPORTER_MAX_PAYLOAD", "3145728")
+            )
+        if max_buffered_bytes is None:
+            max_buffered_bytes = int(
+                os.environ.get("OTEL_TRACE_SHARED_EXPORTER_MAX_BUFFER", "67108864")
+            )
+
+        assert socket_path, "You have to specify 'socket_path'"
+        assert schedule_delay_millis > 0, "'schedule_delay_millis' has to be positive"
+        assert max_payload_bytes > 0, "'max_payload_bytes' has to be positive"
+        assert max_buffered_bytes > 0, "'max_buffered_bytes' has to be positive"
+
+        self.socket_path = socket_path
+        self.schedule_delay_millis = schedule_delay_millis
+        self.max_payload_bytes = max_payload_bytes
+        self.max_buffered_bytes = max_buffered_bytes
@@ -0,0 +1,151 @@
+import os
+import threading
+from collections import OrderedDict
+
+from ddtrace.trace import Span, Tracer
+
+# Set on the local root span of traces where spans were dropped.
+DROPPED_SPANS_ATTRIBUTE = "troncos.dropped_spans"
+
+# Traces flushed in several chunks, and the roots seen by the decorators, are
+# tracked until this many newer ones have been seen.
+_MAX_TRACKED_TRACES = 4096
+
+# Rough overhead of a span without tags, and of a numeric tag value.
+_SPAN_OVERHEAD = 64
+_METRIC_SIZE = 8
+
+
+def _span_size(span: Span) -> int:
+    """Estimate the size of a span from its name, resource and tags."""
+
+    size = _SPAN_OVERHEAD + len(span.name or "") + len(span.resource or "")
+    for key, value in span._meta.items():
+        size += len(key) + len(value)
+    for key in span._metrics:
+        size += len(key) + _METRIC_SIZE
+    return size
+
+
+class _TraceState:
+    __slots__ = ("dropped", "size", "spans")
+
+    def __init__(self) -> None:
+        self.spans = 0
+        self.size = 0
+        self.dropped = 0
+
+
+class TraceGuard:
+    """
+    Bounds the number of spans, and optionally their estimated size in bytes, that
+    are exported per trace. Spans over the budget are dropped before they are
+    queued and translated, and the number of dropped spans is set on the local root
+    span.
+
+    With `guard_decorators`, `trace_function` and `trace_block` also stop creating
+    spans once a trace has `max_spans` spans created by them.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_spans: int | None = None,
+        max_bytes: int | None = None,
+        guard_decorators: bool = True,
+    ) -> None:
+        if max_spans is None:
+            max_spans = int(os.environ.get("OTEL_TRACE_MAX_SPANS_PER_TRACE", "10000"))
+        if max_bytes is None and "OTEL_TRACE_MAX_TRACE_BYTES" in os.environ:
+            max_bytes = int(os.environ["OTEL_TRACE_MAX_TRACE_BYTES"])
+
+        assert max_spans > 0, "'max_spans' has to be positive"
+        assert max_bytes is None or max_bytes > 0, "'max_bytes' has to be positive"
+
+        self.max_spans = max_spans
+        self.max_bytes = max_bytes
+        self.guard_decorators = guard_decorators
+
+        self._lock = threading.Lock()
+        self._traces: OrderedDict[int, _TraceState] = OrderedDict()
+        self._decorator_spans: OrderedDict[int, int] = OrderedDict()
+
+    def limit(self, spans: list[Span]) -> list[Span]:
+        """Returns the spans of a trace chunk that fit in the budget of the trace."""
+
+        root = next((span for span in spans if span._parent is None), None)
+        trace_id = spans[0].trace_id
+
+        with self._lock:
+            # Traces are usually flushed in one chunk, only the earlier chunks of
+            # partially flushed traces have to be remembered.
+            if root is not None:
+                state = self._traces.pop(trace_id, None) or _TraceState()
+            else:
+                state = self._traces.get(trace_id) or _TraceState()
+                self._traces[trace_id] = state
+                self._traces.move_to_end(trace_id)
+                if len(self._traces) > _MAX_TRACKED_TRACES:
+                    self._traces.popitem(last=False)
+
+            if (
+                root is not None
+                and not state.dropped
+                and self.max_bytes is None
+                and state.spans + len(spans) <= self.max_spans
+            ):
+                return spans
+
+            kept = []
+            for span in spans:
+                size = 0 if self.max_bytes is None else _span_size(span)
+                if span is root or (
+                    state.spans < self.max_spans
+                    and (self.max_bytes is None or state.size + size <= self.max_bytes)
+                ):
+                    kept.append(span)
+                    state.spans += 1
+                    state.size += size
+                else:
+                    state.dropped += 1
+
+        if root is not None and state.dropped:
+            root.set_metric(
+                DROPPED_SPANS_ATTRIBUTE,
+                (root.get_metric(DROPPED_SPANS_ATTRIBUTE) or 0) + state.dropped,
+            )
+        return kept
+
+    def allow_span(self, _tracer: Tracer) -> bool:
+        """
+        Count a span about to be created by the decorators, returns False if the
+        trace has no budget left for it.
+        """
+
+        root = _tracer.current_root_span()
+        if root is None:
+            return True
+
+        with self._lock:
+            count = self._decorator_spans.pop(root.span_id, 0) + 1
+            self._decorator_spans[root.span_id] = count
+            if len(self._decorator_spans) > _MAX_TRACKED_TRACES:
+                self._decorator_spans.popitem(last=False)
+
+        if count <= self.max_spans:
+            return True
+
+        root.set_metric(
+            DROPPED_SPANS_ATTRIBUTE,
+            (root.get_metric(DROPPED_SPANS_ATTRIBUTE) or 0) + 1,
+        )
+        return False
+
+
+# The guard used by the decorators, set by `configure_tracer`.
+decorator_guard: TraceGuard | None = None
+
+
+def set_decorator_guard(guard: TraceGuard | None) -> None:
+    global decorator_guard  # noqa: PLW0603
+    decorator_guard = guard
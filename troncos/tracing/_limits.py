@@ -0,0 +1,126 @@
+import os
+from typing import Any
+
+# Set on spans where at least one attribute value was truncated.
+TRUNCATED_ATTRIBUTE = "troncos.truncated"
+
+# Numbers and booleans are counted as their encoded size.
+_SCALAR_SIZE = 8
+# Values are not cut shorter than this to make a span fit, so the start of a
+# stack trace or query is kept.
+_MIN_VALUE_LENGTH = 128
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return _SCALAR_SIZE
+
+
+class AttributeLimits:
+    """
+    Limits the size of span attribute values before they are exported.
+
+    String values longer than `max_value_length` are cut, unless the key has its
+    own limit in `key_limits`. If the keys and values of a span, including the
+    exception attributes, add up to more than `max_span_bytes`, the largest values
+    are cut further, to an equal share of what is left, until the span fits. Each
+    value keeps at least its first 128 characters. Sizes are counted in characters.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_value_length: int | None = None,
+        max_span_bytes: int | None = None,
+        key_limits: dict[str, int] | None = None,
+    ) -> None:
+        if (
+            max_value_length is None
+            and "OTEL_TRACE_ATTRIBUTE_VALUE_LENGTH_LIMIT" in os.environ
+        ):
+            max_value_length = int(
+                os.environ["OTEL_TRACE_ATTRIBUTE_VALUE_LENGTH_LIMIT"]
+            )
+        if max_span_bytes is None and "OTEL_TRACE_SPAN_BYTES_LIMIT" in os.environ:
+            max_span_bytes = int(os.environ["OTEL_TRACE_SPAN_BYTES_LIMIT"])
+
+        assert max_value_length is None or max_value_length >= 0, (
+            "'max_value_length' can not be negative"
+        )
+        assert max_span_bytes is None or max_span_bytes >= 0, (
+            "'max_span_bytes' can not be negative"
+        )
+        assert all(limit >= 0 for limit in (key_limits or {}).values()), (
+            "'key_limits' can not be negative"
+        )
+
+        self.max_value_length = max_value_length
+        self.max_span_bytes = max_span_bytes
+        self.key_limits = dict(key_limits or {})
+
+    def _truncate_values(self, attributes: dict[str, Any]) -> bool:
+        truncated = False
+        key_limits = self.key_limits
+        max_value_length = self.max_value_length
+        for key, value in attributes.items():
+            if type(value) is not str:
+                continue
+            limit = key_limits.get(key, max_value_length)
+            if limit is not None and len(value) > limit:
+                attributes[key] = value[:limit]
+                truncated = True
+        return truncated
+
+    def _fit_span(
+        self,
+        attributes: dict[str, Any],
+        error_attributes: dict[str, Any],
+        truncated: bool,
+    ) -> bool:
+        assert self.max_span_bytes is not None
+
+        fixed_size = 0
+        strings: list[tuple[int, str, dict[str, Any]]] = []
+        for attrs in (attributes, error_attributes):
+            for key, value in attrs.items():
+                fixed_size += len(key)
+                if type(value) is str and value:
+                    strings.append((len(value), key, attrs))
+                else:
+                    fixed_size += _value_size(value)
+
+        # The marker set on truncated spans counts towards the limit too.
+        marker_size = len(TRUNCATED_ATTRIBUTE) + _SCALAR_SIZE
+        size = fixed_size + sum(length for length, _, _ in strings)
+        if size + (marker_size if truncated else 0) <= self.max_span_bytes:
+            return False
+
+        # Every value gets an equal share of what is left. The shares the shorter
+        # values do not use go to the larger ones, these are the stack traces,
+        # queries and headers that make spans large.
+        budget = max(self.max_span_bytes - fixed_size - marker_size, 0)
+        strings.sort(key=lambda item: item[0])
+        cut = False
+        for i, (length, key, attrs) in enumerate(strings):
+            share = max(budget // (len(strings) - i), _MIN_VALUE_LENGTH)
+            if length > share:
+                attrs[key] = attrs[key][:share]
+                cut = True
+            budget = max(budget - min(length, share), 0)
+        return cut
+
+    def apply(
+        self, attributes: dict[str, Any], error_attributes: dict[str, Any]
+    ) -> None:
+        """Truncate the span and exception attributes in place."""
+
+        truncated = self._truncate_values(attributes)
+        truncated = self._truncate_values(error_attributes) or truncated
+        if self.max_span_bytes is not None:
+            truncated = (
+                self._fit_span(attributes, error_attributes, truncated) or truncated
+            )
+
+        if truncated:
+            attributes[TRUNCATED_ATTRIBUTE] = True
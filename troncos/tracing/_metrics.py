@@ -0,0 +1,405 @@
+import bisect
+import os
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+from structlog import get_logger
+
+from ._exporter import Exporter
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.resources import Resource
+
+    from ._transport import PayloadExporter
+
+logger = get_logger()
+
+_DURATION_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+_BATCH_SIZE_BUCKETS = (1, 8, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_COUNTERS = {
+    "spans_received": "Spans written to the trace writer.",
+    "spans_trace_guard_dropped": "Spans dropped because their trace was too large.",
+    "spans_sampling_priority_filtered": "Spans dropped because of ddtrace sampling.",
+    "spans_tail_sampled": "Spans dropped by the tail sampler.",
+    "spans_coalesced": "Spans replaced by summary spans.",
+    "spans_translated": "Spans translated or encoded to OTLP.",
+    "spans_queued": "Spans handed to the export processors.",
+    "spans_exported": "Spans exported successfully.",
+    "spans_export_failed": "Spans where the export request failed.",
+    "spans_dropped": "Spans dropped because a queue was full.",
+}
+
+_HISTOGRAMS: dict[str, tuple[str, str, Sequence[float]]] = {
+    "export_batch_size": ("Spans per export request.", "{span}", _BATCH_SIZE_BUCKETS),
+    "export_duration_seconds": ("Duration of export requests.", "s", _DURATION_BUCKETS),
+    "translate_duration_seconds": (
+        "Time spent translating a trace chunk.",
+        "s",
+        _DURATION_BUCKETS,
+    ),
+}
+
+
+class _Histogram:
+    def __init__(self, boundaries: Sequence[float]) -> None:
+        self.boundaries = list(boundaries)
+        self.bucket_counts = [0] * (len(self.boundaries) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.boundaries, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "_Histogram") -> None:
+        for i, count in enumerate(other.bucket_counts):
+            self.bucket_counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "boundaries": list(self.boundaries),
+            "bucket_counts": list(self.bucket_counts),
+        }
+
+
+class _ThreadMetrics:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self) -> None:
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+        self.histograms = {
+            name: _Histogram(boundaries)
+            for name, (_, _, boundaries) in _HISTOGRAMS.items()
+        }
+
+    def merge(self, other: "_ThreadMetrics") -> None:
+        for name, value in list(other.counters.items()):
+            self.counters[name] += value
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+
+
+class TracingMetrics:
+    """
+    Counters and histograms describing what the troncos trace pipeline does in this
+    process. They are kept in tables owned by each thread, so the request threads
+    writing spans take no lock. The tables are only merged for a snapshot.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+        # Counts are per process, forked processes start from zero.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            metrics = weak_self()
+            if metrics is not None:
+                metrics.reset()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.start_time_ns = time.time_ns()
+        self._tables: list[tuple["weakref.ref[threading.Thread]", _ThreadMetrics]] = []
+        # The tables of threads that have exited.
+        self._retired = _ThreadMetrics()
+
+    def _thread_metrics(self) -> _ThreadMetrics:
+        try:
+            metrics: _ThreadMetrics = self._local.metrics
+        except AttributeError:
+            metrics = self._local.metrics = _ThreadMetrics()
+            with self._lock:
+                self._tables.append((weakref.ref(threading.current_thread()), metrics))
+        return metrics
+
+    def add(self, name: str, value: int = 1) -> None:
+        self._thread_metrics().counters[name] += value
+
+    def record(self, name: str, value: float) -> None:
+        self._thread_metrics().histograms[name].record(value)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Returns the current value of all counters and histograms."""
+
+        merged = _ThreadMetrics()
+        with self._lock:
+            live_tables = []
+            for thread_ref, metrics in self._tables:
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    self._retired.merge(metrics)
+                else:
+                    live_tables.append((thread_ref, metrics))
+            self._tables = live_tables
+
+            # Other threads might count spans meanwhile, so the snapshot can be a
+            # few spans behind.
+            for _, metrics in live_tables:
+                merged.merge(metrics)
+            merged.merge(self._retired)
+
+        return {
+            **merged.counters,
+            **{
+                name: histogram.snapshot()
+                for name, histogram in merged.histograms.items()
+            },
+        }
+
+
+tracing_metrics = TracingMetrics()
+
+
+def get_tracing_metrics() -> dict[str, Any]:
+    """
+    Returns the self-instrumentation metrics of the trace pipeline in this process.
+    """
+
+    return tracing_metrics.snapshot()
+
+
+def prometheus_text(snapshot: dict[str, Any] | None = None) -> str:
+    """Render the trace pipeline metrics in the Prometheus text format."""
+
+    if snapshot is None:
+        snapshot = get_tracing_metrics()
+
+    lines = []
+    for name, description in _COUNTERS.items():
+        metric = f"troncos_{name}_total"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {snapshot[name]}")
+
+    for name, (description, _, _) in _HISTOGRAMS.items():
+        metric = f"troncos_{name}"
+        histogram = snapshot[name]
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for boundary, count in zip(
+            histogram["boundaries"], histogram["bucket_counts"], strict=False
+        ):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{boundary}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{metric}_sum {histogram['sum']}")
+        lines.append(f"{metric}_count {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serve the trace pipeline metrics in the Prometheus text format from a
+    background thread.
+    """
+
+    server = ThreadingHTTPServer((addr, port), _PrometheusHandler)
+    thread = threading.Thread(
+        name="troncos.MetricsServer", target=server.serve_forever, daemon=True
+    )
+    thread.start()
+    return server
+
+
+def encode_metrics_request(
+    snapshot: dict[str, Any], resource: "Resource", start_time_ns: int
+) -> bytes:
+    """Encode a metrics snapshot as an OTLP `ExportMetricsServiceRequest`."""
+
+    # The OTLP protobuf messages are only needed when metrics are exported.
+    from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+        ExportMetricsServiceRequest,
+    )
+    from opentelemetry.proto.common.v1.common_pb2 import InstrumentationScope
+    from opentelemetry.proto.metrics.v1.metrics_pb2 import (
+        AggregationTemporality,
+        Histogram,
+        HistogramDataPoint,
+        Metric,
+        NumberDataPoint,
+        ResourceMetrics,
+        ScopeMetrics,
+        Sum,
+    )
+    from opentelemetry.proto.resource.v1.resource_pb2 import Resource as PB2Resource
+
+    from ._encoder import encode_resource
+
+    now = time.time_ns()
+    cumulative = AggregationTemporality.AGGREGATION_TEMPORALITY_CUMULATIVE
+
+    metrics = [
+        Metric(
+            name=f"troncos.{name}",
+            description=description,
+            unit="{span}",
+            sum=Sum(
+                data_points=[
+                    NumberDataPoint(
+                        start_time_unix_nano=start_time_ns,
+                        time_unix_nano=now,
+                        as_int=snapshot[name],
+                    )
+                ],
+                aggregation_temporality=cumulative,
+                is_monotonic=True,
+            ),
+        )
+        for name, description in _COUNTERS.items()
+    ]
+    metrics.extend(
+        Metric(
+            name=f"troncos.{name}",
+            description=description,
+            unit=unit,
+            histogram=Histogram(
+                data_points=[
+                    HistogramDataPoint(
+                        start_time_unix_nano=start_time_ns,
+                        time_unix_nano=now,
+                        count=snapshot[name]["count"],
+                        sum=snapshot[name]["sum"],
+                        bucket_counts=snapshot[name]["bucket_counts"],
+                        explicit_bounds=snapshot[name]["boundaries"],
+                    )
+                ],
+                aggregation_temporality=cumulative,
+            ),
+        )
+        for name, (description, unit, _) in _HISTOGRAMS.items()
+    )
+
+    request = ExportMetricsServiceRequest(
+        resource_metrics=[
+            ResourceMetrics(
+                resource=PB2Resource.FromString(encode_resource(resource)),
+                scope_metrics=[
+                    ScopeMetrics(
+                        scope=InstrumentationScope(name="troncos"),
+                        metrics=metrics,
+                    )
+                ],
+            )
+        ]
+    )
+    result: bytes = request.SerializeToString()
+    return result
+
+
+class SelfMetrics:
+    """
+    Configuration for periodically exporting the trace pipeline metrics as OTLP
+    metrics.
+    """
+
+    def __init__(
+        self,
+        *,
+        exporter: Exporter | None = None,
+        interval: float | None = None,
+    ) -> None:
+        if exporter is None:
+            exporter = Exporter(path="/v1/metrics")
+        if interval is None:
+            interval = float(os.environ.get("OTEL_TRACE_METRICS_INTERVAL", "60"))
+
+        assert interval > 0, "'interval' has to be positive"
+
+        self.exporter = exporter
+        self.interval = interval
+
+
+class MetricsReporter:
+    """Exports metrics from a background thread."""
+
+    def __init__(
+        self,
+        payload_exporter: "PayloadExporter",
+        encode_request: Callable[[], bytes],
+        interval: float,
+    ) -> None:
+        self.payload_exporter = payload_exporter
+        self.encode_request = encode_request
+        self.interval = interval
+        self._start_worker()
+
+        # Forked processes need their own worker thread, see gunicorn and celery.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            reporter = weak_self()
+            if reporter is not None and not reporter._stop.is_set():
+                reporter._start_worker()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def _start_worker(self) -> None:
+        self._stop = threading.Event()
+        self._worker = threading.Thread(
+            name="troncos.MetricsReporter", target=self._run, daemon=True
+        )
+        self._worker.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self) -> None:
+        try:
+            self.payload_exporter.export(self.encode_request())
+        except Exception:
+            logger.exception("Exception while exporting metrics")
+
+    def shutdown(self) -> None:
+        if self._stop.is_set():
+            return
+
+        self._stop.set()
+        self._worker.join()
+        self.export()
+        self.payload_exporter.shutdown()
@@ -1,27 +1,45 @@
 import os
-import sys
+import time
+from typing import Sequence
 
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
-    OTLPSpanExporter as HTTPSpanExporter,
-)
-from opentelemetry.sdk.trace import SpanProcessor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
 from opentelemetry.sdk.trace.export import (
     BatchSpanProcessor,
-    ConsoleSpanExporter,
-    SimpleSpanProcessor,
     SpanExporter,
+    SpanExportResult,
 )
 from structlog import get_logger
 
-from ._exporter import Exporter, ExporterType
-
-try:
-    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
-        OTLPSpanExporter as GRPCSpanExporter,
-    )
-except ImportError:
-    GRPCSpanExporter = None  # type: ignore
-
+from ._debug import DebugFormat, FileSpanExporter
+from ._exporter import Exporter, ExporterType, SharedExporter
+from ._metrics import (
+    MetricsReporter,
+    SelfMetrics,
+    encode_metrics_request,
+    tracing_metrics,
+)
+from ._processor import EncodedBatchProcessor
+from ._profile import (
+    FunctionProfile,
+    ProfileOutput,
+    SummarySpanReporter,
+    call_stats,
+    encode_profile_request,
+)
+from ._spanmetrics import SpanMetrics, SpanMetricsAggregator
+from ._spool import SpoolingPayloadExporter
+from ._transport import (
+    GRPC_METRICS_EXPORT_METHOD,
+    GRPC_TRACE_EXPORT_METHOD,
+    MAX_RETRIES,
+    GRPCPayloadExporter,
+    HTTPPayloadExporter,
+    MultiPayloadExporter,
+    PayloadExporter,
+    UnixSocketPayloadExporter,
+    grpc_compression,
+)
 
 logger = get_logger()
 
@@ -30,6 +48,72 @@ def _bool_from_string(s: str) -> bool:
     return s.lower() in ["1", "true", "yes"]
 
 
+class _MeteredSpanExporter(SpanExporter):
+    """Records export metrics for the wrapped span exporter."""
+
+    def __init__(self, span_exporter: SpanExporter) -> None:
+        self.span_exporter = span_exporter
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        start = time.perf_counter()
+        result = SpanExportResult.FAILURE
+        try:
+            result = self.span_exporter.export(spans)
+        finally:
+            tracing_metrics.record(
+                "export_duration_seconds", time.perf_counter() - start
+            )
+            tracing_metrics.record("export_batch_size", len(spans))
+            tracing_metrics.add(
+                "spans_exported"
+                if result == SpanExportResult.SUCCESS
+                else "spans_export_failed",
+                len(spans),
+            )
+        return result
+
+    def shutdown(self) -> None:
+        self.span_exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.span_exporter.force_flush(timeout_millis)
+
+
+class _PayloadSpanExporter(SpanExporter):
+    """Exports OTEL SDK spans with a `PayloadExporter`."""
+
+    def __init__(self, payload_exporter: PayloadExporter) -> None:
+        self.payload_exporter = payload_exporter
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        from opentelemetry.exporter.otlp.proto.common.trace_encoder import (
+            encode_spans,
+        )
+
+        if self.payload_exporter.export(encode_spans(spans).SerializeToString()):
+            return SpanExportResult.SUCCESS
+        return SpanExportResult.FAILURE
+
+    def shutdown(self) -> None:
+        self.payload_exporter.shutdown()
+
+
+class _MeteredBatchSpanProcessor(BatchSpanProcessor):
+    """
+    A BatchSpanProcessor that counts the spans it drops. The OTEL SDK drops spans
+    silently when the queue is full, so we peek at the queue of the SDK version
+    we know about, and skip counting for others.
+    """
+
+    def on_end(self, span: ReadableSpan) -> None:
+        batch_processor = getattr(self, "_batch_processor", None)
+        queue = getattr(batch_processor, "_queue", None)
+        if queue is not None and queue.maxlen and len(queue) >= queue.maxlen:
+            tracing_metrics.add("spans_dropped")
+
+        super().on_end(span)
+
+
 def get_otel_span_processors(*, exporter: Exporter) -> list[SpanProcessor]:
     """
     Build a list of span processors to use to process otel spans.
@@ -38,36 +122,224 @@ def get_otel_span_processors(*, exporter: Exporter) -> list[SpanProcessor]:
     span_processors: list[SpanProcessor] = []
     span_exporter: SpanExporter
 
-    # Exporter
-    if exporter.exporter_type == ExporterType.HTTP:
+    # Spooling, capturing and multiple endpoints need the payload exporters.
+    if (
+        exporter.spool is not None
+        or exporter.capture_file is not None
+        or len(exporter.endpoints) > 1
+    ):
+        span_exporter = _PayloadSpanExporter(get_payload_exporter(exporter=exporter))
+    elif exporter.exporter_type == ExporterType.HTTP:
+        # Only the exporter in use is imported, the exporters are slow to import.
+        from opentelemetry.exporter.otlp.proto.http import (
+            Compression as HTTPCompression,
+        )
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter as HTTPSpanExporter,
+        )
+
         span_exporter = HTTPSpanExporter(
-            endpoint=exporter.endpoint, headers=exporter.headers
+            endpoint=exporter.endpoint,
+            headers=exporter.headers,
+            timeout=exporter.timeout,
+            compression=HTTPCompression(exporter.compression.value),
         )
     elif exporter.exporter_type == ExporterType.GRPC:
-        if GRPCSpanExporter is None:
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+                OTLPSpanExporter as GRPCSpanExporter,
+            )
+        except ImportError:
             raise RuntimeError(
                 "opentelemetry-exporter-otlp-proto-grpc needs to be installed "
                 "to use the GRPC exporter."
-            )
+            ) from None
 
         span_exporter = GRPCSpanExporter(
-            endpoint=exporter.endpoint, headers=exporter.headers
+            endpoint=exporter.endpoint,
+            headers=exporter.headers,
+            timeout=exporter.timeout,
+            compression=grpc_compression(exporter.compression),
+            # The OTEL type hints only allow str option values.
+            channel_options=tuple(exporter.grpc_options) or None,  # type: ignore[arg-type]
         )
     else:
         raise RuntimeError("Unsupported span exporter.")
 
-    span_processors.append(BatchSpanProcessor(span_exporter))
+    span_processors.append(
+        _MeteredBatchSpanProcessor(
+            _MeteredSpanExporter(span_exporter),
+            max_queue_size=exporter.max_queue_size,
+            schedule_delay_millis=exporter.schedule_delay_millis,
+            max_export_batch_size=exporter.max_export_batch_size,
+            export_timeout_millis=exporter.timeout * 1000,
+        )
+    )
+    span_processors.extend(get_otel_debug_span_processors())
+
+    return span_processors
+
+
+def get_otel_debug_span_processors() -> list[SpanProcessor]:
+    """
+    Build the debug span processors enabled by the OTEL_TRACE_DEBUG env variable.
+    """
+
+    if not _bool_from_string(os.environ.get("OTEL_TRACE_DEBUG", "false")):
+        return []
 
-    # Setup OTEL debug processor
-    otel_trace_debug = _bool_from_string(os.environ.get("OTEL_TRACE_DEBUG", "false"))
     otel_trace_debug_file = os.environ.get("OTEL_TRACE_DEBUG_FILE")
-    if otel_trace_debug:
-        logger.info(f"OTEL debug processor to {otel_trace_debug_file or 'stdout'}")
-        debug_out = (
-            sys.stdout
-            if not otel_trace_debug_file
-            else open(otel_trace_debug_file, "w")
+    logger.info(f"OTEL debug processor to {otel_trace_debug_file or 'stdout'}")
+
+    # Spans are written in batches from a background thread, so debugging does not
+    # add serialization and file writes to the latency of the traced code.
+    max_bytes = int(os.environ.get("OTEL_TRACE_DEBUG_FILE_MAX_BYTES", "104857600"))
+    return [
+        BatchSpanProcessor(
+            FileSpanExporter(
+                path=otel_trace_debug_file,
+                format=DebugFormat(os.environ.get("OTEL_TRACE_DEBUG_FORMAT", "json")),
+                max_bytes=max_bytes or None,
+                backup_count=int(
+                    os.environ.get("OTEL_TRACE_DEBUG_FILE_BACKUP_COUNT", "3")
+                ),
+            ),
+            schedule_delay_millis=1000,
         )
-        span_processors.append(SimpleSpanProcessor(ConsoleSpanExporter(out=debug_out)))
+    ]
 
-    return span_processors
+
+def get_payload_exporter(
+    *, exporter: Exporter, grpc_method: str = GRPC_TRACE_EXPORT_METHOD
+) -> PayloadExporter:
+    """
+    Build an exporter that sends already encoded OTLP payloads.
+    """
+
+    # With several endpoints a failing request moves on to the next endpoint,
+    # instead of retrying the same one.
+    max_retries = 1 if len(exporter.endpoints) > 1 else MAX_RETRIES
+    endpoint_exporters: list[PayloadExporter] = []
+    for endpoint in exporter.endpoints:
+        if exporter.exporter_type == ExporterType.HTTP:
+            endpoint_exporters.append(
+                HTTPPayloadExporter(
+                    endpoint=endpoint,
+                    headers=exporter.headers,
+                    timeout=exporter.timeout,
+                    compression=exporter.compression,
+                    max_retries=max_retries,
+                )
+            )
+        elif exporter.exporter_type == ExporterType.GRPC:
+            endpoint_exporters.append(
+                GRPCPayloadExporter(
+                    endpoint=endpoint,
+                    headers=exporter.headers,
+                    timeout=exporter.timeout,
+                    method=grpc_method,
+                    compression=exporter.compression,
+                    options=exporter.grpc_options,
+                    max_retries=max_retries,
+                )
+            )
+        else:
+            raise RuntimeError("Unsupported span exporter.")
+
+    payload_exporter: PayloadExporter
+    if len(endpoint_exporters) > 1:
+        payload_exporter = MultiPayloadExporter(endpoint_exporters, exporter.balancing)
+    else:
+        payload_exporter = endpoint_exporters[0]
+
+    if exporter.spool is not None:
+        payload_exporter = SpoolingPayloadExporter(payload_exporter, exporter.spool)
+
+    # Only trace export requests are captured, for `troncos replay`.
+    if exporter.capture_file is not None and grpc_method == GRPC_TRACE_EXPORT_METHOD:
+        from ._capture import CapturingPayloadExporter
+
+        payload_exporter = CapturingPayloadExporter(
+            payload_exporter, exporter.capture_file
+        )
+    return payload_exporter
+
+
+def get_encoded_span_processor(
+    *, exporter: Exporter, shared_exporter: SharedExporter | None = None
+) -> EncodedBatchProcessor:
+    """
+    Build the processor used to batch and export spans encoded by `SpanEncoder`.
+    """
+
+    if shared_exporter is not None:
+        # The shared exporter process does the real batching, so hand the spans
+        # over often and keep little in memory here.
+        return EncodedBatchProcessor(
+            UnixSocketPayloadExporter(socket_path=shared_exporter.socket_path),
+            schedule_delay_millis=200,
+        )
+
+    return EncodedBatchProcessor(
+        get_payload_exporter(exporter=exporter),
+        max_queue_size=exporter.max_queue_size,
+        schedule_delay_millis=exporter.schedule_delay_millis,
+        max_export_batch_size=exporter.max_export_batch_size,
+        max_export_batch_bytes=exporter.max_export_batch_bytes,
+    )
+
+
+def get_metrics_reporter(
+    *, self_metrics: SelfMetrics, resource: Resource
+) -> MetricsReporter:
+    """
+    Build the reporter that periodically exports the trace pipeline metrics.
+    """
+
+    return MetricsReporter(
+        get_payload_exporter(
+            exporter=self_metrics.exporter, grpc_method=GRPC_METRICS_EXPORT_METHOD
+        ),
+        lambda: encode_metrics_request(
+            tracing_metrics.snapshot(), resource, tracing_metrics.start_time_ns
+        ),
+        interval=self_metrics.interval,
+    )
+
+
+def get_span_metrics_reporter(
+    *, span_metrics: SpanMetrics, aggregator: SpanMetricsAggregator
+) -> MetricsReporter:
+    """
+    Build the reporter that periodically exports the RED metrics of finished spans.
+    """
+
+    return MetricsReporter(
+        get_payload_exporter(
+            exporter=span_metrics.exporter, grpc_method=GRPC_METRICS_EXPORT_METHOD
+        ),
+        aggregator.encode_request,
+        interval=span_metrics.interval,
+    )
+
+
+def get_function_profile_reporter(
+    *, function_profile: FunctionProfile, resource: Resource
+) -> MetricsReporter | SummarySpanReporter:
+    """
+    Build the reporter that periodically exports the call statistics of profiled
+    functions, as metrics or as a summary span.
+    """
+
+    if function_profile.output == ProfileOutput.SPAN:
+        return SummarySpanReporter(function_profile.interval, function_profile.top)
+
+    return MetricsReporter(
+        get_payload_exporter(
+            exporter=function_profile.exporter, grpc_method=GRPC_METRICS_EXPORT_METHOD
+        ),
+        lambda: encode_profile_request(
+            call_stats.snapshot(), resource, call_stats.start_time_ns
+        ),
+        interval=function_profile.interval,
+    )
@@ -0,0 +1,185 @@
+import collections
+import os
+import threading
+import time
+import weakref
+
+from structlog import get_logger
+
+from ._encoder import EncodedSpan, encode_export_request
+from ._metrics import tracing_metrics
+from ._transport import PayloadExporter
+
+logger = get_logger()
+
+
+def _spans_size(spans: list[EncodedSpan]) -> int:
+    # The resources are shared by many spans, only the spans are counted.
+    return sum(len(span.span) for span in spans)
+
+
+class EncodedBatchProcessor:
+    """
+    Batches encoded spans and exports them from a background thread. This is the
+    counterpart of the OTEL `BatchSpanProcessor` for spans encoded by `SpanEncoder`.
+
+    The spans of a trace chunk are kept together in one export request, unless the
+    chunk alone is larger than a batch. Batches are limited by both the number of
+    spans and their encoded size, and exported when either limit is reached or
+    after `schedule_delay_millis`.
+    """
+
+    def __init__(
+        self,
+        payload_exporter: PayloadExporter,
+        *,
+        max_queue_size: int = 2048,
+        schedule_delay_millis: float = 5000,
+        max_export_batch_size: int = 512,
+        max_export_batch_bytes: int = 2097152,
+    ) -> None:
+        assert max_export_batch_size <= max_queue_size, (
+            "'max_export_batch_size' has to be less or equal to 'max_queue_size'"
+        )
+        assert max_export_batch_bytes > 0, "'max_export_batch_bytes' has to be positive"
+
+        self.payload_exporter = payload_exporter
+        self.max_queue_size = max_queue_size
+        self.schedule_delay = schedule_delay_millis / 1000
+        self.max_export_batch_size = max_export_batch_size
+        self.max_export_batch_bytes = max_export_batch_bytes
+
+        self.dropped_spans = 0
+
+        self._queue: collections.deque[list[EncodedSpan]] = collections.deque()
+        self._queued_spans = 0
+        self._queued_bytes = 0
+        self._shutdown = False
+        self._start_worker()
+
+        # Forked processes need their own worker thread, see gunicorn and celery.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            processor = weak_self()
+            if processor is not None and not processor._shutdown:
+                processor._start_worker()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def _start_worker(self) -> None:
+        self._queue.clear()
+        self._queued_spans = 0
+        self._queued_bytes = 0
+        self._condition = threading.Condition(threading.Lock())
+        self._export_lock = threading.Lock()
+        self._worker = threading.Thread(
+            name="troncos.EncodedBatchProcessor", target=self._run, daemon=True
+        )
+        self._worker.start()
+
+    def _batch_ready(self) -> bool:
+        return (
+            self._queued_spans >= self.max_export_batch_size
+            or self._queued_bytes >= self.max_export_batch_bytes
+        )
+
+    def on_end(self, spans: list[EncodedSpan]) -> None:
+        """Queue the encoded spans of a trace chunk."""
+
+        if self._shutdown or not spans:
+            return
+
+        with self._condition:
+            free = self.max_queue_size - self._queued_spans
+            if len(spans) > free:
+                self.dropped_spans += len(spans) - free
+                tracing_metrics.add("spans_dropped", len(spans) - free)
+                spans = spans[:free]
+                if not spans:
+                    return
+            self._queue.append(spans)
+            self._queued_spans += len(spans)
+            self._queued_bytes += _spans_size(spans)
+            if self._batch_ready():
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while not self._shutdown:
+            with self._condition:
+                if not self._batch_ready():
+                    self._condition.wait(self.schedule_delay)
+            self._export_all()
+
+    def _next_batch(self) -> list[EncodedSpan]:
+        batch: list[EncodedSpan] = []
+        batch_bytes = 0
+        with self._condition:
+            while self._queue:
+                chunk = self._queue[0]
+                chunk_bytes = _spans_size(chunk)
+                if (
+                    len(batch) + len(chunk) <= self.max_export_batch_size
+                    and batch_bytes + chunk_bytes <= self.max_export_batch_bytes
+                ):
+                    self._queue.popleft()
+                    batch.extend(chunk)
+                    batch_bytes += chunk_bytes
+                    continue
+
+                # Only chunks larger than a batch are split, the others wait for
+                # the next batch.
+                if batch:
+                    break
+                count = 0
+                for span in chunk:
+                    if count and (
+                        count >= self.max_export_batch_size
+                        or batch_bytes + len(span.span) > self.max_export_batch_bytes
+                    ):
+                        break
+                    count += 1
+                    batch_bytes += len(span.span)
+                batch = chunk[:count]
+                self._queue[0] = chunk[count:]
+                break
+
+            self._queued_spans -= len(batch)
+            self._queued_bytes -= batch_bytes
+        return batch
+
+    def _export_all(self) -> None:
+        with self._export_lock:
+            while batch := self._next_batch():
+                start = time.perf_counter()
+                try:
+                    exported = self.payload_exporter.export(
+                        encode_export_request(batch)
+                    )
+                except Exception:
+                    exported = False
+                    logger.exception("Exception while exporting span batch")
+
+                tracing_metrics.record(
+                    "export_duration_seconds", time.perf_counter() - start
+                )
+                tracing_metrics.record("export_batch_size", len(batch))
+                tracing_metrics.add(
+                    "spans_exported" if exported else "spans_export_failed",
+                    len(batch),
+                )
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self._export_all()
+        return True
+
+    def shutdown(self) -> None:
+        if self._shutdown:
+            return
+
+        self._shutdown = True
+        with self._condition:
+            self._condition.notify_all()
+        self._worker.join()
+        self._export_all()
+        self.payload_exporter.shutdown()
@@ -0,0 +1,378 @@
+import bisect
+import os
+import threading
+import time
+import weakref
+from enum import Enum
+from typing import TYPE_CHECKING, NamedTuple
+
+from structlog import get_logger
+
+from ._exporter import Exporter
+from ._metrics import _DURATION_BUCKETS
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.resources import Resource
+
+logger = get_logger()
+
+_BOUNDARIES_NS = [int(boundary * 1e9) for boundary in _DURATION_BUCKETS]
+
+
+class ProfileOutput(Enum):
+    METRICS = "metrics"
+    SPAN = "span"
+
+
+class FunctionProfile:
+    """
+    Configuration for exporting the call statistics of functions decorated with
+    `profile=True`, either as OTLP metrics or as one summary span per interval with
+    the `top` functions by time spent.
+    """
+
+    def __init__(
+        self,
+        *,
+        exporter: Exporter | None = None,
+        interval: float | None = None,
+        output: ProfileOutput | None = None,
+        top: int | None = None,
+    ) -> None:
+        if exporter is None:
+            exporter = Exporter(path="/v1/metrics")
+        if interval is None:
+            interval = float(os.environ.get("OTEL_TRACE_PROFILE_INTERVAL", "60"))
+        if output is None:
+            output = ProfileOutput(
+                os.environ.get("OTEL_TRACE_PROFILE_OUTPUT", "metrics").lower()
+            )
+        if top is None:
+            top = int(os.environ.get("OTEL_TRACE_PROFILE_TOP", "20"))
+
+        assert interval > 0, "'interval' has to be positive"
+        assert top > 0, "'top' has to be positive"
+
+        self.exporter = exporter
+        self.interval = interval
+        self.output = output
+        self.top = top
+
+
+class FunctionStats(NamedTuple):
+    name: str
+    calls: int
+    errors: int
+    total_seconds: float
+    max_seconds: float
+    duration_buckets: tuple[float, ...]
+    bucket_counts: list[int]
+
+
+class _CallStats:
+    __slots__ = ("bucket_counts", "calls", "errors", "max_ns", "total_ns")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.bucket_counts = [0] * (len(_BOUNDARIES_NS) + 1)
+
+    def merge(self, other: "_CallStats") -> None:
+        self.calls += other.calls
+        self.errors += other.errors
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        for i, count in enumerate(other.bucket_counts):
+            self.bucket_counts[i] += count
+
+
+_Table = dict[str, _CallStats]
+
+
+class CallStatsAggregator:
+    """
+    Records the calls of profiled functions in tables owned by each thread, so
+    recording a call takes no lock. The tables are only merged for a snapshot.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+        # Counts are per process, forked processes start from zero.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            aggregator = weak_self()
+            if aggregator is not None:
+                aggregator.reset()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.start_time_ns = time.time_ns()
+        self._tables: list[tuple["weakref.ref[threading.Thread]", _Table]] = []
+        # The tables of threads that have exited.
+        self._retired: _Table = {}
+
+    def _thread_table(self) -> _Table:
+        table: _Table = {}
+        self._local.table = table
+        with self._lock:
+            self._tables.append((weakref.ref(threading.current_thread()), table))
+        return table
+
+    def record(self, name: str, duration_ns: int, error: bool) -> None:
+        try:
+            table: _Table = self._local.table
+        except AttributeError:
+            table = self._thread_table()
+
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = _CallStats()
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+        stats.total_ns += duration_ns
+        stats.max_ns = max(stats.max_ns, duration_ns)
+        stats.bucket_counts[bisect.bisect_left(_BOUNDARIES_NS, duration_ns)] += 1
+
+    def snapshot(self) -> list[FunctionStats]:
+        """Returns the statistics of all profiled functions since the start."""
+
+        merged: _Table = {}
+        with self._lock:
+            live_tables = []
+            for thread_ref, table in self._tables:
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    for name, stats in list(table.items()):
+                        self._retired.setdefault(name, _CallStats()).merge(stats)
+                else:
+                    live_tables.append((thread_ref, table))
+            self._tables = live_tables
+            tables = [table for _, table in live_tables] + [self._retired]
+
+            # Other threads might record calls meanwhile, so the snapshot can be a
+            # few calls behind.
+            for table in tables:
+                for name, stats in list(table.items()):
+                    merged.setdefault(name, _CallStats()).merge(stats)
+
+        duration_buckets = tuple(_DURATION_BUCKETS)
+        return [
+            FunctionStats(
+                name=name,
+                calls=stats.calls,
+                errors=stats.errors,
+                total_seconds=stats.total_ns / 1e9,
+                max_seconds=stats.max_ns / 1e9,
+                duration_buckets=duration_buckets,
+                bucket_counts=stats.bucket_counts,
+            )
+            for name, stats in merged.items()
+        ]
+
+
+call_stats = CallStatsAggregator()
+
+
+def get_function_stats(top: int | None = None) -> list[FunctionStats]:
+    """
+    Returns the call statistics of functions decorated with `profile=True` in this
+    process, the functions with the most total time first.
+    """
+
+    stats = sorted(call_stats.snapshot(), key=lambda s: s.total_seconds, reverse=True)
+    return stats if top is None else stats[:top]
+
+
+def encode_profile_request(
+    stats: list[FunctionStats], resource: "Resource", start_time_ns: int
+) -> bytes:
+    """Encode call statistics as an OTLP `ExportMetricsServiceRequest`."""
+
+    from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+        ExportMetricsServiceRequest,
+    )
+    from opentelemetry.proto.common.v1.common_pb2 import (
+        AnyValue,
+        InstrumentationScope,
+        KeyValue,
+    )
+    from opentelemetry.proto.metrics.v1.metrics_pb2 import (
+        AggregationTemporality,
+        Histogram,
+        HistogramDataPoint,
+        Metric,
+        NumberDataPoint,
+        ResourceMetrics,
+        ScopeMetrics,
+        Sum,
+    )
+    from opentelemetry.proto.resource.v1.resource_pb2 import Resource as PB2Resource
+
+    from ._encoder import encode_resource
+
+    now = time.time_ns()
+    cumulative = AggregationTemporality.AGGREGATION_TEMPORALITY_CUMULATIVE
+
+    def _attributes(function: str) -> list[KeyValue]:
+        return [KeyValue(key="function", value=AnyValue(string_value=function))]
+
+    def _counter(name: str, description: str, values: list[tuple[str, int]]) -> Metric:
+        return Metric(
+            name=name,
+            description=description,
+            unit="{call}",
+            sum=Sum(
+                data_points=[
+                    NumberDataPoint(
+                        attributes=_attributes(function),
+                        start_time_unix_nano=start_time_ns,
+                        time_unix_nano=now,
+                        as_int=value,
+                    )
+                    for function, value in values
+                ],
+                aggregation_temporality=cumulative,
+                is_monotonic=True,
+            ),
+        )
+
+    metrics = [
+        _counter(
+            "troncos.function.calls",
+            "Calls of profiled functions.",
+            [(s.name, s.calls) for s in stats],
+        ),
+        _counter(
+            "troncos.function.errors",
+            "Calls of profiled functions that raised an exception.",
+            [(s.name, s.errors) for s in stats],
+        ),
+        Metric(
+            name="troncos.function.duration",
+            description="Duration of calls of profiled functions.",
+            unit="s",
+            histogram=Histogram(
+                data_points=[
+                    HistogramDataPoint(
+                        attributes=_attributes(s.name),
+                        start_time_unix_nano=start_time_ns,
+                        time_unix_nano=now,
+                        count=s.calls,
+                        sum=s.total_seconds,
+                        max=s.max_seconds,
+                        bucket_counts=s.bucket_counts,
+                        explicit_bounds=s.duration_buckets,
+                    )
+                    for s in stats
+                ],
+                aggregation_temporality=cumulative,
+            ),
+        ),
+    ]
+
+    request = ExportMetricsServiceRequest(
+        resource_metrics=[
+            ResourceMetrics(
+                resource=PB2Resource.FromString(encode_resource(resource)),
+                scope_metrics=[
+                    ScopeMetrics(
+                        scope=InstrumentationScope(name="troncos"),
+                        metrics=metrics,
+                    )
+                ],
+            )
+        ]
+    )
+    result: bytes = request.SerializeToString()
+    return result
+
+
+class SummarySpanReporter:
+    """
+    Creates one `troncos.function_profile` span per interval, with the calls,
+    errors and time spent in the `top` profiled functions during the interval.
+    """
+
+    def __init__(self, interval: float, top: int) -> None:
+        self.interval = interval
+        self.top = top
+        # Calls made before the reporter started, which the reporter of a replaced
+        # writer has already reported, are not reported again.
+        self._start_worker({s.name: s for s in call_stats.snapshot()})
+
+        # Forked processes need their own worker thread, see gunicorn and celery.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            reporter = weak_self()
+            if reporter is not None and not reporter._stop.is_set():
+                # The call statistics of forked processes start from zero.
+                reporter._start_worker({})
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def _start_worker(self, previous: dict[str, FunctionStats]) -> None:
+        self._previous = previous
+        self._previous_time_ns = time.time_ns()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(
+            name="troncos.SummarySpanReporter", target=self._run, daemon=True
+        )
+        self._worker.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self) -> None:
+        from ddtrace.trace import tracer
+
+        try:
+            stats = call_stats.snapshot()
+            deltas = []
+            for s in stats:
+                previous = self._previous.get(s.name)
+                calls = s.calls - (previous.calls if previous else 0)
+                if calls:
+                    deltas.append(
+                        (
+                            s.total_seconds
+                            - (previous.total_seconds if previous else 0.0),
+                            calls,
+                            s.errors - (previous.errors if previous else 0),
+                            s.name,
+                        )
+                    )
+            self._previous = {s.name: s for s in stats}
+
+            start_ns = self._previous_time_ns
+            self._previous_time_ns = time.time_ns()
+            if not deltas:
+                return
+
+            deltas.sort(reverse=True)
+            span = tracer.trace("troncos.function_profile")
+            span.start_ns = start_ns
+            for total_seconds, calls, errors, name in deltas[: self.top]:
+                span.set_metric(f"function.{name}.calls", calls)
+                span.set_metric(f"function.{name}.errors", errors)
+                span.set_metric(f"function.{name}.duration.total", total_seconds)
+            span.finish()
+        except Exception:
+            logger.exception("Exception while reporting function profile")
+
+    def shutdown(self) -> None:
+        if self._stop.is_set():
+            return
+
+        self._stop.set()
+        self._worker.join()
+        self.export()
@@ -0,0 +1,82 @@
+from typing import NamedTuple
+
+REDACTED_VALUE = "<redacted>"
+
+# Attribute keys are mostly static, but some integrations put ids or header names
+# in them. The decision cache stops growing when it is full.
+_MAX_CACHED_DECISIONS = 4096
+
+
+class AttributeDecision(NamedTuple):
+    """
+    What to do with a span attribute: the key to export it as, and if the value
+    should be redacted.
+    """
+
+    key: str
+    redact: bool
+
+
+def _matches(key: str, keys: frozenset[str], prefixes: tuple[str, ...]) -> bool:
+    return key in keys or (bool(prefixes) and key.startswith(prefixes))
+
+
+class AttributeRules:
+    """
+    Rules for the span attributes taken from ddtrace tags.
+
+    If `allow` or `allow_prefixes` are given only matching keys are kept. Keys
+    matching `deny` or `deny_prefixes` are always dropped. Kept keys are renamed
+    according to `rename`, and the values of keys matching `redact` or
+    `redact_prefixes` are replaced with `redacted_value`. All rules match the
+    original ddtrace tag names.
+
+    The decision for a key is made once and then looked up.
+    """
+
+    def __init__(
+        self,
+        *,
+        allow: list[str] | None = None,
+        allow_prefixes: list[str] | None = None,
+        deny: list[str] | None = None,
+        deny_prefixes: list[str] | None = None,
+        rename: dict[str, str] | None = None,
+        redact: list[str] | None = None,
+        redact_prefixes: list[str] | None = None,
+        redacted_value: str = REDACTED_VALUE,
+    ) -> None:
+        self.allow = frozenset(allow or [])
+        self.allow_prefixes = tuple(allow_prefixes or [])
+        self.deny = frozenset(deny or [])
+        self.deny_prefixes = tuple(deny_prefixes or [])
+        self.rename = dict(rename or {})
+        self.redact = frozenset(redact or [])
+        self.redact_prefixes = tuple(redact_prefixes or [])
+        self.redacted_value = redacted_value
+
+        self._allow_all = not self.allow and not self.allow_prefixes
+        self._decisions: dict[str, AttributeDecision | None] = {}
+
+    def _decide(self, key: str) -> AttributeDecision | None:
+        if not self._allow_all and not _matches(key, self.allow, self.allow_prefixes):
+            return None
+        if _matches(key, self.deny, self.deny_prefixes):
+            return None
+        return AttributeDecision(
+            self.rename.get(key, key),
+            _matches(key, self.redact, self.redact_prefixes),
+        )
+
+    def decide(self, key: str) -> AttributeDecision | None:
+        """Returns how to export the attribute `key`, or None to drop it."""
+
+        try:
+            return self._decisions[key]
+        except KeyError:
+            pass
+
+        decision = self._decide(key)
+        if len(self._decisions) < _MAX_CACHED_DECISIONS:
+            self._decisions[key] = decision
+        return decision
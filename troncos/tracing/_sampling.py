@@ -0,0 +1,131 @@
+import fnmatch
+import os
+import re
+
+from ddtrace.trace import Span
+
+# Same hashing of trace ids as the ddtrace samplers, so the decision for a trace is
+# the same in every process and for every chunk of the trace.
+_KNUTH_FACTOR = 1111111111111111111
+_MAX_UINT_64 = (1 << 64) - 1
+
+
+def _compile_glob(pattern: str | None) -> re.Pattern[str] | None:
+    if pattern is None:
+        return None
+    return re.compile(fnmatch.translate(pattern))
+
+
+class TailSamplingRule:
+    """
+    Overrides the tail sampling settings for traces whose root span matches all
+    the given glob patterns.
+    """
+
+    def __init__(
+        self,
+        *,
+        service: str | None = None,
+        name: str | None = None,
+        resource: str | None = None,
+        sample_rate: float | None = None,
+        slow_threshold: float | None = None,
+    ) -> None:
+        assert sample_rate is None or 0 <= sample_rate <= 1, (
+            "'sample_rate' has to be between 0 and 1"
+        )
+
+        self.service = service
+        self.name = name
+        self.resource = resource
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+        self._patterns = [
+            (attr, compiled)
+            for attr, pattern in [
+                ("service", service),
+                ("name", name),
+                ("resource", resource),
+            ]
+            if (compiled := _compile_glob(pattern)) is not None
+        ]
+
+    def matches(self, span: Span) -> bool:
+        return all(
+            pattern.match(getattr(span, attr) or "") for attr, pattern in self._patterns
+        )
+
+
+class TailSampler:
+    """
+    Decides which traces to export once all spans of the local trace are finished.
+
+    Traces with an error span, and traces where the root span took longer than
+    `slow_threshold` seconds, are always kept. Of the remaining traces
+    `sample_rate` are kept. The first matching rule overrides the `sample_rate`
+    and `slow_threshold`.
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_rate: float | None = None,
+        slow_threshold: float | None = None,
+        keep_errors: bool = True,
+        rules: list[TailSamplingRule] | None = None,
+    ) -> None:
+        if sample_rate is None:
+            sample_rate = float(os.environ.get("OTEL_TRACE_TAIL_SAMPLE_RATE", "1.0"))
+        if slow_threshold is None and "OTEL_TRACE_TAIL_SLOW_THRESHOLD" in os.environ:
+            slow_threshold = float(os.environ["OTEL_TRACE_TAIL_SLOW_THRESHOLD"])
+
+        assert 0 <= sample_rate <= 1, "'sample_rate' has to be between 0 and 1"
+
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.keep_errors = keep_errors
+        self.rules = rules or []
+
+    def _rule(self, root: Span) -> TailSamplingRule | None:
+        for rule in self.rules:
+            if rule.matches(root):
+                return rule
+        return None
+
+    def sample(self, spans: list[Span]) -> bool:
+        """Returns True if the trace chunk should be kept."""
+
+        if self.keep_errors and any(span.error for span in spans):
+            return True
+
+        root = spans[0]._local_root
+        sample_rate = self.sample_rate
+        slow_threshold = self.slow_threshold
+
+        rule = self._rule(root)
+        if rule is not None:
+            if rule.sample_rate is not None:
+                sample_rate = rule.sample_rate
+            if rule.slow_threshold is not None:
+                slow_threshold = rule.slow_threshold
+
+        # The root span is only available if this chunk contains it, it might have
+        # been flushed separately by ddtrace partial flushing.
+        if (
+            slow_threshold is not None
+            and root.duration_ns is not None
+            and root.duration_ns >= slow_threshold * 1e9
+        ):
+            return True
+
+        if sample_rate >= 1:
+            return True
+        if sample_rate <= 0:
+            return False
+
+        trace_id_64bits = root.trace_id & _MAX_UINT_64
+        return bool(
+            (trace_id_64bits * _KNUTH_FACTOR) & _MAX_UINT_64
+            <= sample_rate * _MAX_UINT_64
+        )
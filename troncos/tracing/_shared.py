@@ -0,0 +1,277 @@
+import collections
+import multiprocessing
+import os
+import signal
+import selectors
+import socketserver
+import struct
+import threading
+import time
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING
+
+from structlog import get_logger
+
+from ._exporter import Exporter, SharedExporter
+
+if TYPE_CHECKING:
+    from ._transport import PayloadExporter
+
+logger = get_logger()
+
+_HEADER = struct.Struct(">I")
+_STARTUP_TIMEOUT = 10.0
+_POLL_INTERVAL = 0.5
+
+
+class PayloadBatcher:
+    """
+    Merges encoded OTLP export requests into larger requests. Concatenated protobuf
+    messages parse as one message with the repeated fields of all of them, so the
+    payloads can be merged without decoding them.
+
+    At most `max_buffered_bytes` are buffered while the collector is slow or
+    unreachable, the oldest payloads are dropped first.
+    """
+
+    def __init__(
+        self,
+        payload_exporter: "PayloadExporter",
+        *,
+        schedule_delay_millis: float,
+        max_payload_bytes: int,
+        max_buffered_bytes: int = 67108864,
+    ) -> None:
+        self.payload_exporter = payload_exporter
+        self.schedule_delay = schedule_delay_millis / 1000
+        self.max_payload_bytes = max_payload_bytes
+        self.max_buffered_bytes = max_buffered_bytes
+        self.dropped_payloads = 0
+
+        self._payloads: collections.deque[bytes] = collections.deque()
+        self._size = 0
+        self._dropped_since_flush = 0
+        self._shutdown = False
+        self._condition = threading.Condition(threading.Lock())
+        self._export_lock = threading.Lock()
+        self._worker = threading.Thread(
+            name="troncos.PayloadBatcher", target=self._run, daemon=True
+        )
+        self._worker.start()
+
+    def add(self, payload: bytes) -> None:
+        with self._condition:
+            self._payloads.append(payload)
+            self._size += len(payload)
+            while self._size > self.max_buffered_bytes and len(self._payloads) > 1:
+                self._size -= len(self._payloads.popleft())
+                self.dropped_payloads += 1
+                self._dropped_since_flush += 1
+            if self._size >= self.max_payload_bytes:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while not self._shutdown:
+            with self._condition:
+                if self._size < self.max_payload_bytes:
+                    self._condition.wait(self.schedule_delay)
+            self.flush()
+
+    def _next_payload(self) -> bytes:
+        with self._condition:
+            payloads: list[bytes] = []
+            size = 0
+            while self._payloads and (
+                not payloads or size + len(self._payloads[0]) <= self.max_payload_bytes
+            ):
+                payload = self._payloads.popleft()
+                payloads.append(payload)
+                size += len(payload)
+            self._size -= size
+            return b"".join(payloads)
+
+    def flush(self) -> None:
+        with self._condition:
+            dropped, self._dropped_since_flush = self._dropped_since_flush, 0
+        if dropped:
+            logger.warning(
+                "Dropped OTLP payloads, the shared exporter buffer is full",
+                dropped_payloads=dropped,
+            )
+
+        with self._export_lock:
+            while payload := self._next_payload():
+                try:
+                    self.payload_exporter.export(payload)
+                except Exception:
+                    logger.exception("Exception while exporting span batch")
+
+    def shutdown(self) -> None:
+        if self._shutdown:
+            return
+
+        self._shutdown = True
+        with self._condition:
+            self._condition.notify_all()
+        self._worker.join()
+        self.flush()
+        self.payload_exporter.shutdown()
+
+
+class _PayloadHandler(socketserver.BaseRequestHandler):
+    server: "SharedExporterServer"
+
+    def handle(self) -> None:
+        # Workers keep their connection open, so wake up now and then to see if
+        # the server is closing.
+        self.request.settimeout(_POLL_INTERVAL)
+        buffer = bytearray()
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except TimeoutError:
+                if self.server.closing:
+                    # A partial payload would keep the server from closing.
+                    if buffer:
+                        logger.warning(
+                            "Dropped partial OTLP payload on shutdown",
+                            size=len(buffer),
+                        )
+                    return
+                continue
+
+            if not data:
+                return
+
+            buffer += data
+            while len(buffer) >= _HEADER.size:
+                (size,) = _HEADER.unpack_from(buffer)
+                if len(buffer) < _HEADER.size + size:
+                    break
+                self.server.batcher.add(
+                    bytes(buffer[_HEADER.size : _HEADER.size + size])
+                )
+                del buffer[: _HEADER.size + size]
+
+
+class SharedExporterServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Receives encoded OTLP export requests from the processes on this host and
+    exports them in larger batches over a single connection to the collector.
+    """
+
+    # Closing the server waits for the payloads being received.
+    block_on_close = True
+    daemon_threads = False
+
+    def __init__(self, socket_path: str, batcher: PayloadBatcher) -> None:
+        self.batcher = batcher
+        self.socket_path = socket_path
+        self.closing = False
+
+        # A socket left behind by a previous exporter process.
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        super().__init__(socket_path, _PayloadHandler)
+
+    def accept_pending(self) -> None:
+        """Handle the connections waiting to be accepted."""
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(self, selectors.EVENT_READ)
+            while selector.select(0):
+                self.handle_request()
+
+    def server_close(self) -> None:
+        self.closing = True
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def create_shared_exporter_server(
+    *, exporter: Exporter, shared_exporter: SharedExporter
+) -> SharedExporterServer:
+    from ._otel import get_payload_exporter
+
+    return SharedExporterServer(
+        shared_exporter.socket_path,
+        PayloadBatcher(
+            get_payload_exporter(exporter=exporter),
+            schedule_delay_millis=shared_exporter.schedule_delay_millis,
+            max_payload_bytes=shared_exporter.max_payload_bytes,
+            max_buffered_bytes=shared_exporter.max_buffered_bytes,
+        ),
+    )
+
+
+def serve_shared_exporter(
+    *, exporter: Exporter, shared_exporter: SharedExporter
+) -> None:
+    """Run the shared exporter in this process until it is terminated."""
+
+    # Install the handler before the socket exists, start_shared_exporter() sees
+    # the exporter as started as soon as it does.
+    terminated = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.set())
+
+    server = create_shared_exporter_server(
+        exporter=exporter, shared_exporter=shared_exporter
+    )
+
+    # shutdown() waits for serve_forever() to return, so call it from a thread.
+    def _shutdown_on_sigterm() -> None:
+        terminated.wait()
+        server.shutdown()
+
+    threading.Thread(target=_shutdown_on_sigterm, daemon=True).start()
+    try:
+        server.serve_forever()
+        server.accept_pending()
+    finally:
+        server.server_close()
+        server.batcher.shutdown()
+
+
+def start_shared_exporter(
+    *,
+    exporter: Exporter | None = None,
+    shared_exporter: SharedExporter | None = None,
+) -> BaseProcess:
+    """
+    Start the shared exporter in a separate process. Call this in the parent process
+    of a pre-fork server, like the gunicorn `on_starting` hook, before the workers
+    are forked.
+    """
+
+    if exporter is None:
+        exporter = Exporter()
+    if shared_exporter is None:
+        shared_exporter = SharedExporter()
+
+    # The socket is only created once the exporter process is listening.
+    if os.path.exists(shared_exporter.socket_path):
+        os.unlink(shared_exporter.socket_path)
+
+    # Spawn rather than fork, the exporter should not inherit the state of the
+    # server process.
+    process = multiprocessing.get_context("spawn").Process(
+        name="troncos.SharedExporter",
+        target=serve_shared_exporter,
+        kwargs={"exporter": exporter, "shared_exporter": shared_exporter},
+        daemon=True,
+    )
+    process.start()
+
+    # Wait for the socket, so spans from the first requests are not lost.
+    deadline = time.monotonic() + _STARTUP_TIMEOUT
+    while not os.path.exists(shared_exporter.socket_path):
+        if not process.is_alive() or time.monotonic() > deadline:
+            logger.error(
+                "Shared exporter did not start", socket_path=shared_exporter.socket_path
+            )
+            break
+        time.sleep(0.01)
+
+    return process
@@ -1,3 +1,5 @@
+import threading
+from itertools import chain
 from typing import Any
 
 from ddtrace import constants, ext
@@ -15,6 +17,9 @@ from opentelemetry.sdk.util import BoundedList
 from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode
 from opentelemetry.trace.span import TraceFlags
 
+from ._limits import AttributeLimits
+from ._rules import AttributeRules
+
 _dd_span_ignore_attr = {
     "runtime-id",
     "_sampling_priority_v1",
@@ -25,6 +30,8 @@ _dd_span_ignore_attr = {
 
 _trace_flags_sampled = TraceFlags(1)
 
+_MAX_CACHED_RESOURCES = 256
+
 
 def _span_context(span: DDSpan) -> SpanContext:
     return SpanContext(
@@ -66,22 +73,24 @@ _dd_span_err_attr_mapping = {
 }
 
 
-def _span_status_and_attributes(
-    dd_span: DDSpan, ignore_attrs: set[str]
-) -> tuple[Status, list[Event], dict[str, Any]]:
-    # Collect all "attributes" from the dd span
-    dd_span_attr: dict[str, Any] = {
-        **dd_span._meta,
-        **dd_span._metrics,
-        "resource": dd_span.resource,
-    }
-
-    otel_attrs = {}
-    events: list[Event] = []
-    otel_error_attrs = {}
-
-    # Map set OTEL attributes based on DD attributes
-    for k, v in dd_span_attr.items():
+def _span_attributes(
+    dd_span: DDSpan,
+    ignore_attrs: set[str],
+    limits: AttributeLimits | None = None,
+    rules: AttributeRules | None = None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Split the dd span tags into OTEL span attributes and exception attributes."""
+
+    otel_attrs: dict[str, Any] = {}
+    otel_error_attrs: dict[str, Any] = {}
+
+    # Map set OTEL attributes based on DD attributes. Metrics are read after meta,
+    # so they win for duplicate keys like when the tags were merged into one dict.
+    for k, v in chain(
+        dd_span._meta.items(),
+        dd_span._metrics.items(),
+        (("resource", dd_span.resource),),
+    ):
         if isinstance(k, bytes):
             continue
         if k.startswith("_dd"):
@@ -90,7 +99,37 @@ def _span_status_and_attributes(
         if otel_err_attr:
             otel_error_attrs[otel_err_attr] = v
         elif k not in ignore_attrs:
-            otel_attrs[k] = v
+            if rules is None:
+                otel_attrs[k] = v
+                continue
+            decision = rules.decide(k)
+            if decision is not None:
+                otel_attrs[decision.key] = (
+                    rules.redacted_value if decision.redact else v
+                )
+
+    if limits is not None:
+        limits.apply(otel_attrs, otel_error_attrs)
+
+    return (otel_attrs, otel_error_attrs)
+
+
+def _exception_status_description(otel_error_attrs: dict[str, Any]) -> str:
+    status_exp_type = otel_error_attrs.get("exception.type", None)
+    status_exp_msg = otel_error_attrs.get("exception.message", None)
+    return f"{status_exp_type}: {status_exp_msg}"
+
+
+def _span_status_and_attributes(
+    dd_span: DDSpan,
+    ignore_attrs: set[str],
+    limits: AttributeLimits | None = None,
+    rules: AttributeRules | None = None,
+) -> tuple[Status, list[Event], dict[str, Any]]:
+    otel_attrs, otel_error_attrs = _span_attributes(
+        dd_span, ignore_attrs, limits, rules
+    )
+    events: list[Event] = []
 
     if otel_error_attrs:
         events.append(
@@ -103,12 +142,9 @@ def _span_status_and_attributes(
             )
         )
 
-        status_exp_type = otel_error_attrs.get("exception.type", None)
-        status_exp_msg = otel_error_attrs.get("exception.message", None)
-
         status = Status(
             status_code=StatusCode.ERROR,
-            description=f"{status_exp_type}: {status_exp_msg}",
+            description=_exception_status_description(otel_error_attrs),
         )
     else:
         status = Status(StatusCode.UNSET)
@@ -116,6 +152,65 @@ def _span_status_and_attributes(
     return (status, events, otel_attrs)
 
 
+class _CachedResource(Resource):
+    """
+    A Resource that computes its hash once. The OTEL exporters group spans by
+    resource, which hashes the resource of every span.
+    """
+
+    def __init__(
+        self, attributes: dict[str, Any], schema_url: str | None = None
+    ) -> None:
+        super().__init__(attributes, schema_url)
+        self._hash = super().__hash__()
+
+    def __hash__(self) -> int:
+        return self._hash
+
+
+class ResourceCache:
+    """
+    The OTEL resources of spans, by service name. The resources share the
+    attributes of the default resource, and are reused so spans of the same
+    service can be grouped in the export requests.
+    """
+
+    def __init__(
+        self, default_resource: Resource, max_size: int = _MAX_CACHED_RESOURCES
+    ) -> None:
+        self.default_resource: Resource = _CachedResource(
+            dict(default_resource.attributes), default_resource.schema_url
+        )
+        self.default_service = default_resource.attributes[SERVICE_NAME]
+        self.max_size = max_size
+        self._resources: dict[str, Resource] = {}
+        # The writer thread and the span metrics reporter share the cache. Lookups
+        # take no lock, only adding resources does.
+        self._lock = threading.Lock()
+
+    def get(self, service: str | None) -> Resource:
+        if not service or service == self.default_service:
+            return self.default_resource
+
+        resource = self._resources.get(service)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            resource = self._resources.get(service)
+            if resource is None:
+                # Services are rarely dynamic, evicting the oldest is good enough.
+                if len(self._resources) >= self.max_size:
+                    self._resources.pop(next(iter(self._resources)), None)
+
+                attributes = dict(self.default_resource.attributes)
+                attributes[SERVICE_NAME] = service
+                resource = _CachedResource(attributes, self.default_resource.schema_url)
+                self._resources[service] = resource
+
+        return resource
+
+
 def _span_resource(dd_span: DDSpan, default_resource: Resource) -> Resource:
     if default_resource.attributes[SERVICE_NAME] == dd_span.service:
         return default_resource
@@ -134,20 +229,32 @@ def default_ignore_attrs() -> set[str]:
 
 
 def translate_span(
-    dd_span: DDSpan, default_resource: Resource, ignore_attrs: set[str]
+    dd_span: DDSpan,
+    default_resource: Resource,
+    ignore_attrs: set[str],
+    *,
+    resources: ResourceCache | None = None,
+    limits: AttributeLimits | None = None,
+    rules: AttributeRules | None = None,
 ) -> ReadableSpan:
     """Transelate a ddtrace span to an OTEL span."""
     assert dd_span.duration_ns is not None, "Span not finished."
 
+    resource = (
+        resources.get(dd_span.service)
+        if resources is not None
+        else _span_resource(dd_span, default_resource)
+    )
+
     status, events, attributes = _span_status_and_attributes(
-        dd_span, ignore_attrs=ignore_attrs
+        dd_span, ignore_attrs=ignore_attrs, limits=limits, rules=rules
     )
 
     otel_span = ReadableSpan(
         name=dd_span.name,
         context=_span_context(dd_span),
         parent=_parent_span_context(dd_span),
-        resource=_span_resource(dd_span, default_resource),
+        resource=resource,
         attributes=BoundedAttributes(
             _DEFAULT_OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT, attributes=attributes
         ),
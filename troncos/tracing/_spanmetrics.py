@@ -0,0 +1,279 @@
+import os
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, NamedTuple, Sequence
+
+from ddtrace.trace import Span
+
+from ._exporter import Exporter
+from ._metrics import _Histogram
+
+if TYPE_CHECKING:
+    from opentelemetry.proto.common.v1.common_pb2 import KeyValue
+
+    from ._span import ResourceCache
+
+# Same buckets as the OTEL collector spanmetrics connector, in seconds.
+_SPAN_DURATION_BUCKETS = (
+    0.002,
+    0.004,
+    0.006,
+    0.008,
+    0.01,
+    0.05,
+    0.1,
+    0.2,
+    0.4,
+    0.8,
+    1.0,
+    1.4,
+    2.0,
+    5.0,
+    10.0,
+    15.0,
+)
+
+_STATUS_CODE_UNSET = "STATUS_CODE_UNSET"
+_STATUS_CODE_ERROR = "STATUS_CODE_ERROR"
+
+
+class SeriesKey(NamedTuple):
+    service: str
+    name: str
+    resource: str
+    kind: str
+    error: bool
+
+
+# New series are counted here once `max_series` is reached.
+_OVERFLOW_KEY = SeriesKey("", "", "", "", False)
+
+
+class _Series:
+    def __init__(self, boundaries: Sequence[float]) -> None:
+        self.calls = 0
+        self.duration = _Histogram(boundaries)
+
+
+class SpanMetrics:
+    """
+    Configuration for aggregating finished spans into request rate, error and
+    duration (RED) metrics, and periodically exporting them as OTLP metrics.
+    """
+
+    def __init__(
+        self,
+        *,
+        exporter: Exporter | None = None,
+        interval: float | None = None,
+        max_series: int | None = None,
+        duration_buckets: Sequence[float] | None = None,
+    ) -> None:
+        if exporter is None:
+            exporter = Exporter(path="/v1/metrics")
+        if interval is None:
+            interval = float(os.environ.get("OTEL_TRACE_SPAN_METRICS_INTERVAL", "60"))
+        if max_series is None:
+            max_series = int(
+                os.environ.get("OTEL_TRACE_SPAN_METRICS_MAX_SERIES", "2000")
+            )
+        if duration_buckets is None:
+            duration_buckets = _SPAN_DURATION_BUCKETS
+
+        assert interval > 0, "'interval' has to be positive"
+        assert max_series > 0, "'max_series' has to be positive"
+        assert list(duration_buckets) == sorted(duration_buckets), (
+            "'duration_buckets' has to be sorted"
+        )
+
+        self.exporter = exporter
+        self.interval = interval
+        self.max_series = max_series
+        self.duration_buckets = tuple(duration_buckets)
+
+
+class SpanMetricsAggregator:
+    """
+    Counts calls and records the duration of finished spans, by service, span name,
+    resource, span kind and error.
+    """
+
+    def __init__(self, span_metrics: SpanMetrics, resources: "ResourceCache") -> None:
+        self.span_metrics = span_metrics
+        self.resources = resources
+        self.reset()
+
+        # Counts are per process, forked processes start from zero.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            aggregator = weak_self()
+            if aggregator is not None:
+                aggregator.reset()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self.start_time_ns = time.time_ns()
+        self._series: dict[SeriesKey, _Series] = {}
+
+    def record(self, spans: list[Span]) -> None:
+        from ._span import _span_kind
+
+        # Build the keys outside the lock, the writer can be called from many
+        # threads.
+        default_service = str(self.resources.default_service)
+        records = [
+            (
+                SeriesKey(
+                    span.service or default_service,
+                    span.name,
+                    span.resource,
+                    _span_kind(span).name,
+                    bool(span.error),
+                ),
+                (span.duration_ns or 0) / 1e9,
+            )
+            for span in spans
+        ]
+
+        boundaries = self.span_metrics.duration_buckets
+        max_series = self.span_metrics.max_series
+        with self._lock:
+            series = self._series
+            for key, duration in records:
+                series_key = key
+                entry = series.get(series_key)
+                if entry is None:
+                    if len(series) >= max_series:
+                        series_key = _OVERFLOW_KEY
+                        entry = series.get(series_key)
+                    if entry is None:
+                        entry = series[series_key] = _Series(boundaries)
+                entry.calls += 1
+                entry.duration.record(duration)
+
+    def snapshot(self) -> dict[SeriesKey, tuple[int, _Histogram]]:
+        with self._lock:
+            snapshot = {}
+            for key, entry in self._series.items():
+                duration = _Histogram(entry.duration.boundaries)
+                duration.bucket_counts = list(entry.duration.bucket_counts)
+                duration.count = entry.duration.count
+                duration.sum = entry.duration.sum
+                snapshot[key] = (entry.calls, duration)
+            return snapshot
+
+    def encode_request(self) -> bytes:
+        """Encode the current metrics as an OTLP `ExportMetricsServiceRequest`."""
+
+        from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+            ExportMetricsServiceRequest,
+        )
+        from opentelemetry.proto.metrics.v1.metrics_pb2 import (
+            AggregationTemporality,
+            Histogram,
+            HistogramDataPoint,
+            Metric,
+            NumberDataPoint,
+            ResourceMetrics,
+            ScopeMetrics,
+            Sum,
+        )
+        from opentelemetry.proto.common.v1.common_pb2 import InstrumentationScope
+        from opentelemetry.proto.resource.v1.resource_pb2 import (
+            Resource as PB2Resource,
+        )
+
+        from ._encoder import encode_resource
+
+        now = time.time_ns()
+        cumulative = AggregationTemporality.AGGREGATION_TEMPORALITY_CUMULATIVE
+
+        # Series are grouped by the resource of their service.
+        by_service: dict[
+            str, tuple[list[NumberDataPoint], list[HistogramDataPoint]]
+        ] = {}
+        for key, (calls, duration) in self.snapshot().items():
+            attributes = _series_attributes(key)
+            calls_points, duration_points = by_service.setdefault(key.service, ([], []))
+            calls_points.append(
+                NumberDataPoint(
+                    attributes=attributes,
+                    start_time_unix_nano=self.start_time_ns,
+                    time_unix_nano=now,
+                    as_int=calls,
+                )
+            )
+            duration_points.append(
+                HistogramDataPoint(
+                    attributes=attributes,
+                    start_time_unix_nano=self.start_time_ns,
+                    time_unix_nano=now,
+                    count=duration.count,
+                    sum=duration.sum,
+                    bucket_counts=duration.bucket_counts,
+                    explicit_bounds=duration.boundaries,
+                )
+            )
+
+        request = ExportMetricsServiceRequest(
+            resource_metrics=[
+                ResourceMetrics(
+                    resource=PB2Resource.FromString(
+                        encode_resource(self.resources.get(service))
+                    ),
+                    scope_metrics=[
+                        ScopeMetrics(
+                            scope=InstrumentationScope(name="troncos"),
+                            metrics=[
+                                Metric(
+                                    name="traces.span.metrics.calls",
+                                    description="Number of finished spans.",
+                                    unit="{call}",
+                                    sum=Sum(
+                                        data_points=calls_points,
+                                        aggregation_temporality=cumulative,
+                                        is_monotonic=True,
+                                    ),
+                                ),
+                                Metric(
+                                    name="traces.span.metrics.duration",
+                                    description="Duration of finished spans.",
+                                    unit="s",
+                                    histogram=Histogram(
+                                        data_points=duration_points,
+                                        aggregation_temporality=cumulative,
+                                    ),
+                                ),
+                            ],
+                        )
+                    ],
+                )
+                for service, (calls_points, duration_points) in by_service.items()
+            ]
+        )
+        result: bytes = request.SerializeToString()
+        return result
+
+
+def _series_attributes(key: SeriesKey) -> list["KeyValue"]:
+    from opentelemetry.proto.common.v1.common_pb2 import AnyValue, KeyValue
+
+    if key == _OVERFLOW_KEY:
+        return [KeyValue(key="otel.metric.overflow", value=AnyValue(bool_value=True))]
+
+    return [
+        KeyValue(key=name, value=AnyValue(string_value=value))
+        for name, value in [
+            ("span.name", key.name),
+            ("span.kind", f"SPAN_KIND_{key.kind}"),
+            ("resource", key.resource),
+            (
+                "status.code",
+                _STATUS_CODE_ERROR if key.error else _STATUS_CODE_UNSET,
+            ),
+        ]
+    ]
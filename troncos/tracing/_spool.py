@@ -0,0 +1,252 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+import weakref
+from typing import IO, Callable
+
+from structlog import get_logger
+
+from ._exporter import Spool
+from ._transport import PayloadExporter, frame_payload
+
+logger = get_logger()
+
+_HEADER = struct.Struct(">I")
+_SUFFIX = ".spool"
+
+
+def _try_lock(file: IO[bytes]) -> bool:
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class SegmentSpool:
+    """
+    Export requests stored in size-capped segment files in a directory. A process
+    holds a lock on a segment while it writes or replays it, so processes can
+    share a spool directory, and segments of processes that died are replayed by
+    the others.
+    """
+
+    def __init__(self, spool: Spool) -> None:
+        self.directory = spool.directory
+        self.max_bytes = spool.max_bytes
+        self.segment_bytes = spool.segment_bytes
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._segment: IO[bytes] | None = None
+        self._segment_path: str | None = None
+        self._segment_size = 0
+        self._sequence = 0
+        self._replayed_offsets: dict[str, int] = {}
+
+    def reset_after_fork(self) -> None:
+        # The segment is still locked and written by the parent process, closing
+        # our copy of the file leaves the lock in place.
+        if self._segment is not None:
+            self._segment.close()
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_path = None
+        self._segment_size = 0
+        self._replayed_offsets = {}
+
+    def segments(self) -> list[str]:
+        """Returns the paths of all segments, oldest first."""
+
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(_SUFFIX)
+        )
+
+    def _open_segment(self) -> None:
+        self._sequence += 1
+        path = os.path.join(
+            self.directory, f"{time.time_ns():020d}-{os.getpid()}-{self._sequence}"
+        )
+        segment = open(path + _SUFFIX, "ab")
+        _try_lock(segment)
+
+        self._segment = segment
+        self._segment_path = path + _SUFFIX
+        self._segment_size = 0
+
+    def _close_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = None
+        self._segment_path = None
+        self._segment_size = 0
+
+    def append(self, payload: bytes) -> None:
+        record = frame_payload(payload)
+        with self._lock:
+            if self._segment is None or self._segment_size >= self.segment_bytes:
+                self._close_segment()
+                self._open_segment()
+            assert self._segment is not None
+
+            self._segment.write(record)
+            self._segment.flush()
+            self._segment_size += len(record)
+
+        self._evict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_segment()
+
+    def _evict(self) -> None:
+        sizes = {}
+        for path in self.segments():
+            try:
+                sizes[path] = os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+
+        total = sum(sizes.values())
+        for path, size in sizes.items():
+            if total <= self.max_bytes:
+                return
+            if path == self._segment_path:
+                continue
+
+            try:
+                with open(path, "rb") as segment:
+                    if not _try_lock(segment):
+                        continue
+                    os.unlink(path)
+            except FileNotFoundError:
+                continue
+
+            total -= size
+            self._replayed_offsets.pop(path, None)
+            logger.warning("Span spool is full, dropped oldest segment", path=path)
+
+    def replay(self, export: Callable[[bytes], bool]) -> bool:
+        """
+        Export the spooled requests, oldest first, deleting segments once all their
+        requests are exported. Returns False if an export failed.
+        """
+
+        # Close the segment we are writing, so it can be replayed as well.
+        self.close()
+
+        for path in self.segments():
+            try:
+                segment = open(path, "rb")
+            except FileNotFoundError:
+                continue
+
+            with segment:
+                # Locked by a process writing or replaying it, or already deleted.
+                if not _try_lock(segment) or os.fstat(segment.fileno()).st_nlink == 0:
+                    continue
+
+                data = segment.read()
+                offset = self._replayed_offsets.get(path, 0)
+                while offset + _HEADER.size <= len(data):
+                    (size,) = _HEADER.unpack_from(data, offset)
+                    end = offset + _HEADER.size + size
+                    # A record cut short by a process that crashed while writing.
+                    if end > len(data):
+                        break
+
+                    if not export(data[offset + _HEADER.size : end]):
+                        self._replayed_offsets[path] = offset
+                        return False
+                    offset = end
+
+                os.unlink(path)
+                self._replayed_offsets.pop(path, None)
+
+        return True
+
+
+class SpoolingPayloadExporter(PayloadExporter):
+    """
+    Exports requests with the wrapped exporter, and spools them to disk while that
+    fails. The spooled requests are replayed from a background thread once the
+    collector is reachable again.
+    """
+
+    def __init__(self, payload_exporter: PayloadExporter, spool: Spool) -> None:
+        self.payload_exporter = payload_exporter
+        self.retry_interval = spool.retry_interval
+        self.segments = SegmentSpool(spool)
+
+        self._healthy = True
+        self._start_worker()
+
+        # Forked processes need their own worker thread, see gunicorn and celery.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            exporter = weak_self()
+            if exporter is not None and not exporter._stop.is_set():
+                exporter.segments.reset_after_fork()
+                exporter._start_worker()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def _start_worker(self) -> None:
+        self._stop = threading.Event()
+        self._worker = threading.Thread(
+            name="troncos.SpoolingPayloadExporter", target=self._run, daemon=True
+        )
+        self._worker.start()
+
+    def _export(self, payload: bytes) -> bool:
+        try:
+            return self.payload_exporter.export(payload)
+        except Exception:
+            # Failed payloads are spooled, instead of getting lost.
+            logger.exception("Exception while exporting OTLP payload")
+            return False
+
+    def export(self, payload: bytes) -> bool:
+        # While the collector is unreachable, spool right away instead of waiting
+        # for every request to time out.
+        if self._healthy:
+            if self._export(payload):
+                return True
+
+            self._healthy = False
+            logger.warning(
+                "Spooling OTLP payloads to disk", directory=self.segments.directory
+            )
+
+        try:
+            self.segments.append(payload)
+        except OSError:
+            logger.exception("Failed to spool OTLP payload")
+            return False
+
+        return True
+
+    def _run(self) -> None:
+        # This also replays segments left behind by earlier processes.
+        while not self._stop.wait(self.retry_interval):
+            try:
+                if self.segments.replay(self._export):
+                    self._healthy = True
+            except Exception:
+                logger.exception("Exception while replaying spooled OTLP payloads")
+
+    def shutdown(self) -> None:
+        if self._stop.is_set():
+            return
+
+        # Whatever is spooled is replayed by the next process.
+        self._stop.set()
+        self._worker.join()
+        self.segments.close()
+        self.payload_exporter.shutdown()
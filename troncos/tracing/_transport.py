@@ -0,0 +1,366 @@
+import gzip
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any
+from urllib.parse import urlparse
+
+import requests
+from structlog import get_logger
+
+from ._exporter import Balancing, Compression
+
+logger = get_logger()
+
+MAX_RETRIES = 6
+_RETRYABLE_HTTP_STATUS = {429, 502, 503, 504}
+_MAX_ENDPOINT_BACKOFF = 60.0
+GRPC_TRACE_EXPORT_METHOD = "/opentelemetry.proto.collector.trace.v1.TraceService/Export"
+GRPC_METRICS_EXPORT_METHOD = (
+    "/opentelemetry.proto.collector.metrics.v1.MetricsService/Export"
+)
+
+
+class PayloadExporter(ABC):
+    """
+    Sends encoded OTLP export requests, like `ExportTraceServiceRequest`, to a
+    collector.
+    """
+
+    @abstractmethod
+    def export(self, payload: bytes) -> bool:
+        """Export the request, returns False if it could not be exported."""
+
+    def shutdown(self) -> None:  # noqa: B027
+        """Close the connections of the exporter, if it has any."""
+
+
+def _backoff_seconds(retry_num: int) -> float:
+    # Same backoff as the OTEL exporters, exponential with +/-20% jitter.
+    return float(2**retry_num * random.uniform(0.8, 1.2))
+
+
+class HTTPPayloadExporter(PayloadExporter):
+    def __init__(
+        self,
+        *,
+        endpoint: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = 10.0,
+        compression: Compression = Compression.NONE,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.compression = compression
+        self.max_retries = max_retries
+        self._shutdown = threading.Event()
+        self._session = requests.Session()
+        self._session.headers.update(headers or {})
+        self._session.headers["Content-Type"] = "application/x-protobuf"
+        if compression != Compression.NONE:
+            self._session.headers["Content-Encoding"] = compression.value
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == Compression.GZIP:
+            return gzip.compress(payload, compresslevel=6)
+        if self.compression == Compression.DEFLATE:
+            return zlib.compress(payload)
+        return payload
+
+    def _post(self, payload: bytes, timeout: float) -> requests.Response | None:
+        try:
+            return self._session.post(self.endpoint, data=payload, timeout=timeout)
+        except requests.exceptions.RequestException:
+            # Connection errors and timeouts, like those of a saturated collector,
+            # are retried.
+            return None
+
+    def export(self, payload: bytes) -> bool:
+        if self._shutdown.is_set():
+            return False
+
+        payload = self._compress(payload)
+        deadline = time.monotonic() + self.timeout
+        for retry_num in range(self.max_retries):
+            resp = self._post(payload, max(deadline - time.monotonic(), 0.001))
+            if resp is not None and resp.ok:
+                return True
+            if resp is not None and resp.status_code not in _RETRYABLE_HTTP_STATUS:
+                logger.error(
+                    "Failed to export OTLP payload",
+                    status_code=resp.status_code,
+                    endpoint=self.endpoint,
+                )
+                return False
+
+            backoff = _backoff_seconds(retry_num)
+            if retry_num + 1 >= self.max_retries:
+                break
+            if backoff > deadline - time.monotonic():
+                break
+            if self._shutdown.wait(backoff):
+                break
+
+        logger.error("Failed to export OTLP payload", endpoint=self.endpoint)
+        return False
+
+    def shutdown(self) -> None:
+        self._shutdown.set()
+        self._session.close()
+
+
+def import_grpc() -> Any:
+    """
+    Import grpc, it is only loaded when a GRPC exporter is used since the import is
+    slow.
+    """
+
+    try:
+        import grpc
+    except ImportError:
+        raise RuntimeError(
+            "opentelemetry-exporter-otlp-proto-grpc needs to be installed "
+            "to use the GRPC exporter."
+        ) from None
+    return grpc
+
+
+def grpc_compression(compression: Compression) -> Any:
+    """Returns the `grpc.Compression` matching `compression`."""
+
+    grpc = import_grpc()
+    return {
+        Compression.NONE: grpc.Compression.NoCompression,
+        Compression.GZIP: grpc.Compression.Gzip,
+        Compression.DEFLATE: grpc.Compression.Deflate,
+    }[compression]
+
+
+class GRPCPayloadExporter(PayloadExporter):
+    def __init__(
+        self,
+        *,
+        endpoint: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = 10.0,
+        method: str = GRPC_TRACE_EXPORT_METHOD,
+        compression: Compression = Compression.NONE,
+        options: list[tuple[str, Any]] | None = None,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        grpc = import_grpc()
+        self._grpc = grpc
+
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._shutdown = threading.Event()
+        self._metadata = tuple((headers or {}).items())
+
+        channel_compression = grpc_compression(compression)
+
+        parsed = urlparse(endpoint)
+        target = parsed.netloc or endpoint
+        if parsed.scheme == "https":
+            self._channel = grpc.secure_channel(
+                target,
+                grpc.ssl_channel_credentials(),
+                options=options,
+                compression=channel_compression,
+            )
+        else:
+            self._channel = grpc.insecure_channel(
+                target, options=options, compression=channel_compression
+            )
+
+        # Without serializers grpc sends the request bytes as is.
+        self._export_rpc = self._channel.unary_unary(method)
+
+    def export(self, payload: bytes) -> bool:
+        if self._shutdown.is_set():
+            return False
+
+        grpc = self._grpc
+        retryable = {
+            grpc.StatusCode.CANCELLED,
+            grpc.StatusCode.DEADLINE_EXCEEDED,
+            grpc.StatusCode.RESOURCE_EXHAUSTED,
+            grpc.StatusCode.ABORTED,
+            grpc.StatusCode.OUT_OF_RANGE,
+            grpc.StatusCode.UNAVAILABLE,
+            grpc.StatusCode.DATA_LOSS,
+        }
+
+        deadline = time.monotonic() + self.timeout
+        for retry_num in range(self.max_retries):
+            try:
+                self._export_rpc(
+                    payload,
+                    metadata=self._metadata,
+                    timeout=max(deadline - time.monotonic(), 0.001),
+                )
+                return True
+            except grpc.RpcError as e:
+                code = e.code()
+                if code not in retryable:
+                    logger.error(
+                        "Failed to export OTLP payload",
+                        status_code=code,
+                        endpoint=self.endpoint,
+                    )
+                    return False
+
+            backoff = _backoff_seconds(retry_num)
+            if retry_num + 1 >= self.max_retries:
+                break
+            if backoff > deadline - time.monotonic():
+                break
+            if self._shutdown.wait(backoff):
+                break
+
+        logger.error("Failed to export OTLP payload", endpoint=self.endpoint)
+        return False
+
+    def shutdown(self) -> None:
+        self._shutdown.set()
+        self._channel.close()
+
+
+class _EndpointState:
+    __slots__ = ("exporter", "failures", "outstanding", "retry_at")
+
+    def __init__(self, exporter: PayloadExporter) -> None:
+        self.exporter = exporter
+        self.outstanding = 0
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class MultiPayloadExporter(PayloadExporter):
+    """
+    Spreads export requests over several collectors. Collectors where a request
+    failed are skipped for an exponentially growing backoff, and the request is
+    sent to the next collector instead.
+    """
+
+    def __init__(self, exporters: list[PayloadExporter], balancing: Balancing) -> None:
+        assert exporters, "You have to specify at least one exporter"
+
+        self.balancing = balancing
+        self._endpoints = [_EndpointState(exporter) for exporter in exporters]
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def _ordered(self) -> list[_EndpointState]:
+        """The endpoints in the order to try them, healthy endpoints first."""
+
+        now = time.monotonic()
+        with self._lock:
+            if self.balancing == Balancing.FAILOVER:
+                ordered = list(self._endpoints)
+            else:
+                start = self._next
+                self._next = (self._next + 1) % len(self._endpoints)
+                ordered = self._endpoints[start:] + self._endpoints[:start]
+                if self.balancing == Balancing.LEAST_OUTSTANDING:
+                    # sort is stable, so ties are still taken in round robin order.
+                    ordered.sort(key=lambda endpoint: endpoint.outstanding)
+
+            ordered.sort(key=lambda endpoint: endpoint.retry_at > now)
+        return ordered
+
+    def _export(self, endpoint: _EndpointState, payload: bytes) -> bool:
+        with self._lock:
+            endpoint.outstanding += 1
+
+        success = False
+        try:
+            success = endpoint.exporter.export(payload)
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+                if success:
+                    endpoint.failures = 0
+                    endpoint.retry_at = 0.0
+                else:
+                    endpoint.failures += 1
+                    backoff = _backoff_seconds(min(endpoint.failures - 1, 8))
+                    endpoint.retry_at = time.monotonic() + min(
+                        backoff, _MAX_ENDPOINT_BACKOFF
+                    )
+        return success
+
+    def export(self, payload: bytes) -> bool:
+        return any(self._export(endpoint, payload) for endpoint in self._ordered())
+
+    def shutdown(self) -> None:
+        for endpoint in self._endpoints:
+            endpoint.exporter.shutdown()
+
+
+def frame_payload(payload: bytes) -> bytes:
+    """Prefix a payload with its length, as sent over the shared exporter socket."""
+
+    return struct.pack(">I", len(payload)) + payload
+
+
+class UnixSocketPayloadExporter(PayloadExporter):
+    """
+    Hands encoded OTLP export requests to the shared exporter process listening on
+    `socket_path`.
+    """
+
+    def __init__(self, *, socket_path: str, timeout: float = 1.0) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._shutdown = threading.Event()
+        self._socket: socket.socket | None = None
+        self._pid = os.getpid()
+
+    def _close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _connected_socket(self) -> socket.socket:
+        # Forked processes must not share the connection of their parent.
+        if self._pid != os.getpid():
+            self._socket = None
+            self._pid = os.getpid()
+
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+
+        return self._socket
+
+    def export(self, payload: bytes) -> bool:
+        if self._shutdown.is_set():
+            return False
+
+        # Reconnect once, the exporter process might have been restarted.
+        for _ in range(2):
+            try:
+                self._connected_socket().sendall(frame_payload(payload))
+                return True
+            except OSError:
+                self._close()
+
+        logger.error("Failed to export OTLP payload", endpoint=self.socket_path)
+        return False
+
+    def shutdown(self) -> None:
+        self._shutdown.set()
+        self._close()
@@ -0,0 +1,166 @@
+import collections
+import os
+import threading
+import weakref
+from enum import Enum
+from typing import Callable
+
+from ddtrace.trace import Span
+from structlog import get_logger
+
+from ._metrics import tracing_metrics
+
+logger = get_logger()
+
+
+class DropPolicy(Enum):
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+
+
+class BackgroundWorker:
+    """
+    Configuration for processing finished traces on a background thread instead of
+    the thread that finished the trace.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue_size: int | None = None,
+        drop_policy: DropPolicy | None = None,
+        block_timeout: float | None = None,
+    ) -> None:
+        if max_queue_size is None:
+            max_queue_size = int(os.environ.get("OTEL_TRACE_QUEUE_SIZE", "10000"))
+        if drop_policy is None:
+            drop_policy = DropPolicy(
+                os.environ.get("OTEL_TRACE_QUEUE_DROP_POLICY", "drop_newest")
+            )
+        if block_timeout is None:
+            block_timeout = float(
+                os.environ.get("OTEL_TRACE_QUEUE_BLOCK_TIMEOUT", "0.05")
+            )
+
+        assert max_queue_size > 0, "'max_queue_size' has to be positive"
+        assert block_timeout >= 0, "'block_timeout' can not be negative"
+
+        self.max_queue_size = max_queue_size
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+
+
+class SpanQueue:
+    """
+    A bounded queue of finished trace chunks, processed by a background thread.
+    The size of the queue is counted in spans.
+    """
+
+    def __init__(
+        self, process: Callable[[list[Span]], None], config: BackgroundWorker
+    ) -> None:
+        self.process = process
+        self.max_size = config.max_queue_size
+        self.drop_policy = config.drop_policy
+        self.block_timeout = config.block_timeout
+
+        self.dropped_spans = 0
+
+        self._chunks: collections.deque[list[Span]] = collections.deque()
+        self._size = 0
+        self._stopped = False
+        self._start_worker()
+
+        # Forked processes need their own worker thread, see gunicorn and celery.
+        weak_self = weakref.ref(self)
+
+        def _after_fork() -> None:
+            queue = weak_self()
+            if queue is not None and not queue._stopped:
+                queue._start_worker()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+    def _start_worker(self) -> None:
+        self._chunks.clear()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._process_lock = threading.Lock()
+        self._worker = threading.Thread(
+            name="troncos.SpanQueue", target=self._run, daemon=True
+        )
+        self._worker.start()
+
+    def _has_room(self, count: int) -> bool:
+        return self._size + count <= self.max_size
+
+    def put(self, spans: list[Span]) -> None:
+        count = len(spans)
+
+        with self._lock:
+            if self._stopped:
+                return
+
+            if not self._has_room(count) and count <= self.max_size:
+                if self.drop_policy == DropPolicy.BLOCK:
+                    self._not_full.wait_for(
+                        lambda: self._has_room(count) or self._stopped,
+                        timeout=self.block_timeout,
+                    )
+                elif self.drop_policy == DropPolicy.DROP_OLDEST:
+                    while not self._has_room(count):
+                        dropped = self._chunks.popleft()
+                        self._size -= len(dropped)
+                        self.dropped_spans += len(dropped)
+                        tracing_metrics.add("spans_dropped", len(dropped))
+
+            if not self._has_room(count):
+                self.dropped_spans += count
+                tracing_metrics.add("spans_dropped", count)
+                return
+
+            self._chunks.append(spans)
+            self._size += count
+            self._not_empty.notify()
+
+    def _pop(self) -> list[Span] | None:
+        with self._lock:
+            if not self._chunks:
+                return None
+
+            chunk = self._chunks.popleft()
+            self._size -= len(chunk)
+            self._not_full.notify_all()
+            return chunk
+
+    def _process_all(self) -> None:
+        with self._process_lock:
+            while (chunk := self._pop()) is not None:
+                try:
+                    self.process(chunk)
+                except Exception:
+                    logger.exception("Exception while processing spans")
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._chunks or self._stopped)
+                if self._stopped and not self._chunks:
+                    return
+            self._process_all()
+
+    def flush(self) -> None:
+        self._process_all()
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+        self._worker.join(timeout)
@@ -1,12 +1,25 @@
-from typing import Any, Optional
+import time
+from typing import TYPE_CHECKING, Any, Optional
 
 from ddtrace.trace import Span
 from ddtrace.internal.writer.writer import TraceWriter
-from opentelemetry.sdk.resources import Resource
 
-from ._exporter import Exporter
-from ._otel import get_otel_span_processors
-from ._span import default_ignore_attrs, translate_span
+from ._coalescing import SpanCoalescer
+from ._exporter import Exporter, SharedExporter
+from ._guard import TraceGuard
+from ._limits import AttributeLimits
+from ._rules import AttributeRules
+from ._metrics import MetricsReporter, SelfMetrics, tracing_metrics
+from ._profile import FunctionProfile, SummarySpanReporter
+from ._sampling import TailSampler
+from ._spanmetrics import SpanMetrics, SpanMetricsAggregator
+from ._worker import BackgroundWorker, SpanQueue
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import SpanProcessor
+
+    from ._encoder import SpanEncoder
+    from ._processor import EncodedBatchProcessor
 
 
 class OTELWriter(TraceWriter):
@@ -16,26 +29,135 @@ class OTELWriter(TraceWriter):
         service_name: str,
         exporter: Exporter,
         resource_attributes: dict[str, Any] | None,
+        *,
+        fast_encoding: bool = False,
+        background_worker: BackgroundWorker | None = None,
+        tail_sampler: TailSampler | None = None,
+        self_metrics: SelfMetrics | None = None,
+        shared_exporter: SharedExporter | None = None,
+        attribute_limits: AttributeLimits | None = None,
+        attribute_rules: AttributeRules | None = None,
+        span_metrics: SpanMetrics | None = None,
+        span_coalescer: SpanCoalescer | None = None,
+        trace_guard: TraceGuard | None = None,
+        function_profile: FunctionProfile | None = None,
     ) -> None:
         self.enabled = enabled
         self.service_name = service_name
         self.resource_attributes = resource_attributes
         self.exporter = exporter
+        self.fast_encoding = fast_encoding
+        self.background_worker = background_worker
+        self.tail_sampler = tail_sampler
+        self.self_metrics = self_metrics
+        self.shared_exporter = shared_exporter
+        self.attribute_limits = attribute_limits
+        self.attribute_rules = attribute_rules
+        self.span_metrics = span_metrics
+        self.span_coalescer = span_coalescer
+        self.trace_guard = trace_guard
+        self.function_profile = function_profile
+        self._stopped = False
+
+        self.span_encoder: "SpanEncoder | None" = None
+        self.encoded_span_processor: "EncodedBatchProcessor | None" = None
+        self.otel_span_processors: list["SpanProcessor"] = []
+        self.span_queue: SpanQueue | None = None
+        self.metrics_reporter: MetricsReporter | None = None
+        self.span_metrics_aggregator: SpanMetricsAggregator | None = None
+        self.span_metrics_reporter: MetricsReporter | None = None
+        self.function_profile_reporter: MetricsReporter | SummarySpanReporter | None = (
+            None
+        )
+
+        # A disabled writer drops all spans, so the OTEL SDK and the exporters are
+        # only imported once an enabled writer is created.
+        if not enabled:
+            return
+
+        from opentelemetry.sdk.resources import Resource
+
+        from ._encoder import SpanEncoder
+        from ._otel import (
+            get_encoded_span_processor,
+            get_function_profile_reporter,
+            get_metrics_reporter,
+            get_otel_debug_span_processors,
+            get_otel_span_processors,
+            get_span_metrics_reporter,
+        )
+        from ._span import ResourceCache, default_ignore_attrs
 
-        self.otel_span_processors = get_otel_span_processors(exporter=exporter)
         self.otel_default_resource = Resource.create(
             {"service.name": service_name, **(resource_attributes or {})}
         )
         self.otel_ignore_attrs = (
             set(self.otel_default_resource.attributes.keys()) | default_ignore_attrs()
         )
+        self.otel_resources = ResourceCache(self.otel_default_resource)
+
+        # The fast path encodes spans straight to OTLP protobuf, skipping the
+        # OTEL SDK spans. Only the debug processors still need SDK spans. The
+        # shared exporter receives encoded spans, so it implies the fast path.
+        if fast_encoding or shared_exporter is not None:
+            self.span_encoder = SpanEncoder(
+                self.otel_default_resource,
+                self.otel_ignore_attrs,
+                resources=self.otel_resources,
+                limits=attribute_limits,
+                rules=attribute_rules,
+            )
+            self.encoded_span_processor = get_encoded_span_processor(
+                exporter=exporter, shared_exporter=shared_exporter
+            )
+            self.otel_span_processors = get_otel_debug_span_processors()
+        else:
+            self.otel_span_processors = get_otel_span_processors(exporter=exporter)
+
+        # With a background worker, write only queues the spans and the worker
+        # thread does the processing.
+        if background_worker is not None:
+            self.span_queue = SpanQueue(self._process_spans, background_worker)
+
+        if self_metrics is not None:
+            self.metrics_reporter = get_metrics_reporter(
+                self_metrics=self_metrics, resource=self.otel_default_resource
+            )
+
+        # RED metrics are aggregated from all finished spans, before any sampling.
+        if span_metrics is not None:
+            self.span_metrics_aggregator = SpanMetricsAggregator(
+                span_metrics, self.otel_resources
+            )
+            self.span_metrics_reporter = get_span_metrics_reporter(
+                span_metrics=span_metrics, aggregator=self.span_metrics_aggregator
+            )
+
+        if function_profile is not None:
+            self.function_profile_reporter = get_function_profile_reporter(
+                function_profile=function_profile, resource=self.otel_default_resource
+            )
 
     def recreate(self, appsec_enabled: Optional[bool] = None) -> "OTELWriter":
+        # ddtrace drops this writer for the new one, its workers and reporters would
+        # keep running next to those of the new writer.
+        self.stop()
         return self.__class__(
             self.enabled,
             self.service_name,
             self.exporter,
             self.resource_attributes,
+            fast_encoding=self.fast_encoding,
+            background_worker=self.background_worker,
+            tail_sampler=self.tail_sampler,
+            self_metrics=self.self_metrics,
+            shared_exporter=self.shared_exporter,
+            attribute_limits=self.attribute_limits,
+            attribute_rules=self.attribute_rules,
+            span_metrics=self.span_metrics,
+            span_coalescer=self.span_coalescer,
+            trace_guard=self.trace_guard,
+            function_profile=self.function_profile,
         )
 
     def write(self, spans: list[Span] | None = None) -> None:
@@ -45,6 +167,27 @@ class OTELWriter(TraceWriter):
         if not spans:
             return
 
+        tracing_metrics.add("spans_received", len(spans))
+
+        # Runaway traces are cut before they are queued, so they can't fill up the
+        # memory of the background worker or the exporters.
+        if self.trace_guard is not None:
+            limited_spans = self.trace_guard.limit(spans)
+            if len(limited_spans) < len(spans):
+                tracing_metrics.add(
+                    "spans_trace_guard_dropped", len(spans) - len(limited_spans)
+                )
+            spans = limited_spans
+
+        if self.span_queue is not None:
+            self.span_queue.put(spans)
+        else:
+            self._process_spans(spans)
+
+    def _process_spans(self, spans: list[Span]) -> None:
+        if self.span_metrics_aggregator is not None:
+            self.span_metrics_aggregator.record(spans)
+
         filtered_spans = [
             span
             for span in spans
@@ -57,25 +200,87 @@ class OTELWriter(TraceWriter):
             )
         ]
 
+        if len(filtered_spans) < len(spans):
+            tracing_metrics.add(
+                "spans_sampling_priority_filtered", len(spans) - len(filtered_spans)
+            )
+
         if not filtered_spans:
             return
 
+        if self.tail_sampler is not None and not self.tail_sampler.sample(
+            filtered_spans
+        ):
+            tracing_metrics.add("spans_tail_sampled", len(filtered_spans))
+            return
+
+        if self.span_coalescer is not None:
+            coalesced_spans = self.span_coalescer.coalesce(filtered_spans)
+            if len(coalesced_spans) < len(filtered_spans):
+                tracing_metrics.add(
+                    "spans_coalesced", len(filtered_spans) - len(coalesced_spans)
+                )
+            filtered_spans = coalesced_spans
+
+        if self.span_encoder is not None and self.encoded_span_processor is not None:
+            start = time.perf_counter()
+            encoded_spans = [
+                self.span_encoder.encode_span(span) for span in filtered_spans
+            ]
+            tracing_metrics.record(
+                "translate_duration_seconds", time.perf_counter() - start
+            )
+            tracing_metrics.add("spans_translated", len(encoded_spans))
+
+            self.encoded_span_processor.on_end(encoded_spans)
+            tracing_metrics.add("spans_queued", len(encoded_spans))
+            if not self.otel_span_processors:
+                return
+
+        from ._span import translate_span
+
+        start = time.perf_counter()
         transelated_spans = [
             translate_span(
                 span,
                 default_resource=self.otel_default_resource,
                 ignore_attrs=self.otel_ignore_attrs,
+                resources=self.otel_resources,
+                limits=self.attribute_limits,
+                rules=self.attribute_rules,
             )
             for span in filtered_spans
         ]
+        if self.span_encoder is None:
+            tracing_metrics.record(
+                "translate_duration_seconds", time.perf_counter() - start
+            )
+            tracing_metrics.add("spans_translated", len(transelated_spans))
+            tracing_metrics.add("spans_queued", len(transelated_spans))
 
         for span_processor in self.otel_span_processors:
             for span in transelated_spans:
                 span_processor.on_end(span)
 
     def stop(self, timeout: float | None = None) -> None:
-        if not self.enabled:
+        if not self.enabled or self._stopped:
             return
+        self._stopped = True
+
+        if self.span_queue is not None:
+            self.span_queue.stop(timeout)
+
+        if self.metrics_reporter is not None:
+            self.metrics_reporter.shutdown()
+
+        if self.span_metrics_reporter is not None:
+            self.span_metrics_reporter.shutdown()
+
+        if self.function_profile_reporter is not None:
+            self.function_profile_reporter.shutdown()
+
+        if self.encoded_span_processor is not None:
+            self.encoded_span_processor.shutdown()
 
         for span_processor in self.otel_span_processors:
             span_processor.shutdown()
@@ -84,5 +289,11 @@ class OTELWriter(TraceWriter):
         if not self.enabled:
             return
 
+        if self.span_queue is not None:
+            self.span_queue.flush()
+
+        if self.encoded_span_processor is not None:
+            self.encoded_span_processor.force_flush()
+
         for span_processor in self.otel_span_processors:
             span_processor.force_flush()
@@ -1,24 +1,541 @@
 import asyncio
 import inspect
+import itertools
 import logging
-from collections.abc import Generator
-from contextlib import contextmanager
+import random
+import sys
+import time
+from collections.abc import AsyncGenerator, Generator
+from contextlib import AbstractContextManager, ContextDecorator, contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from types import FunctionType
-from typing import Awaitable, Callable, ParamSpec, Type, TypeVar, cast, overload
+from types import FunctionType, TracebackType
+from typing import Any, Awaitable, Callable, ParamSpec, Type, TypeVar, cast, overload
 
-from ddtrace.trace import tracer, Span
+from ddtrace.trace import Context, Span, tracer
+
+from . import _guard, _profile
 
 
 _TRACE_IGNORE_ATTR = "_trace_ignore"
+# Set on the wrappers of traced functions, so they are not traced twice.
+_TRACED_ATTR = "_troncos_traced"
 
 TClass = TypeVar("TClass")
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
+# Set by `configure_tracer`, see `set_decorators_enabled`.
+_decorators_enabled = True
+_skip_unsampled = False
+
+
+def set_decorators_enabled(enabled: bool, *, skip_unsampled: bool = False) -> None:
+    """
+    Turn the spans of `trace_function`, `trace_class` and `trace_module` on or off at
+    runtime. When off, the decorated functions are called directly. With
+    `skip_unsampled`, no spans are created in traces that are known to be dropped.
+    """
+
+    global _decorators_enabled, _skip_unsampled  # noqa: PLW0603
+    _decorators_enabled = enabled
+    _skip_unsampled = skip_unsampled
+
+
+class _Sampler:
+    """
+    Decides which calls of a decorated function or block are traced, with
+    probability `sample_rate` and/or every `sample_every` calls.
+    """
+
+    __slots__ = ("_calls", "sample_every", "sample_rate")
+
+    def __init__(self, sample_rate: float | None, sample_every: int | None) -> None:
+        assert sample_rate is None or 0 <= sample_rate <= 1, (
+            "'sample_rate' has to be between 0 and 1"
+        )
+        assert sample_every is None or sample_every > 0, (
+            "'sample_every' has to be positive"
+        )
+
+        self.sample_rate = sample_rate
+        self.sample_every = sample_every
+        self._calls = itertools.count()
+
+    def sample(self) -> bool:
+        if self.sample_every is not None and next(self._calls) % self.sample_every:
+            return False
+        if self.sample_rate is not None and random.random() >= self.sample_rate:
+            return False
+        return True
+
+
+def _sampler(sample_rate: float | None, sample_every: int | None) -> _Sampler | None:
+    if sample_rate is None and sample_every is None:
+        return None
+    return _Sampler(sample_rate, sample_every)
+
+
+# The samplers of `trace_block`, by block name, so 1-in-N is counted per block.
+_MAX_BLOCK_SAMPLERS = 4096
+_block_samplers: dict[tuple[str, float | None, int | None], _Sampler] = {}
+
+
+def _block_sampler(
+    name: str, sample_rate: float | None, sample_every: int | None
+) -> _Sampler | None:
+    if sample_rate is None and sample_every is None:
+        return None
+    key = (name, sample_rate, sample_every)
+    if (sampler := _block_samplers.get(key)) is None:
+        if len(_block_samplers) >= _MAX_BLOCK_SAMPLERS:
+            _block_samplers.clear()
+        sampler = _block_samplers[key] = _Sampler(sample_rate, sample_every)
+    return sampler
+
+
+def _min_duration_ns(min_duration: float | None) -> int | None:
+    assert min_duration is None or min_duration >= 0, (
+        "'min_duration' can not be negative"
+    )
+    return None if min_duration is None else int(min_duration * 1e9)
+
+
+def _unsampled() -> bool:
+    """Returns True if spans are skipped in the current trace, as it is dropped."""
+
+    if not _skip_unsampled:
+        return False
+    current_span = tracer.current_span()
+    if current_span is None:
+        return False
+    sampling_priority = current_span.context.sampling_priority
+    return sampling_priority is not None and sampling_priority <= 0
+
+
+def _start_span(
+    name: str,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    tags: dict[str, str] | None,
+    activate: bool = True,
+) -> Span | None:
+    """Start a span, or return None if the span would not be recorded."""
+
+    if _unsampled():
+        return None
+
+    # Once a runaway trace is over its budget, no more spans are created.
+    guard = _guard.decorator_guard
+    if guard is not None and not guard.allow_span(tracer):
+        return None
+
+    if activate:
+        span = tracer.trace(
+            name, resource=resource, service=service, span_type=span_type
+        )
+    else:
+        span = tracer.start_span(
+            name,
+            child_of=tracer.context_provider.active(),
+            service=service,
+            resource=resource,
+            span_type=span_type,
+            activate=False,
+        )
+    if tags:
+        span.set_tags(tags)
+    return span
+
+
+def _record_slow_span(
+    name: str,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    tags: dict[str, str] | None,
+    parent: Span | Context | None,
+    start_ns: int,
+    source: Span | None = None,
+    exc_info: tuple[Any, Any, Any] | None = None,
+    finish_ns: int | None = None,
+) -> Span | None:
+    """
+    Record the span of a call with a `min_duration`, once it is known to be slow
+    or to have failed. The span is created after the call, so spans started
+    during the call are children of `parent`.
+    """
+
+    guard = _guard.decorator_guard
+    if guard is not None and not guard.allow_span(tracer):
+        return None
+
+    span = tracer.start_span(
+        name,
+        child_of=parent,
+        service=service,
+        resource=resource,
+        span_type=span_type,
+        activate=False,
+    )
+    span.start_ns = start_ns
+    if tags:
+        span.set_tags(tags)
+    if source is not None:
+        span._meta.update(source._meta)
+        span._metrics.update(source._metrics)
+        span.error = source.error
+    if exc_info is not None:
+        span.set_exc_info(*exc_info)
+    if finish_ns is None:
+        span.finish()
+    else:
+        span._finish_ns(finish_ns)
+    return span
+
+
+class _GeneratorTrace:
+    """
+    Records one iteration of a decorated generator on its span: the number of
+    items, the time to the first item and the time spent in the generator itself.
+    The span is only active while the generator runs, not while the caller handles
+    the items, so only the spans of the generator are its children.
+    """
+
+    __slots__ = (
+        "_min_duration_ns",
+        "_parent",
+        "_previous",
+        "_resumed_ns",
+        "closed",
+        "exc_info",
+        "items",
+        "iteration_ns",
+        "span",
+    )
+
+    def __init__(
+        self,
+        span: Span,
+        parent: Span | Context | None = None,
+        min_duration_ns: int | None = None,
+    ) -> None:
+        # With a `min_duration` the span is detached, and only recorded once the
+        # iteration turns out to be slow.
+        self.span = span
+        self._parent = parent
+        self._min_duration_ns = min_duration_ns
+        self._previous: Span | Context | None = None
+        self._resumed_ns = 0
+        self.items = 0
+        self.iteration_ns = 0
+        self.closed = False
+        self.exc_info: tuple[Any, Any, Any] | None = None
+
+    def resume(self) -> None:
+        """Called before the generator runs until its next item."""
+
+        if self._min_duration_ns is None:
+            self._previous = tracer.context_provider.active()
+            tracer.context_provider.activate(self.span)
+        self._resumed_ns = time.perf_counter_ns()
+
+    def suspend(self) -> None:
+        """Called once the generator has produced an item, returned or failed."""
+
+        self.iteration_ns += time.perf_counter_ns() - self._resumed_ns
+        if self._min_duration_ns is None:
+            tracer.context_provider.activate(self._previous)
+            self._previous = None
+
+    def close(self) -> None:
+        """Called when the generator is closed before it is exhausted."""
+
+        self.closed = True
+
+    def fail(self, exc_info: tuple[Any, Any, Any]) -> None:
+        self.exc_info = exc_info
+
+    def item(self) -> None:
+        if not self.items:
+            self.span.set_metric(
+                "generator.time_to_first_item",
+                (time.time_ns() - self.span.start_ns) / 1e9,
+            )
+        self.items += 1
+
+    def finish(self) -> None:
+        span = self.span
+        span.set_metric("generator.items", self.items)
+        span.set_metric("generator.iteration_time", self.iteration_ns / 1e9)
+        if self.closed:
+            span.set_tag("generator.closed", "true")
+
+        if self._min_duration_ns is None:
+            if self.exc_info is not None:
+                span.set_exc_info(*self.exc_info)
+            span.finish()
+        elif (
+            self.exc_info is not None
+            or time.time_ns() - span.start_ns >= self._min_duration_ns
+        ):
+            _record_slow_span(
+                span.name,
+                span.resource,
+                span.service,
+                span.span_type,
+                None,
+                self._parent,
+                span.start_ns,
+                source=span,
+                exc_info=self.exc_info,
+            )
+
+
+class _UntracedGenerator(_GeneratorTrace):
+    """Stands in for the trace of async generators that are not traced."""
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        pass
+
+    def resume(self) -> None:
+        pass
+
+    def suspend(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def fail(self, exc_info: tuple[Any, Any, Any]) -> None:
+        pass
+
+    def item(self) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+_UNTRACED_GENERATOR = _UntracedGenerator()
+
+
+def _start_generator_trace(
+    name: str,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    tags: dict[str, str] | None,
+    sampler: _Sampler | None,
+    min_duration_ns: int | None,
+) -> _GeneratorTrace | None:
+    """Start tracing an iteration of a generator, or return None if it is not."""
+
+    if not _decorators_enabled or (sampler is not None and not sampler.sample()):
+        return None
+
+    if min_duration_ns is not None:
+        if _unsampled():
+            return None
+        parent = tracer.context_provider.active()
+        detached = Span(name, resource=resource, service=service, span_type=span_type)
+        if tags:
+            detached.set_tags(tags)
+        return _GeneratorTrace(detached, parent, min_duration_ns)
+
+    span = _start_span(name, resource, service, span_type, tags, activate=False)
+    return None if span is None else _GeneratorTrace(span)
+
+
+class _SlowBlock:
+    """
+    A `trace_block` with a `min_duration`. The blocks nested in it, with the same
+    parent, wait for it to finish: they are recorded as its children if it is
+    slow, and as children of its parent otherwise, so they never point to a span
+    that is not recorded.
+    """
+
+    __slots__ = ("children", "exc_info", "finish_ns", "parent", "span")
+
+    def __init__(self, span: Span, parent: Span | Context | None) -> None:
+        self.span = span
+        self.parent = parent
+        self.finish_ns = 0
+        self.exc_info: tuple[Any, Any, Any] | None = None
+        self.children: list[_SlowBlock] = []
+
+    def record(self, parent: Span | Context | None) -> None:
+        span = self.span
+        recorded = _record_slow_span(
+            span.name,
+            span.resource,
+            span.service,
+            span.span_type,
+            None,
+            parent,
+            span.start_ns,
+            source=span,
+            exc_info=self.exc_info,
+            finish_ns=self.finish_ns,
+        )
+        for child in self.children:
+            child.record(parent if recorded is None else recorded)
+
+
+# The `trace_block` with a `min_duration` that the current code runs in.
+_slow_block: ContextVar[_SlowBlock | None] = ContextVar(
+    "troncos_slow_block", default=None
+)
+
 
 @contextmanager
+def _trace_slow_block(
+    name: str,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    attributes: dict[str, str] | None,
+    min_duration_ns: int,
+) -> Generator[Span, None, None]:
+    # The block gets a detached span, which is copied to a recorded span if the
+    # block turns out to be slow.
+    parent = tracer.context_provider.active()
+    enclosing = _slow_block.get()
+    if enclosing is not None and enclosing.parent is not parent:
+        # A span was started in the enclosing block, which is the parent.
+        enclosing = None
+
+    detached = Span(name, resource=resource, service=service, span_type=span_type)
+    if attributes:
+        detached.set_tags(attributes)
+    block = _SlowBlock(detached, parent)
+    token = _slow_block.set(block)
+    try:
+        yield detached
+    except BaseException:
+        block.exc_info = sys.exc_info()
+        raise
+    finally:
+        _slow_block.reset(token)
+        block.finish_ns = time.time_ns()
+        if (
+            block.exc_info is not None
+            or block.finish_ns - detached.start_ns >= min_duration_ns
+        ):
+            blocks = [block]
+        else:
+            blocks = block.children
+        if enclosing is not None:
+            enclosing.children.extend(blocks)
+        else:
+            for recorded_block in blocks:
+                recorded_block.record(parent)
+
+
+def _untraced_span(
+    name: str, resource: str | None, service: str | None, span_type: str | None
+) -> Span:
+    """
+    The span handed out by blocks that are not traced. It is never finished, so
+    it is not recorded, and it carries the context of the active span, so
+    propagating it continues the trace of the active span.
+    """
+
+    active = tracer.context_provider.active()
+    context = active.context if isinstance(active, Span) else active
+    if context is None or context.trace_id is None:
+        return Span(name, resource=resource, service=service, span_type=span_type)
+    return Span(
+        name,
+        resource=resource,
+        service=service,
+        span_type=span_type,
+        trace_id=context.trace_id,
+        span_id=context.span_id,
+        context=context,
+    )
+
+
+class _TraceBlock(ContextDecorator):
+    """
+    The context manager of `trace_block`. Nothing is started before the block is
+    entered, and each call of a function it decorates is traced on its own.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        resource: str | None,
+        service: str | None,
+        span_type: str | None,
+        attributes: dict[str, str] | None,
+        sampler: _Sampler | None,
+        min_duration_ns: int | None,
+    ) -> None:
+        self.name = name
+        self.resource = resource
+        self.service = service
+        self.span_type = span_type
+        self.attributes = attributes
+        self.sampler = sampler
+        self.min_duration_ns = min_duration_ns
+        self._context: AbstractContextManager[Span] | None = None
+
+    def _recreate_cm(self) -> "_TraceBlock":
+        return _TraceBlock(
+            self.name,
+            self.resource,
+            self.service,
+            self.span_type,
+            self.attributes,
+            self.sampler,
+            self.min_duration_ns,
+        )
+
+    def _start(self) -> AbstractContextManager[Span] | None:
+        if (self.sampler is not None and not self.sampler.sample()) or (
+            self.min_duration_ns is not None and _unsampled()
+        ):
+            return None
+
+        if self.min_duration_ns is not None:
+            return _trace_slow_block(
+                self.name,
+                self.resource,
+                self.service,
+                self.span_type,
+                self.attributes,
+                self.min_duration_ns,
+            )
+        # Spans finish themselves when the block exits.
+        return _start_span(
+            self.name, self.resource, self.service, self.span_type, self.attributes
+        )
+
+    def __enter__(self) -> Span:
+        self._context = self._start()
+        if self._context is None:
+            return _untraced_span(
+                self.name, self.resource, self.service, self.span_type
+            )
+        return self._context.__enter__()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> bool | None:
+        context, self._context = self._context, None
+        if context is None:
+            return None
+        return context.__exit__(exc_type, exc_value, traceback)
+
+
 def trace_block(
     name: str,
     *,
@@ -26,24 +543,188 @@ def trace_block(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
-) -> Generator[Span, None, None]:
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+) -> _TraceBlock:
     """
     Trace a code block using a with statement. Example:
 
     with trace_block("cool.block", resource="data!", attributes={"some": "attribute"}):
         time.sleep(1)
+
+    Only a share of the blocks are traced with `sample_rate` (a probability) or
+    `sample_every` (1 in N). With `min_duration` (in seconds) only blocks that take
+    longer, or fail, are recorded.
     """
 
-    tags: dict[str, str] = attributes or {}
+    return _TraceBlock(
+        name,
+        resource,
+        service,
+        span_type,
+        attributes,
+        _block_sampler(name, sample_rate, sample_every),
+        _min_duration_ns(min_duration),
+    )
 
-    with tracer.trace(
-        name=name,
-        resource=resource,
-        service=service,
-        span_type=span_type,
-    ) as span:
-        span.set_tags(tags)
-        yield span
+
+def _profile_function(f: Callable[P, R], name: str) -> Callable[P, R]:
+    """Wrap a function to record its calls in the call statistics, without spans."""
+
+    record = _profile.call_stats.record
+
+    if inspect.iscoroutinefunction(f):
+        awaitable_func = cast(Callable[P, Awaitable[R]], f)
+
+        @wraps(f)
+        async def profiled_func_async(*args: P.args, **kwargs: P.kwargs) -> R:
+            if not _decorators_enabled:
+                return await awaitable_func(*args, **kwargs)
+
+            start_ns = time.perf_counter_ns()
+            try:
+                result = await awaitable_func(*args, **kwargs)
+            except BaseException:
+                record(name, time.perf_counter_ns() - start_ns, True)
+                raise
+            record(name, time.perf_counter_ns() - start_ns, False)
+            return result
+
+        return cast(Callable[P, R], profiled_func_async)
+
+    @wraps(f)
+    def profiled_func(*args: P.args, **kwargs: P.kwargs) -> R:
+        if not _decorators_enabled:
+            return f(*args, **kwargs)
+
+        start_ns = time.perf_counter_ns()
+        try:
+            result = f(*args, **kwargs)
+        except BaseException:
+            record(name, time.perf_counter_ns() - start_ns, True)
+            raise
+        record(name, time.perf_counter_ns() - start_ns, False)
+        return result
+
+    return profiled_func
+
+
+def _trace_generator(
+    f: Callable[P, Generator[Any, Any, Any]],
+    name: str,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    tags: dict[str, str] | None,
+    sampler: _Sampler | None,
+    min_duration_ns: int | None,
+) -> Callable[P, Generator[Any, Any, Any]]:
+    """Wrap a generator function, so its span covers the whole iteration."""
+
+    @wraps(f)
+    def traced_generator(*args: P.args, **kwargs: P.kwargs) -> Generator[Any, Any, Any]:
+        trace = _start_generator_trace(
+            name, resource, service, span_type, tags, sampler, min_duration_ns
+        )
+        if trace is None:
+            return (yield from f(*args, **kwargs))
+
+        generator = f(*args, **kwargs)
+        send_value: Any = None
+        throw_value: BaseException | None = None
+        try:
+            while True:
+                trace.resume()
+                try:
+                    if throw_value is None:
+                        item = generator.send(send_value)
+                    else:
+                        item = generator.throw(throw_value)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    trace.suspend()
+                trace.item()
+
+                send_value, throw_value = None, None
+                try:
+                    send_value = yield item
+                except GeneratorExit:
+                    trace.close()
+                    generator.close()
+                    raise
+                except BaseException as e:
+                    throw_value = e
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                trace.fail(sys.exc_info())
+            raise
+        finally:
+            trace.finish()
+
+    return traced_generator
+
+
+def _trace_async_generator(
+    f: Callable[P, AsyncGenerator[Any, Any]],
+    name: str,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    tags: dict[str, str] | None,
+    sampler: _Sampler | None,
+    min_duration_ns: int | None,
+) -> Callable[P, AsyncGenerator[Any, Any]]:
+    """Wrap an async generator function, so its span covers the whole iteration."""
+
+    @wraps(f)
+    async def traced_async_generator(
+        *args: P.args, **kwargs: P.kwargs
+    ) -> AsyncGenerator[Any, Any]:
+        # Async generators can not delegate with `yield from`, so untraced ones are
+        # driven by the same loop.
+        trace = (
+            _start_generator_trace(
+                name, resource, service, span_type, tags, sampler, min_duration_ns
+            )
+            or _UNTRACED_GENERATOR
+        )
+
+        generator = f(*args, **kwargs)
+        send_value: Any = None
+        throw_value: BaseException | None = None
+        try:
+            while True:
+                trace.resume()
+                try:
+                    if throw_value is None:
+                        item = await generator.asend(send_value)
+                    else:
+                        item = await generator.athrow(throw_value)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    trace.suspend()
+                trace.item()
+
+                send_value, throw_value = None, None
+                try:
+                    send_value = yield item
+                except GeneratorExit:
+                    trace.close()
+                    await generator.aclose()
+                    raise
+                except BaseException as e:
+                    throw_value = e
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                trace.fail(sys.exc_info())
+            raise
+        finally:
+            trace.finish()
+
+    return traced_async_generator
 
 
 def _trace_function(
@@ -53,23 +734,105 @@ def _trace_function(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Callable[P, R]:
     if hasattr(f, _TRACE_IGNORE_ATTR):
         return f
 
+    wrapper = _wrap_function(
+        f,
+        name,
+        resource,
+        service,
+        span_type,
+        attributes,
+        sample_rate,
+        sample_every,
+        min_duration,
+        profile,
+    )
+    setattr(wrapper, _TRACED_ATTR, ())
+    return wrapper
+
+
+def _wrap_function(
+    f: Callable[P, R],
+    name: str | None,
+    resource: str | None,
+    service: str | None,
+    span_type: str | None,
+    attributes: dict[str, str] | None,
+    sample_rate: float | None,
+    sample_every: int | None,
+    min_duration: float | None,
+    profile: bool,
+) -> Callable[P, R]:
+    # The wrappers run on every call, so everything that can be is done here.
+    span_name = name or f"{f.__module__}.{f.__qualname__}"
+    if profile:
+        return _profile_function(f, span_name)
+
+    tags = dict(attributes) if attributes else None
+    sampler = _sampler(sample_rate, sample_every)
+    min_duration_ns = _min_duration_ns(min_duration)
+
+    # Generators are traced from the first item until they are exhausted or closed.
+    if inspect.isgeneratorfunction(f):
+        traced_generator = _trace_generator(
+            f, span_name, resource, service, span_type, tags, sampler, min_duration_ns
+        )
+        return cast(Callable[P, R], traced_generator)
+    if inspect.isasyncgenfunction(f):
+        traced_async_generator = _trace_async_generator(
+            f, span_name, resource, service, span_type, tags, sampler, min_duration_ns
+        )
+        return cast(Callable[P, R], traced_async_generator)
+
     # Async function
     if inspect.iscoroutinefunction(f):
+        awaitable_func = cast(Callable[P, Awaitable[R]], f)
 
         @wraps(f)
         async def traced_func_async(*args: P.args, **kwargs: P.kwargs) -> R:
-            with trace_block(
-                name=name or f"{f.__module__}.{f.__qualname__}",
-                resource=resource,
-                service=service,
-                span_type=span_type,
-                attributes=attributes,
+            if not _decorators_enabled or (
+                sampler is not None and not sampler.sample()
             ):
-                awaitable_func = cast(Callable[P, Awaitable[R]], f)
+                return await awaitable_func(*args, **kwargs)
+
+            if min_duration_ns is not None:
+                if _unsampled():
+                    return await awaitable_func(*args, **kwargs)
+
+                parent = tracer.context_provider.active()
+                start_ns = time.time_ns()
+                try:
+                    result = await awaitable_func(*args, **kwargs)
+                except BaseException:
+                    _record_slow_span(
+                        span_name,
+                        resource,
+                        service,
+                        span_type,
+                        tags,
+                        parent,
+                        start_ns,
+                        exc_info=sys.exc_info(),
+                    )
+                    raise
+                if time.time_ns() - start_ns >= min_duration_ns:
+                    _record_slow_span(
+                        span_name, resource, service, span_type, tags, parent, start_ns
+                    )
+                return result
+
+            span = _start_span(span_name, resource, service, span_type, tags)
+            if span is None:
+                return await awaitable_func(*args, **kwargs)
+
+            with span:
                 return await awaitable_func(*args, **kwargs)
 
         return cast(Callable[P, R], traced_func_async)
@@ -78,15 +841,44 @@ def _trace_function(
         # "Regular" function
         @wraps(f)
         def traced_func(*args: P.args, **kwargs: P.kwargs) -> R:
-            with trace_block(
-                name=name or f"{f.__module__}.{f.__qualname__}",
-                resource=resource,
-                service=service,
-                span_type=span_type,
-                attributes=attributes,
+            if not _decorators_enabled or (
+                sampler is not None and not sampler.sample()
             ):
                 return f(*args, **kwargs)
 
+            if min_duration_ns is not None:
+                if _unsampled():
+                    return f(*args, **kwargs)
+
+                parent = tracer.context_provider.active()
+                start_ns = time.time_ns()
+                try:
+                    result = f(*args, **kwargs)
+                except BaseException:
+                    _record_slow_span(
+                        span_name,
+                        resource,
+                        service,
+                        span_type,
+                        tags,
+                        parent,
+                        start_ns,
+                        exc_info=sys.exc_info(),
+                    )
+                    raise
+                if time.time_ns() - start_ns >= min_duration_ns:
+                    _record_slow_span(
+                        span_name, resource, service, span_type, tags, parent, start_ns
+                    )
+                return result
+
+            span = _start_span(span_name, resource, service, span_type, tags)
+            if span is None:
+                return f(*args, **kwargs)
+
+            with span:
+                return f(*args, **kwargs)
+
         return traced_func
 
 
@@ -99,6 +891,10 @@ def trace_function(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Callable[P, R]: ...
 
 
@@ -111,6 +907,10 @@ def trace_function(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Callable[[Callable[P, R]], Callable[P, R]]: ...
 
 
@@ -122,6 +922,10 @@ def trace_function(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Callable[P, R] | Callable[[Callable[P, R]], Callable[P, R]]:
     """
     This decorator adds tracing to a function. Example:
@@ -133,14 +937,52 @@ def trace_function(
     @trace_function(service="custom_service")
     def myfunc2()
         return "This will be traced as a custom service"
+
+    @trace_function(sample_every=100, min_duration=0.01)
+    def myfunc3()
+        return "Every 100th call is traced, if it takes longer than 10ms"
+
+    Only a share of the calls are traced with `sample_rate` (a probability) or
+    `sample_every` (1 in N). With `min_duration` (in seconds) only calls that take
+    longer, or fail, are recorded. Their span is created after the call, so spans
+    started during the call are children of the span of the caller.
+
+    The span of a generator, or async generator, covers its whole iteration, until
+    it is exhausted, fails or is closed. It records the number of items, the time to
+    the first item and the time spent in the generator as `generator.*` metrics.
+
+    With `profile` no spans are created. The calls, errors and durations of every
+    call are aggregated instead, see `FunctionProfile` and `get_function_stats`.
     """
 
     if fn and (callable(fn) or asyncio.iscoroutinefunction(fn)):
-        return _trace_function(fn, name, resource, service, span_type, attributes)
+        return _trace_function(
+            fn,
+            name,
+            resource,
+            service,
+            span_type,
+            attributes,
+            sample_rate,
+            sample_every,
+            min_duration,
+            profile,
+        )
     else:
         # No args
         def _inner(f: Callable[P, R]) -> Callable[P, R]:
-            return _trace_function(f, name, resource, service, span_type, attributes)
+            return _trace_function(
+                f,
+                name,
+                resource,
+                service,
+                span_type,
+                attributes,
+                sample_rate,
+                sample_every,
+                min_duration,
+                profile,
+            )
 
         return _inner
 
@@ -153,6 +995,10 @@ def trace_class(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Callable[[Type[TClass]], Type[TClass]]: ...
 
 
@@ -164,6 +1010,10 @@ def trace_class(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Type[TClass]: ...
 
 
@@ -174,6 +1024,10 @@ def trace_class(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> Type[TClass] | Callable[[Type[TClass]], Type[TClass]]:
     """
     This decorator adds a tracing decorator to every method of the decorated class. If
@@ -196,15 +1050,16 @@ def trace_class(
 
         def m3(self):
             return "This will be traced as a custom service"
+
+    The sampling, `min_duration` and `profile` options work like for
+    `trace_function`, for each method.
     """
 
     def _class_decorator(cls: Type[TClass]) -> Type[TClass]:
-        for key, value in cls.__dict__.items():
+        for key, value in list(cls.__dict__.items()):
             if key.startswith("_"):
                 continue
-            if not (
-                isinstance(value, FunctionType) or asyncio.iscoroutinefunction(value)
-            ):
+            if not _traceable(value):
                 continue
 
             logging.getLogger(__name__).debug(f"Tracing function {cls.__name__}.{key}")
@@ -218,6 +1073,10 @@ def trace_class(
                     service=service,
                     span_type=span_type,
                     attributes=attributes,
+                    sample_rate=sample_rate,
+                    sample_every=sample_every,
+                    min_duration=min_duration,
+                    profile=profile,
                 ),
             )
         return cls
@@ -234,6 +1093,10 @@ def trace_module(
     service: str | None = None,
     span_type: str | None = None,
     attributes: dict[str, str] | None = None,
+    sample_rate: float | None = None,
+    sample_every: int | None = None,
+    min_duration: float | None = None,
+    profile: bool = False,
 ) -> None:
     """
     This function adds a tracing decorator to every function of the calling module. If
@@ -254,33 +1117,60 @@ def trace_module(
     # End of module
     """
 
-    frame = inspect.stack()[1].frame
-    scope = frame.f_locals
+    # Only the calling frame is needed, `inspect.stack` would read the source of
+    # every frame on the stack.
+    _trace_scope(
+        sys._getframe(1).f_locals,
+        resource=resource,
+        service=service,
+        span_type=span_type,
+        attributes=attributes,
+        sample_rate=sample_rate,
+        sample_every=sample_every,
+        min_duration=min_duration,
+        profile=profile,
+    )
+
+
+def _traceable(value: Any) -> bool:
+    """Returns True for functions that can be traced, and are not traced yet."""
+
+    return (
+        isinstance(value, FunctionType) or asyncio.iscoroutinefunction(value)
+    ) and not hasattr(value, _TRACED_ATTR)
+
+
+def _trace_scope(
+    scope: dict[str, Any], *, trace_classes: bool = False, **options: Any
+) -> None:
+    """
+    Trace the public functions of a module scope, and with `trace_classes` the
+    methods of its public classes. The `options` are those of `trace_function`.
+    """
+
     module_name = scope.get("__name__", "unknown")
 
-    for key, value in list(frame.f_locals.items()):
+    for key, value in list(scope.items()):
         if key.startswith("_"):
             continue
-        if not (isinstance(value, FunctionType) or asyncio.iscoroutinefunction(value)):
-            continue
         if getattr(value, "__module__", None) != module_name:
             continue
 
-        logging.getLogger(__name__).debug(f"Tracing function {module_name}.{key}")
-        scope[key] = _trace_function(
-            value,
-            name=None,
-            resource=resource,
-            service=service,
-            span_type=span_type,
-            attributes=attributes,
-        )
+        if _traceable(value):
+            logging.getLogger(__name__).debug(f"Tracing function {module_name}.{key}")
+            scope[key] = _trace_function(value, **options)
+        elif (
+            trace_classes
+            and isinstance(value, type)
+            and _TRACE_IGNORE_ATTR not in value.__dict__
+        ):
+            trace_class(value, **options)
 
 
 def trace_ignore(f: Callable[P, R]) -> Callable[P, R]:
     """
-    Decorator to disable automatic tracing of functions.
-    See 'trace_module' and 'trace_class'.
+    Decorator to disable automatic tracing of functions, or of classes by the
+    import hook. See 'trace_module', 'trace_class' and 'AutoTrace'.
     """
 
     setattr(f, _TRACE_IGNORE_ATTR, ())
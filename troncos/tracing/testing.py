@@ -0,0 +1,327 @@
+"""
+An in-process OTLP receiver for tests and benchmarks. It decodes the export
+requests it receives into spans, can make requests slow or fail like an overloaded
+collector, and measures the rate spans are received at.
+"""
+
+import gzip
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from ._transport import import_grpc
+
+if TYPE_CHECKING:
+    from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+        ExportMetricsServiceRequest,
+    )
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+        ExportTraceServiceRequest,
+    )
+    from opentelemetry.proto.common.v1.common_pb2 import AnyValue
+
+_TRACE_SERVICE = "opentelemetry.proto.collector.trace.v1.TraceService"
+_METRICS_SERVICE = "opentelemetry.proto.collector.metrics.v1.MetricsService"
+
+# The gRPC status codes matching the HTTP status codes of failed requests.
+_GRPC_STATUS = {
+    429: "RESOURCE_EXHAUSTED",
+    502: "UNAVAILABLE",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+class ReceivedSpan(NamedTuple):
+    service_name: str | None
+    name: str
+    trace_id: int
+    span_id: int
+    parent_span_id: int | None
+    kind: int
+    status_code: int
+    attributes: dict[str, Any]
+    resource_attributes: dict[str, Any]
+
+
+def _any_value(value: "AnyValue") -> Any:
+    kind = value.WhichOneof("value")
+    if kind == "array_value":
+        return [_any_value(v) for v in value.array_value.values]
+    if kind == "kvlist_value":
+        return {kv.key: _any_value(kv.value) for kv in value.kvlist_value.values}
+    return getattr(value, kind) if kind else None
+
+
+def _decompress(data: bytes, content_encoding: str | None) -> bytes:
+    if content_encoding == "gzip":
+        return gzip.decompress(data)
+    if content_encoding == "deflate":
+        return zlib.decompress(data)
+    return data
+
+
+class OTLPReceiver:
+    """
+    Receives OTLP trace and metrics export requests over HTTP, and over gRPC when
+    `grpc` is true. Listens on free local ports, see `http_endpoint` and
+    `grpc_endpoint`.
+
+    Requests can be made slow with `latency` (in seconds), and fail with
+    `failure_status` for the next `fail_requests` requests or with probability
+    `failure_rate`. These can be changed while the receiver runs.
+    """
+
+    def __init__(
+        self,
+        *,
+        grpc: bool = False,
+        latency: float = 0.0,
+        failure_status: int = 503,
+        fail_requests: int = 0,
+        failure_rate: float = 0.0,
+    ) -> None:
+        assert latency >= 0, "'latency' can not be negative"
+        assert 0 <= failure_rate <= 1, "'failure_rate' has to be between 0 and 1"
+
+        self.latency = latency
+        self.failure_status = failure_status
+        self.fail_requests = fail_requests
+        self.failure_rate = failure_rate
+
+        self.trace_requests: list["ExportTraceServiceRequest"] = []
+        self.metrics_requests: list["ExportMetricsServiceRequest"] = []
+        self.failed_requests = 0
+        self.received_spans = 0
+
+        self._lock = threading.Condition()
+        self._started = time.perf_counter()
+        self._last_received: float | None = None
+
+        self._http_server = ThreadingHTTPServer(("127.0.0.1", 0), self._http_handler())
+        self._http_server.daemon_threads = True
+        self._http_thread = threading.Thread(
+            name="troncos.OTLPReceiver",
+            target=self._http_server.serve_forever,
+            daemon=True,
+        )
+        self._http_thread.start()
+
+        self._grpc_server: Any = None
+        self._grpc_port: int | None = None
+        if grpc:
+            self._start_grpc()
+
+    @property
+    def http_port(self) -> int:
+        return int(self._http_server.server_address[1])
+
+    @property
+    def http_endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.http_port}/v1/traces"
+
+    @property
+    def http_metrics_endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.http_port}/v1/metrics"
+
+    @property
+    def grpc_port(self) -> int:
+        assert self._grpc_port is not None, "The receiver was created without grpc"
+        return self._grpc_port
+
+    @property
+    def grpc_endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.grpc_port}"
+
+    def _fail_status(self) -> int | None:
+        """Returns the status a request should fail with, if any."""
+
+        with self._lock:
+            if self.fail_requests > 0:
+                self.fail_requests -= 1
+                self.failed_requests += 1
+                return self.failure_status
+            if self.failure_rate and random.random() < self.failure_rate:
+                self.failed_requests += 1
+                return self.failure_status
+        return None
+
+    def _receive(self, path: str, payload: bytes) -> None:
+        from opentelemetry.proto.collector.metrics.v1.metrics_service_pb2 import (
+            ExportMetricsServiceRequest,
+        )
+        from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+            ExportTraceServiceRequest,
+        )
+
+        if "metrics" in path.lower():
+            metrics_request = ExportMetricsServiceRequest.FromString(payload)
+            with self._lock:
+                self.metrics_requests.append(metrics_request)
+                self._lock.notify_all()
+            return
+
+        request = ExportTraceServiceRequest.FromString(payload)
+        span_count = sum(
+            len(scope_spans.spans)
+            for resource_spans in request.resource_spans
+            for scope_spans in resource_spans.scope_spans
+        )
+        now = time.perf_counter()
+        with self._lock:
+            self.trace_requests.append(request)
+            self.received_spans += span_count
+            self._last_received = now
+            self._lock.notify_all()
+
+    def _http_handler(self) -> type[BaseHTTPRequestHandler]:
+        receiver = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(length)
+                if receiver.latency:
+                    time.sleep(receiver.latency)
+
+                status = receiver._fail_status()
+                if status is None:
+                    try:
+                        receiver._receive(
+                            self.path,
+                            _decompress(data, self.headers.get("Content-Encoding")),
+                        )
+                        status = 200
+                    except Exception:
+                        status = 400
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-protobuf")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return _Handler
+
+    def _start_grpc(self) -> None:
+        grpc = import_grpc()
+
+        def _handler(path: str) -> Any:
+            def _export(payload: bytes, context: Any) -> bytes:
+                if self.latency:
+                    time.sleep(self.latency)
+                status = self._fail_status()
+                if status is not None:
+                    context.abort(
+                        getattr(
+                            grpc.StatusCode,
+                            _GRPC_STATUS.get(status, "INTERNAL"),
+                        ),
+                        f"Injected failure {status}",
+                    )
+                self._receive(path, payload)
+                # An empty export response.
+                return b""
+
+            # Without serializers the request and response bytes are used as is.
+            return grpc.unary_unary_rpc_method_handler(_export)
+
+        self._grpc_server = grpc.server(ThreadPoolExecutor(max_workers=8))
+        self._grpc_server.add_generic_rpc_handlers(
+            (
+                grpc.method_handlers_generic_handler(
+                    _TRACE_SERVICE, {"Export": _handler("traces")}
+                ),
+                grpc.method_handlers_generic_handler(
+                    _METRICS_SERVICE, {"Export": _handler("metrics")}
+                ),
+            )
+        )
+        self._grpc_port = self._grpc_server.add_insecure_port("127.0.0.1:0")
+        self._grpc_server.start()
+
+    @property
+    def spans(self) -> list[ReceivedSpan]:
+        """All spans received so far, in the order they were received."""
+
+        with self._lock:
+            requests = list(self.trace_requests)
+
+        spans = []
+        for request in requests:
+            for resource_spans in request.resource_spans:
+                resource_attributes = {
+                    kv.key: _any_value(kv.value)
+                    for kv in resource_spans.resource.attributes
+                }
+                for scope_spans in resource_spans.scope_spans:
+                    for span in scope_spans.spans:
+                        spans.append(
+                            ReceivedSpan(
+                                service_name=resource_attributes.get("service.name"),
+                                name=span.name,
+                                trace_id=int.from_bytes(span.trace_id, "big"),
+                                span_id=int.from_bytes(span.span_id, "big"),
+                                parent_span_id=(
+                                    int.from_bytes(span.parent_span_id, "big")
+                                    if span.parent_span_id
+                                    else None
+                                ),
+                                kind=span.kind,
+                                status_code=span.status.code,
+                                attributes={
+                                    kv.key: _any_value(kv.value)
+                                    for kv in span.attributes
+                                },
+                                resource_attributes=resource_attributes,
+                            )
+                        )
+        return spans
+
+    def wait_for_spans(self, count: int, timeout: float = 10.0) -> bool:
+        """Wait until at least `count` spans are received, returns False on timeout."""
+
+        with self._lock:
+            return self._lock.wait_for(
+                lambda: self.received_spans >= count, timeout=timeout
+            )
+
+    def spans_per_second(self) -> float:
+        """
+        The rate spans were received at, from when the receiver was started or reset
+        until the last request.
+        """
+
+        with self._lock:
+            if self._last_received is None:
+                return 0.0
+            return self.received_spans / (self._last_received - self._started)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.trace_requests.clear()
+            self.metrics_requests.clear()
+            self.failed_requests = 0
+            self.received_spans = 0
+            self._started = time.perf_counter()
+            self._last_received = None
+
+    def stop(self) -> None:
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        if self._grpc_server is not None:
+            self._grpc_server.stop(grace=None)
+
+    def __enter__(self) -> "OTLPReceiver":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()